@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import argparse
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from functools import cached_property, partial
+
+import networkx
+import numpy as np
+
+from treespace_metrics.compact import CompactNetwork
+from treespace_metrics.create_trees import enum_trees
+from treespace_metrics.francis import vertex_disjoint_paths, rooted_spanning_tree, tree_based_network
+from treespace_metrics.generator import random_network
+from treespace_metrics.jetten import is_tree_based
+from treespace_metrics.max_cst import maximum_covering_subtree
+from treespace_metrics.newick import iter_newick
+
+PHYLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Phylo')
+
+# Every benchmark gets the prepared inputs of one network and returns the call to measure,
+# so rooted_spanning_tree and tree_based_network are measured alone, from the paths and tree they are given.
+# Every run is called with a copy of the network without its cached properties, see uncached
+BENCHMARKS = {
+    'is_tree_based': lambda case: lambda network: is_tree_based(network),
+    'vertex_disjoint_paths': lambda case: lambda network: vertex_disjoint_paths(network),
+    'maximum_covering_subtree': lambda case: lambda network: maximum_covering_subtree(network),
+    'rooted_spanning_tree': lambda case: lambda network: rooted_spanning_tree(network, case['paths']),
+    'tree_based_network': lambda case: lambda network: tree_based_network(network, case['spanning_tree'].copy()),
+    'enum_trees': lambda case: lambda network: enum_trees(case['graph'], 'benchmark', paths=case['paths'],
+                                                          spanning_tree=case['spanning_tree']),
+}
+NEWICK_BENCHMARK = 'parse_newick'
+
+
+def prepare(num_leaves: int, num_reticulations: int, seed: int) -> dict:
+    # Build the network and the inputs of the benchmarks that start from an earlier result, outside of the timings
+    network = random_network(num_leaves, num_reticulations, seed)
+    _, paths = vertex_disjoint_paths(network)
+    return {
+        'network': network,
+        'graph': network.to_digraph(),
+        'paths': paths,
+        'spanning_tree': rooted_spanning_tree(network, paths),
+    }
+
+
+def uncached(network: CompactNetwork) -> CompactNetwork:
+    """
+    Args:
+        network (CompactNetwork): The network of a benchmark.
+
+    Returns:
+        CompactNetwork: A copy sharing its arrays, without the cached properties an earlier run computed,
+            such as its node classification, so every run includes computing them.
+    """
+    fresh = copy.copy(network)
+    for name, attribute in vars(CompactNetwork).items():
+        if isinstance(attribute, cached_property):
+            fresh.__dict__.pop(name, None)
+    return fresh
+
+
+def measure(function, repeat: int, setup=None) -> dict:
+    """
+    Time a call, then run it once more under tracemalloc for its peak memory,
+    as tracing every allocation slows the call down.
+
+    Args:
+        function (callable): The call to measure.
+        repeat (int): The number of timed runs.
+        setup (callable, optional): Builds the argument of every run, outside of the timing and the tracing.
+            Defaults to None, to call function without one.
+
+    Returns:
+        dict: The fastest and the median time in seconds, and the peak traced memory in bytes.
+    """
+    timings = []
+    for _ in range(repeat):
+        arguments = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        function(*arguments)
+        timings.append(time.perf_counter() - start)
+    arguments = () if setup is None else (setup(),)
+    tracemalloc.start()
+    try:
+        function(*arguments)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(timings), 'median_seconds': statistics.median(timings), 'peak_bytes': peak}
+
+
+def run_benchmarks(leaves=(10, 100, 1000), reticulations=(5, 50, 500), benchmarks=tuple(BENCHMARKS),
+                   repeat=3, seed=2017, max_enum_leaves=None, newick=True) -> dict:
+    """
+    Measure every benchmark on one random network per (leaves, reticulations) pair of the grid,
+    and the parsing of the Phylo Newick corpus.
+
+    Args:
+        leaves (iterable, optional): The leaf counts of the grid. Defaults to (10, 100, 1000).
+        reticulations (iterable, optional): The reticulation counts of the grid. Defaults to (5, 50, 500).
+        benchmarks (iterable, optional): The names of the benchmarks to run. Defaults to all of them.
+        repeat (int, optional): The number of timed runs of every benchmark. Defaults to 3.
+        seed (int, optional): The seed of the random networks. Defaults to 2017.
+        max_enum_leaves (int, optional): Skip enum_trees on networks with more leaves than this.
+            Defaults to None, to run it on every network.
+        newick (bool, optional): Whether to measure parsing the Phylo Newick corpus. Defaults to True.
+
+    Returns:
+        dict: The machine description under 'meta', and one record per measurement under 'results'.
+    """
+    results = []
+    for num_leaves in leaves:
+        for num_reticulations in reticulations:
+            case = prepare(num_leaves, num_reticulations, seed)
+            for name in benchmarks:
+                if name == 'enum_trees' and max_enum_leaves is not None and num_leaves > max_enum_leaves:
+                    continue
+                record = {'benchmark': name, 'leaves': num_leaves, 'reticulations': num_reticulations,
+                          'nodes': len(case['network']), 'edges': case['network'].num_edges}
+                try:
+                    record.update(measure(BENCHMARKS[name](case), repeat, partial(uncached, case['network'])))
+                    outcome = f"{record['seconds']:.4f}s, {record['peak_bytes'] / 2 ** 20:.2f} MiB"
+                except Exception as error:
+                    # A benchmark failing on one network should not stop measuring the others
+                    record['error'] = repr(error)
+                    outcome = f"failed with {error!r}"
+                results.append(record)
+                print(f"{name} leaves={num_leaves} reticulations={num_reticulations}: {outcome}")
+
+    if newick:
+        files = sorted(os.path.join(PHYLO, f) for f in os.listdir(PHYLO) if os.path.isfile(os.path.join(PHYLO, f)))
+        record = {'benchmark': NEWICK_BENCHMARK, 'leaves': None, 'reticulations': None, 'files': len(files)}
+        record.update(measure(lambda: [network for f in files for network in iter_newick(f, compact=True)], repeat))
+        results.append(record)
+        print(f"{NEWICK_BENCHMARK} files={len(files)}: {record['seconds']:.4f}s, "
+              f"{record['peak_bytes'] / 2 ** 20:.2f} MiB")
+
+    meta = {
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'networkx': networkx.__version__,
+        'machine': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+    }
+    return {'meta': meta, 'results': results}
+
+
+def compare(baseline: dict, current: dict, threshold=0.25, min_seconds=0.01) -> list:
+    """
+    Compare two benchmark runs on the measurements they share, failed measurements are skipped.
+
+    Args:
+        baseline (dict): The saved run, as written by run_benchmarks.
+        current (dict): The new run.
+        threshold (float, optional): The relative slowdown or memory growth that is flagged. Defaults to 0.25.
+        min_seconds (float, optional): Timings below this in both runs are too noisy to be flagged.
+            Defaults to 0.01.
+
+    Returns:
+        list: One (benchmark, leaves, reticulations, time ratio, memory ratio, regressed) row per shared measurement.
+    """
+    def key(record: dict) -> tuple:
+        return record['benchmark'], record['leaves'], record['reticulations']
+
+    saved = {key(record): record for record in baseline['results']}
+    rows = []
+    for record in current['results']:
+        old = saved.get(key(record))
+        if old is None or 'error' in old or 'error' in record:
+            continue
+        time_ratio = record['seconds'] / max(old['seconds'], sys.float_info.min)
+        memory_ratio = record['peak_bytes'] / max(old['peak_bytes'], 1)
+        slower = time_ratio > 1 + threshold and max(record['seconds'], old['seconds']) >= min_seconds
+        regressed = slower or memory_ratio > 1 + threshold
+        rows.append(key(record) + (time_ratio, memory_ratio, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='Benchmark the phylogenetic network metrics at growing sizes')
+    parser.add_argument('--leaves', '-l', nargs='+', dest='leaves', type=int, default=[10, 100, 1000],
+                        help="leaf counts of the grid of random networks")
+    parser.add_argument('--reticulation', '-r', nargs='+', dest='reticulations', type=int, default=[5, 50, 500],
+                        help="reticulation counts of the grid of random networks")
+    parser.add_argument('--benchmarks', '-b', nargs='+', dest='benchmarks', choices=list(BENCHMARKS),
+                        default=list(BENCHMARKS), help="only run these benchmarks")
+    parser.add_argument('--repeat', nargs='?', dest='repeat', type=int, default=3,
+                        help="number of timed runs of every benchmark, the fastest one is kept")
+    parser.add_argument('--seed', nargs='?', dest='seed', type=int, default=2017,
+                        help="seed of the random networks")
+    parser.add_argument('--max-enum-leaves', nargs='?', dest='max_enum_leaves', type=int, default=None,
+                        help="skip enum_trees on networks with more leaves than this")
+    parser.add_argument('--no-newick', dest='newick', action='store_false',
+                        help="do not benchmark parsing the Phylo Newick corpus")
+    parser.add_argument('--output', '-o', nargs='?', dest='output', default='benchmarks.json',
+                        help="JSON file to write the results to")
+    parser.add_argument('--compare', nargs='?', dest='compare',
+                        help="baseline JSON file to compare the results with, exits with 1 on a regression")
+    parser.add_argument('--threshold', nargs='?', dest='threshold', type=float, default=0.25,
+                        help="relative slowdown or memory growth flagged as a regression")
+    parser.add_argument('--min-seconds', nargs='?', dest='min_seconds', type=float, default=0.01,
+                        help="timings below this in both runs are too noisy to be flagged")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.leaves, args.reticulations, args.benchmarks, args.repeat, args.seed,
+                             args.max_enum_leaves, args.newick)
+    with open(args.output, 'w') as fd:
+        json.dump(current, fd, indent=2)
+    print(f"Wrote {len(current['results'])} results to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as fd:
+            baseline = json.load(fd)
+        rows = compare(baseline, current, args.threshold, args.min_seconds)
+        for benchmark, leaves, reticulations, time_ratio, memory_ratio, regressed in rows:
+            print(f"{'REGRESSION' if regressed else 'ok':<10} {benchmark:<26} leaves={leaves} "
+                  f"reticulations={reticulations} time x{time_ratio:.2f} memory x{memory_ratio:.2f}")
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,10 @@
 /* Copyright: Louxin Zhang
 * Compiling command:  gcc binary_ntk_generator.c
-* run command:  ./binary_ntk_generator <no. leaves> <no. reticulations> <no. of ntk generated>
-* For example,  ./binary_ntk_generator 6 20 100
+* run command:  ./binary_ntk_generator <no. leaves> <no. reticulations> <no. of ntk generated> [--seed <seed>] [--stdout]
+* For example,  ./binary_ntk_generator 6 20 100 --seed 42 --stdout
+* Without --seed, the generator is seeded with the current time.
+* Without --stdout, network k is written to the file ./0k, otherwise all networks are written to stdout,
+* each one is a line "# 0k" followed by its edges, one "source target" per line.
 * Citation: Louxin Zhang, Zhang, L., 2016.
 * On tree-based phylogenetic networks.
 * Journal of Comput. Biology, 23(7), pp.553-565.
@@ -28,6 +31,9 @@
 #include <stdio.h>
 #include <time.h>
 #include <stdlib.h>
+#include <string.h>
+
+#define MAX_NODES 300
 
 /* return 0 if (src_node_array, target_node) is not a edge, 1 otherwise */
 int Check(int source_node, int target_node, int Edges[][2], int no_edges) {
@@ -40,36 +46,66 @@ int Check(int source_node, int target_node, int Edges[][2], int no_edges) {
 	return 0;
 }
 
-/* argv[]: no._leaves, no._reticulations, no._data_sets */
+/* write the edges of a network, leaves are named leaf1, leaf2, ... */
+void WriteEdges(FILE * FPtr, int Edges[][2], int no_edges, int internal_nodes) {
+    int i;
+    for (i = 0; i < no_edges; i++) {
+        if (Edges[i][1] < internal_nodes) {
+            fprintf(FPtr, "%d %d\n", Edges[i][0], Edges[i][1]);
+        }
+        else {
+            fprintf(FPtr, "%d leaf%d\n", Edges[i][0], Edges[i][1] - internal_nodes + 1);
+        }
+    }
+}
+
+/* argv[]: no._leaves, no._reticulations, no._data_sets, then the options --seed <seed> and --stdout */
 int main(int argc, char * argv[])
 {
     int  i, file_no, k, k_in, k_out;
     int n_r, n_t, n_l, internal_nodes;
-    int nodes_type[300];
-    int src_node_array[600];
-    int tgt_node_array[600], source_node, target_node;
-    int Edges[600][2], no_edges;
+    int nodes_type[MAX_NODES];
+    int src_node_array[2 * MAX_NODES];
+    int tgt_node_array[2 * MAX_NODES], source_node, target_node;
+    int Edges[2 * MAX_NODES][2], no_edges;
     int r, flag, count, success;
     char file_name[20];
     int good_candidate[600];
     int test;
     FILE * FPtr;
     int num_files;
+    unsigned int seed = (unsigned int) time(NULL);
+    int to_stdout = 0;
 
-    if (argc == 4) {
-        n_l = atoi(argv[1]); /* num_leaves */
-        n_r = atoi(argv[2]); /* num_reticulation */
-        num_files = atoi(argv[3]);
-    }
-    else {
-        fprintf(stderr, "usage: ./binary_ntk_generator <num_leaves> <num_reticulation> <num_networks>\n");
+    if (argc < 4) {
+        fprintf(stderr, "usage: ./binary_ntk_generator <num_leaves> <num_reticulation> <num_networks> "
+                        "[--seed <seed>] [--stdout]\n");
         exit(1);
     }
+    n_l = atoi(argv[1]); /* num_leaves */
+    n_r = atoi(argv[2]); /* num_reticulation */
+    num_files = atoi(argv[3]);
+    for (i = 4; i < argc; i++) {
+        if (strcmp(argv[i], "--seed") == 0 && i + 1 < argc) {
+            seed = (unsigned int) strtoul(argv[++i], NULL, 10);
+        }
+        else if (strcmp(argv[i], "--stdout") == 0) {
+            to_stdout = 1;
+        }
+        else {
+            fprintf(stderr, "unknown option: %s\n", argv[i]);
+            exit(1);
+        }
+    }
 
     n_t = n_r + n_l - 1; /* no of tree nodes */
     internal_nodes = n_t + n_r;   /* no of internal nodes */
+    if (n_l < 1 || n_r < 0 || internal_nodes + n_l > MAX_NODES) {
+        fprintf(stderr, "the networks must have at least 1 leaf and at most %d nodes\n", MAX_NODES);
+        exit(1);
+    }
 
-    srand(time(NULL));
+    srand(seed);
     for (file_no = 0; file_no < num_files; file_no++) {
         /* printf("the %d-th network\n", file_no); */
         do {
@@ -90,11 +126,6 @@ int main(int argc, char * argv[])
                 nodes_type[2 + k] = -1;
             }
 
-            for (i = 0; i < internal_nodes; i++) {
-                printf("%d ", nodes_type[i]);
-            }
-            printf("\n");
-
             k_in = 0;
             src_node_array[0] = 0;  /* two edges 0 and 1 are our edges from 0 */
             src_node_array[1] = 0; /* root has out links */
@@ -125,16 +156,6 @@ int main(int argc, char * argv[])
                 k_in += 1;
             }
 
-            printf("k_out %d  k_in %d\n", k_out, k_in);
-            for (i = 0; i < k_out; i++) {
-                printf("%d ", src_node_array[i]);
-            }
-            printf("\n");
-            for (i = 0; i < k_in; i++) {
-                printf("%d ", tgt_node_array[i]);
-            }
-            printf("\n");
-
             /* Create first edge leaving the root (node 0) to node 1 */
             no_edges = 0;
             Edges[0][0] = 0;
@@ -200,18 +221,17 @@ int main(int argc, char * argv[])
 
         /* print */
         if (success == 1) {
-            sprintf(file_name, "./0%d", file_no);
-	        FPtr = fopen(file_name, "w+");
-            if (FPtr != NULL) {
-                for (i = 0; i < no_edges; i++) {
-                    if (Edges[i][1] < internal_nodes) {
-	                    fprintf(FPtr, "%d %d\n", Edges[i][0], Edges[i][1]);
-		            }
-		            else {
-		                fprintf(FPtr, "%d leaf%d\n", Edges[i][0], Edges[i][1] - internal_nodes + 1);
-		            }
+            if (to_stdout) {
+                printf("# 0%d\n", file_no);
+                WriteEdges(stdout, Edges, no_edges, internal_nodes);
+            }
+            else {
+                sprintf(file_name, "./0%d", file_no);
+                FPtr = fopen(file_name, "w+");
+                if (FPtr != NULL) {
+                    WriteEdges(FPtr, Edges, no_edges, internal_nodes);
+                    fclose(FPtr);
                 }
-	            fclose(FPtr);
             }
         }
     } /* end of file_no loop */
@@ -1,90 +1,328 @@
 #!/usr/bin/env python3
 
 import argparse
+import logging
 import os
 import shutil
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from os import listdir
 from os.path import isfile, join
 
-from Bio import Phylo
-from treespace_metrics.create_trees import enum_trees
-from treespace_metrics.drawing import draw_tree
-from treespace_metrics.francis import vertex_disjoint_paths, rooted_spanning_tree, tree_based_network
-from treespace_metrics.jetten import is_tree_based
-from treespace_metrics.max_cst import maximum_covering_subtree
-from treespace_metrics.utils import read_adjacency_list, create_dag, path_to_edges
+from treespace_metrics.analysis import NetworkAnalysis, METRICS, result_columns
+from treespace_metrics.cache import MEMORY, open_cache
+from treespace_metrics.corpus import is_corpus, open_corpus, pack_corpus, write_corpus
+from treespace_metrics.generator import random_networks
+from treespace_metrics.manifest import COMMIT_ROWS, RunManifest, resume_manifest, file_stamp, network_hash
+from treespace_metrics.newick import read_newick
+from treespace_metrics.profiling import SlowestNetworks, timed, profile_networks, write_hotspot_report
+from treespace_metrics.results import FORMATS, open_sink
+from treespace_metrics.stages import StageRecorder, stage, columns as stage_columns
+from treespace_metrics.svg import background_renderer, wait_for_renders
+from treespace_metrics.tree_cover import TREE_COVER_SECONDS
+from treespace_metrics.artifacts import ARTIFACT_DIR, write_artifact, find_artifacts, render_artifacts
+from treespace_metrics.utils import read_compact_adjacency_list, iter_adjacency_records
 
 import subprocess
 
+GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'phylo_generator', 'binary_ntk_generator')
+# The networks submitted ahead per worker process
+WINDOW_PER_JOB = 2
+
 
 # Used by both offline and online method to analyze metrics of graphs, and store output
-def analyze_generated_graphs(input_dir: str, is_newick: bool, draw_image: bool):
-    list_of_network_files = [f for f in listdir(input_dir) if isfile(join(input_dir, f))]
-    output_image_dir = os.path.join(input_dir, 'images')
-    if os.path.exists(output_image_dir):
-        shutil.rmtree(output_image_dir)
-    os.makedirs(output_image_dir, exist_ok=True)
-
-    # Create Headers of CSV results like answers.csv
-    metric_path = os.path.join(output_image_dir, "metrics.csv")
-    with open(metric_path, 'w+') as fd:
-        fd.write('graph,is_tree_based,max_cst,spanning_tree,rooted_tree\n')
-
-    for network_file in list_of_network_files:
-        if is_newick:
-            graph = Phylo.read(join(input_dir, network_file), 'newick')
-            graph = Phylo.to_networkx(graph)
-            graph = create_dag(graph)
-        else:
-            graph = read_adjacency_list(join(input_dir, network_file))
+def analyze_generated_graphs(input_dir: str, is_newick: bool, draw_image: bool, jobs: int = 1,
+                             metrics=tuple(METRICS), cache=None, stages=False, profile=0, profile_memory=False,
+                             tree_cover_seconds=TREE_COVER_SECONDS, svg=False, artifacts=False, output_format='csv',
+                             fresh=False, stage_memory=False):
+    # input_dir is either a directory with one file per network, or a corpus file packed by pack_corpus
+    if is_corpus(input_dir):
+        output_image_dir = os.path.splitext(input_dir)[0] + '-images'
+        networks = range(len(open_corpus(input_dir)))
+        analyze = partial(analyze_corpus_network, corpus_file=input_dir,
+                          output_image_dir=output_image_dir, draw_image=draw_image, metrics=metrics, cache=cache,
+                          stages=stages, tree_cover_seconds=tree_cover_seconds, svg=svg, artifacts=artifacts,
+                          stage_memory=stage_memory, with_hash=True)
+        fingerprint = partial(corpus_fingerprint, corpus_file=input_dir)
+        digest = partial(corpus_digest, corpus_file=input_dir)
+    else:
+        output_image_dir = os.path.join(input_dir, 'images')
+        networks = sorted(f for f in listdir(input_dir) if isfile(join(input_dir, f)))
+        analyze = partial(analyze_network, input_dir=input_dir, is_newick=is_newick,
+                          output_image_dir=output_image_dir, draw_image=draw_image, metrics=metrics, cache=cache,
+                          stages=stages, tree_cover_seconds=tree_cover_seconds, svg=svg, artifacts=artifacts,
+                          stage_memory=stage_memory, with_hash=True)
+        fingerprint = partial(file_fingerprint, input_dir=input_dir)
+        digest = partial(file_digest, input_dir=input_dir, is_newick=is_newick)
+    # A run with the same settings resumes the run in output_image_dir, any other starts over
+    settings = {'newick': is_newick, 'draw_image': draw_image, 'metrics': [c for c in METRICS if c in metrics],
+                'stages': stages, 'stage_memory': stage_memory, 'tree_cover_seconds': tree_cover_seconds, 'svg': svg,
+                'artifacts': artifacts}
+    analyze_all(networks, analyze, output_image_dir, jobs, metrics, stages, profile, profile_memory, output_format,
+                fingerprint, settings, fresh, stage_memory, digest)
+
+
+# The key of a network in the manifest, unique in the run, and the stamp of its input, read without opening it
+def file_fingerprint(network_file: str, input_dir: str) -> tuple:
+    return network_file, file_stamp(join(input_dir, network_file))
+
+
+def corpus_fingerprint(index: int, corpus_file: str) -> tuple:
+    return f"{index}:{open_corpus(corpus_file).names[index]}", file_stamp(corpus_file)
+
+
+# The network_hash of a network whose stamp changed, the same one the worker that analyzes it returns
+def file_digest(network_file: str, input_dir: str, is_newick: bool) -> str:
+    return network_hash(read_network(network_file, input_dir, is_newick))
+
+
+def corpus_digest(index: int, corpus_file: str) -> str:
+    return network_hash(open_corpus(corpus_file)[index])
+
+
+# Analyzes random networks as binary_ntk_generator streams them, without writing the networks to disk
+def analyze_random_networks(num_leaves: int, num_reticulation: int, num_dataset: int, draw_image: bool,
+                            jobs: int = 1, metrics=tuple(METRICS), seed=None, cache=None, stages=False,
+                            profile=0, profile_memory=False, tree_cover_seconds=TREE_COVER_SECONDS, svg=False,
+                            artifacts=False, output_format='csv', stage_memory=False, **generator_options):
+    output_image_dir = os.path.join(random_networks_dir(num_leaves, num_reticulation), 'images')
+    analyze = partial(analyze_named_graph, output_image_dir=output_image_dir, draw_image=draw_image,
+                      metrics=metrics, cache=cache, stages=stages, tree_cover_seconds=tree_cover_seconds, svg=svg,
+                      artifacts=artifacts, stage_memory=stage_memory)
+    networks = generate_random_networks(num_leaves, num_reticulation, num_dataset, seed, **generator_options)
+    analyze_all(networks, analyze, output_image_dir, jobs, metrics, stages, profile, profile_memory, output_format,
+                stage_memory=stage_memory)
+
+
+def analyze_all(networks, analyze, output_image_dir: str, jobs: int = 1, metrics=tuple(METRICS), stages=False,
+                profile=0, profile_memory=False, output_format='csv', fingerprint=None, settings=None, fresh=False,
+                stage_memory=False, digest=None):
+    # Without a fingerprint of the networks, or with fresh, the run starts over in an empty directory
+    manifest = None
+    if fingerprint is not None and not fresh:
+        manifest = resume_manifest(output_image_dir, settings)
+    if manifest is None:
+        if os.path.exists(output_image_dir):
+            shutil.rmtree(output_image_dir)
+        os.makedirs(output_image_dir, exist_ok=True)
+        if fingerprint is not None:
+            manifest = RunManifest(output_image_dir, settings)
+    order = None
+    if manifest is not None:
+        # Networks done by an earlier run whose input did not change are skipped, the others are analyzed.
+        # Each one is checked as the workers get to it, by the stamp of its input, and only hashed here
+        # if the stamp changed, the workers hash the networks they analyze
+        order = deque()
+        networks = resume_networks(networks, fingerprint, digest, manifest, order)
+
+    # The columns are those of answers.csv, with rooted_tree_optimal after rooted_tree, then the stage columns
+    header = ['graph'] + result_columns(metrics)
+    if stages:
+        header += stage_columns(stage_memory)
+
+    # Every network is timed, and the inputs of the profile slowest ones are kept to profile them at the end
+    slowest = SlowestNetworks(profile)
+    timed_analyze = partial(timed, analyze=analyze)
+    if manifest is not None and jobs > 1:
+        # A worker only returns a row once the SVG images it queued are written, so no network is recorded
+        # as done while its images could still be lost with the worker
+        timed_analyze = partial(analyze_and_render, analyze=timed_analyze)
+    # Only this process writes rows, through one handle the sink keeps open for the whole run.
+    # The results file is written again, with the rows of the skipped networks in their place
+    finished = skipped = 0
+    try:
+        with open_sink(output_format, output_image_dir, header) as sink:
+            analyzed = analyze_in_order(networks, timed_analyze, jobs)
+            for network, row, seconds, record in merge_completed(analyzed, order, manifest):
+                sink.write(row)
+                if network is None:
+                    skipped += 1
+                    continue
+                slowest.add(seconds, row[0], network)
+                if manifest is not None:
+                    manifest.finish(*record, row)
+                    finished += 1
+                    if finished % COMMIT_ROWS == 0:
+                        # The images of this process are written before their networks are recorded as done
+                        wait_for_renders()
+                        manifest.commit()
+    finally:
+        # Workers write their SVG images before they exit, the images of this process are waited for here
+        wait_for_renders()
+        if manifest is not None:
+            manifest.close()
+    if skipped:
+        print(f"Skipped {skipped} networks done by an earlier run", file=sys.stderr)
+
+    if profile > 0:
+        # The cache would answer for the same networks again, so they are profiled without it
+        profile_dir = os.path.join(output_image_dir, 'profile')
+        profiles = profile_networks(slowest.slowest(), partial(analyze, cache=None), profile_dir, profile_memory)
+        write_hotspot_report(profiles, slowest.slowest(), profile_dir)
+        print(f"Wrote the profiles of the {len(profiles)} slowest networks to {profile_dir}", file=sys.stderr)
+
+
+def analyze_in_order(networks, analyze, jobs: int = 1):
+    # Yields every network with its analysis, in input order. Workers share nothing, and at most
+    # WINDOW_PER_JOB networks per worker are submitted ahead, so a streamed input is read as the workers
+    # get to it instead of all up front like ProcessPoolExecutor.map
+    if jobs <= 1:
+        for network in networks:
+            yield network, analyze(network)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        in_flight = deque()
+        for network in networks:
+            in_flight.append((network, pool.submit(analyze, network)))
+            if len(in_flight) >= WINDOW_PER_JOB * jobs:
+                network, future = in_flight.popleft()
+                yield network, future.result()
+        while in_flight:
+            network, future = in_flight.popleft()
+            yield network, future.result()
 
-        network_name = network_file.split('.')[0]
-        print("Opening the phylogenetic network: " + network_name)
-        graph_drawing_location = os.path.join(output_image_dir, network_name)
 
-        # Get Metrics and Print, these parts are already known
-        tree_based = is_tree_based(graph)
-        _, eta = maximum_covering_subtree(graph, graph_drawing_location, draw_image)
-        missing_v1, paths = vertex_disjoint_paths(graph, graph_drawing_location, draw_image)
+def resume_networks(networks, fingerprint, digest, manifest: RunManifest, order: deque):
+    # Yields the networks to analyze in input order, checking each one against the manifest when it is reached.
+    # Every network, done or not, is appended to order as (key, stamp, done), for merge_completed
+    for network in networks:
+        key, stamp = fingerprint(network)
+        done = manifest.done(key, stamp, partial(digest, network))
+        order.append((key, stamp, done))
+        if not done:
+            yield network
 
-        # Print Spanning Tree and New Leaf network
-        spanning_tree = rooted_spanning_tree(graph, paths)
 
-        # draw_tree(spanning_tree, graph_drawing_location + '-spanning-tree')
-        # draw_tree(graph, graph_drawing_location, highlight_edges=spanning_tree.edges())
-        draw_tree(graph, graph_drawing_location + '-initial-disjoint-paths', highlight_edges=path_to_edges(paths))
+def merge_completed(analyzed, order=None, manifest: RunManifest = None):
+    # Yields (network, row, seconds, record) in input order, with the (key, stamp, hash) to record a network by.
+    # The networks an earlier run completed have no network, their row is read back from the manifest.
+    # Without a manifest, every network is analyzed
+    if manifest is None:
+        for network, (row, seconds) in analyzed:
+            yield network, row, seconds, None
+        return
+    for network, ((row, network_digest), seconds) in analyzed:
+        while order[0][2]:
+            yield None, manifest.row(order.popleft()[0]), None, None
+        key, stamp, _ = order.popleft()
+        yield network, row, seconds, (key, stamp, network_digest)
+    while order:
+        yield None, manifest.row(order.popleft()[0]), None, None
+    analyzed.close()
 
-        new_tree_based_network = tree_based_network(graph, spanning_tree)
-        draw_tree(new_tree_based_network, graph_drawing_location + '-spanning-tree-with-leaves')
 
-        # TODO: Keep working on this research question, I think you are getting close
-        tree_list = []
-        # tree_list = enum_trees(graph, graph_drawing_location, draw_image)
+def analyze_and_render(network, analyze):
+    result = analyze(network)
+    wait_for_renders()
+    return result
 
-        with open(metric_path, 'a+') as metric:
-            if tree_based:
-                metric.write(network_name + ',1,' + str(eta) + ',' + str(missing_v1) + ',' + str(len(tree_list)) + '\n')
-            else:
-                metric.write(network_name + ',0,' + str(eta) + ',' + str(missing_v1) + ',' + str(len(tree_list)) + '\n')
+
+def read_network(network_file: str, input_dir: str, is_newick: bool):
+    # The DiGraph is only built from the compact network if a drawing needs it
+    if is_newick:
+        return read_newick(join(input_dir, network_file), compact=True)
+    return read_compact_adjacency_list(join(input_dir, network_file))
+
+
+def analyze_network(network_file: str, input_dir: str, is_newick: bool, output_image_dir: str, draw_image: bool,
+                    metrics=tuple(METRICS), cache=None, stages=False, tree_cover_seconds=TREE_COVER_SECONDS,
+                    svg=False, artifacts=False, stage_memory=False, with_hash=False):
+    recorder = StageRecorder(stage_memory) if stages else None
+    with stage(recorder, 'parse'):
+        graph = read_network(network_file, input_dir, is_newick)
+    return analyze_graph(network_file.split('.')[0], graph, output_image_dir, draw_image, metrics, cache, recorder,
+                         tree_cover_seconds, svg, artifacts, with_hash=with_hash)
+
+
+def analyze_corpus_network(index: int, corpus_file: str, output_image_dir: str, draw_image: bool,
+                           metrics=tuple(METRICS), cache=None, stages=False, tree_cover_seconds=TREE_COVER_SECONDS,
+                           svg=False, artifacts=False, stage_memory=False, with_hash=False):
+    recorder = StageRecorder(stage_memory) if stages else None
+    # Every process maps the corpus once, then each network is read straight from the mapped arrays
+    with stage(recorder, 'parse'):
+        corpus = open_corpus(corpus_file)
+        graph = corpus[index]
+    return analyze_graph(corpus.names[index], graph, output_image_dir, draw_image, metrics, cache, recorder,
+                         tree_cover_seconds, svg, artifacts, with_hash=with_hash)
+
+
+def analyze_named_graph(named_graph: tuple, output_image_dir: str, draw_image: bool,
+                        metrics=tuple(METRICS), cache=None, stages=False, tree_cover_seconds=TREE_COVER_SECONDS,
+                        svg=False, artifacts=False, stage_memory=False) -> list:
+    # The network was parsed from the generator's pipe before it got here, its parse stage stays at 0
+    network_name, graph = named_graph
+    recorder = StageRecorder(stage_memory) if stages else None
+    return analyze_graph(network_name, graph, output_image_dir, draw_image, metrics, cache, recorder,
+                         tree_cover_seconds, svg, artifacts)
+
+
+def analyze_graph(network_name: str, graph, output_image_dir: str, draw_image: bool,
+                  metrics=tuple(METRICS), cache=None, recorder: StageRecorder = None,
+                  tree_cover_seconds=TREE_COVER_SECONDS, svg=False, artifacts=False, with_hash=False):
+    # Progress goes to stderr, stdout is left to the NDJSON results
+    print("Opening the phylogenetic network: " + network_name, file=sys.stderr)
+    graph_drawing_location = os.path.join(output_image_dir, network_name)
+
+    # Every intermediate is shared between the metrics, and only the requested ones are computed.
+    # cache is the path of the result cache database, each process opens it once
+    analysis = NetworkAnalysis(graph, cache=None if cache is None else open_cache(cache), stages=recorder,
+                               tree_cover_seconds=tree_cover_seconds)
+    row = [network_name] + analysis.results(metrics)
+    if artifacts:
+        # Only what the images are drawn from is saved, the render subcommand draws the images later
+        write_artifact(os.path.join(output_image_dir, ARTIFACT_DIR, network_name), analysis.artifact(metrics))
+    else:
+        # SVG images are written by a background thread of this process while it goes on with the next network
+        analysis.draw(graph_drawing_location, draw_image, metrics, background_renderer() if svg else None)
+    if recorder is not None:
+        row += recorder.row()
+
+    # TODO: Keep working on this research question, I think you are getting close
+    # tree_list = analysis.enum_trees(graph_drawing_location, draw_image)
+    if with_hash:
+        # The hash the manifest records the network by, of the network already read, so the input is read once
+        return row, network_hash(graph)
+    return row
 
 
 # Creates random Phylogenetic Networks
 # These networks are usually tree-based or almost tree-based. I need to make it more random somehow...
 # Query this site: http://phylnet.univ-mlv.fr/tools/randomNtkGenerator.php
-def create_local_random_dag(num_leaves: int, num_reticulation: int, num_dataset: int) -> str:
-    # Create new phylogenetic networks
-    subprocess.call(['./phylo_generator/binary_ntk_generator',
-                     str(num_leaves), str(num_reticulation),
-                     str(num_dataset)])
-
-    # move all the graphs into a directory
-    input_dir = 'output_ret=' + str(num_reticulation) + '_leaves=' + str(num_leaves)
-    os.makedirs(input_dir, exist_ok=True)
+def generate_random_networks(num_leaves: int, num_reticulation: int, num_dataset: int, seed=None, generator='c',
+                             tree_child=False, contraction=0.0):
+    # The NumPy generator builds the networks in memory, it also makes tree-child and non-binary networks
+    if generator != 'numpy' and (tree_child or contraction):
+        raise ValueError("Only the numpy generator makes tree-child or contracted networks")
+    if generator == 'numpy':
+        yield from random_networks(num_dataset, num_leaves, num_reticulation, seed, tree_child=tree_child,
+                                   contraction=contraction)
+        return
+    # The generator writes every network to the pipe as a '# name' record, each one is yielded as it arrives
+    command = [GENERATOR, str(num_leaves), str(num_reticulation), str(num_dataset), '--stdout']
+    if seed is not None:
+        command += ['--seed', str(seed)]
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as process:
+        yield from iter_adjacency_records(process.stdout)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def random_networks_dir(num_leaves: int, num_reticulation: int) -> str:
+    return 'output_ret=' + str(num_reticulation) + '_leaves=' + str(num_leaves)
 
-    for random_network in range(0, num_dataset):
-        random_network = "0%d" % random_network
-        subprocess.call(['mv', random_network, random_network + '.txt'])
-        subprocess.call(['mv', random_network + '.txt', input_dir])
+
+# Saves the random networks into a directory, one adjacency list per network
+def create_local_random_dag(num_leaves: int, num_reticulation: int, num_dataset: int, seed=None,
+                            **generator_options) -> str:
+    input_dir = random_networks_dir(num_leaves, num_reticulation)
+    os.makedirs(input_dir, exist_ok=True)
+    networks = generate_random_networks(num_leaves, num_reticulation, num_dataset, seed, **generator_options)
+    for network_name, network in networks:
+        sources, targets = network.edges()
+        with open(os.path.join(input_dir, network_name + '.txt'), 'w') as fd:
+            fd.writelines(f"{network.label(s)} {network.label(t)}\n" for s, t in zip(sources, targets))
     return input_dir
 
 
@@ -106,18 +344,111 @@ def main():
                         help="num of random graphs to generate", const=1, default=10, type=int)
     parser.add_argument('--dir', nargs='?', dest='dir', action='store',
                         help="Directory containing either NetworkX Adjacency List or Newick formatted graphs", type=str)
+    parser.add_argument('--pack', nargs='?', dest='pack', action='store', type=str,
+                        help="pack the networks of --dir into this corpus file, which --dir can then point to")
     parser.add_argument('--newick', '-n', dest='newick', action='store_true',
                         help='Identify the input is Newick data')
+    parser.add_argument('--jobs', '-j', nargs='?', dest='jobs', action='store',
+                        help="number of worker processes used to analyze the networks", const=os.cpu_count(),
+                        default=1, type=int)
+    parser.add_argument('--metrics', '-m', nargs='+', dest='metrics', action='store', choices=list(METRICS),
+                        help="only compute these metrics.csv columns, plus whatever they depend on",
+                        default=list(METRICS))
     group.add_argument('--generate', dest='generate', action='store_true',
-                       help="Generate a new folder with random binary phylogenetic networks and collect metrics")
+                       help="Generate random binary phylogenetic networks and collect metrics as they are generated")
+    parser.add_argument('--generator', nargs='?', dest='generator', action='store', choices=['c', 'numpy'],
+                        help="generate the networks with binary_ntk_generator or in memory with NumPy",
+                        default='c')
+    parser.add_argument('--tree-child', dest='tree_child', action='store_true',
+                        help="only generate tree-child networks, needs --generator numpy")
+    parser.add_argument('--contraction', nargs='?', dest='contraction', action='store', type=float, default=0.0,
+                        help="probability to contract each tree edge to make non-binary networks, "
+                             "needs --generator numpy")
+    parser.add_argument('--seed', nargs='?', dest='seed', action='store', type=int,
+                        help="seed of the random network generator, defaults to the current time")
+    parser.add_argument('--save-networks', dest='save_networks', action='store_true',
+                        help="also save the generated networks into a new folder, one adjacency list per network")
+    parser.add_argument('--cache', nargs='?', dest='cache', action='store', type=str, const=MEMORY,
+                        help="reuse the metrics of networks isomorphic to one analyzed before, kept in this SQLite "
+                             "database across runs, or only in memory if no database is given")
+    parser.add_argument('--stages', dest='stages', action='store_true',
+                        help="add the wall time of every stage of every network as extra metrics.csv columns")
+    parser.add_argument('--stage-memory', dest='stage_memory', action='store_true',
+                        help="also add the peak allocation of every stage, traced with tracemalloc, "
+                             "which slows the stages down so their wall times include the tracing")
+    parser.add_argument('--tree-cover-seconds', nargs='?', dest='tree_cover_seconds', action='store', type=float,
+                        default=TREE_COVER_SECONDS,
+                        help="search for the minimum rooted_tree cover of every network for at most this many "
+                             "seconds, and report the smallest cover found in time, 60 by default")
+    parser.add_argument('--svg', dest='svg', action='store_true',
+                        help="draw the images as SVG with a built-in layered layout, written by a background thread, "
+                             "instead of PNGs with graphviz and matplotlib")
+    parser.add_argument('--fresh', dest='fresh', action='store_true',
+                        help="start over instead of resuming the run in the images directory, which skips the "
+                             "networks it already did whose file did not change since")
+    parser.add_argument('--output-format', nargs='?', dest='output_format', action='store', choices=FORMATS,
+                        default='csv',
+                        help="write the results to metrics.csv, as NDJSON to stdout, or to metrics.parquet or "
+                             "metrics.arrow with pyarrow")
+    parser.add_argument('--artifacts', dest='artifacts', action='store_true',
+                        help="save what the images are drawn from to <images>/artifacts instead of drawing them, "
+                             "for the render subcommand to draw any of them later")
+    parser.add_argument('--log-level', nargs='?', dest='log_level', action='store', default='WARNING',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="logging level, DEBUG traces how enum_trees builds every tree")
+    parser.add_argument('--profile', nargs='?', dest='profile', action='store', type=int, const=10, default=0,
+                        help="profile the K slowest networks again under cProfile once the run is done, "
+                             "and write a hotspot report of the treespace_metrics functions, 10 by default")
+    parser.add_argument('--profile-memory', dest='profile_memory', action='store_true',
+                        help="also save a tracemalloc snapshot of every profiled network")
+
+    commands = parser.add_subparsers(dest='command')
+    render = commands.add_parser('render', help="draw the images of networks from the artifacts of a run "
+                                                "with --artifacts")
+    render.add_argument('locations', nargs='+',
+                        help="artifact files, or directories of them such as <images>/artifacts")
+    render.add_argument('--networks', nargs='+', dest='networks',
+                        help="only draw the networks whose name matches one of these patterns, such as 'random-1*'")
+    render.add_argument('--output', '-o', dest='output', type=str,
+                        help="directory to draw the images in, the images directory of the run by default")
+    render.add_argument('--jobs', '-j', nargs='?', dest='jobs', action='store', const=os.cpu_count(), default=1,
+                        type=int, help="number of worker processes used to draw the images")
+    render.add_argument('--svg', dest='svg', action='store_true', help="draw SVG images instead of PNGs")
 
     args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format='%(levelname)s %(name)s: %(message)s')
+    if args.command == 'render':
+        paths = find_artifacts(args.locations, args.networks)
+        images = render_artifacts(paths, args.output, args.jobs, args.svg)
+        print(f"Drew {len(images)} images of {len(paths)} networks")
+        return
+    if args.generator != 'numpy' and (args.tree_child or args.contraction):
+        parser.error("--tree-child and --contraction need --generator numpy")
+    stages = args.stages or args.stage_memory
+    generator_options = {'generator': args.generator, 'tree_child': args.tree_child, 'contraction': args.contraction}
 
-    if args.generate:
-        new_dir = create_local_random_dag(args.leaves, args.num_reticulation, args.num_dataset)
-        analyze_generated_graphs(new_dir, False, args.draw)
+    if args.pack is not None:
+        if args.generate:
+            count = write_corpus(args.pack, generate_random_networks(args.leaves, args.num_reticulation,
+                                                                     args.num_dataset, args.seed, **generator_options))
+        else:
+            count = pack_corpus(args.dir, args.pack, args.newick)
+        print(f"Packed {count} networks into {args.pack}")
+    elif args.generate and args.save_networks:
+        new_dir = create_local_random_dag(args.leaves, args.num_reticulation, args.num_dataset, args.seed,
+                                          **generator_options)
+        analyze_generated_graphs(new_dir, False, args.draw, args.jobs, args.metrics, args.cache, stages,
+                                 args.profile, args.profile_memory, args.tree_cover_seconds, args.svg,
+                                 args.artifacts, args.output_format, args.fresh, args.stage_memory)
+    elif args.generate:
+        analyze_random_networks(args.leaves, args.num_reticulation, args.num_dataset, args.draw, args.jobs,
+                                args.metrics, args.seed, args.cache, stages, args.profile, args.profile_memory,
+                                args.tree_cover_seconds, args.svg, args.artifacts, args.output_format,
+                                args.stage_memory, **generator_options)
     else:
-        analyze_generated_graphs(args.dir, args.newick, args.draw)
+        analyze_generated_graphs(args.dir, args.newick, args.draw, args.jobs, args.metrics, args.cache,
+                                 stages, args.profile, args.profile_memory, args.tree_cover_seconds, args.svg,
+                                 args.artifacts, args.output_format, args.fresh, args.stage_memory)
 
 
 if __name__ == '__main__':
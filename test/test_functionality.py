@@ -1,18 +1,247 @@
+import io
+import json
+import os
+import shutil
+import tempfile
 import unittest
-from run_treespace import analyze_generated_graphs, create_local_random_dag
+from contextlib import redirect_stdout, redirect_stderr
+from xml.etree import ElementTree
+from run_treespace import analyze_generated_graphs, create_local_random_dag, analyze_random_networks
+from run_treespace import generate_random_networks, analyze_in_order, WINDOW_PER_JOB
+from benchmarks.run_benchmarks import run_benchmarks, compare, uncached, BENCHMARKS
+from treespace_metrics.cache import ResultCache
+from treespace_metrics.analysis import METRICS
+from treespace_metrics.artifacts import ARTIFACT_DIR, find_artifacts, render_artifacts
+from treespace_metrics.corpus import pack_corpus, Corpus
+from treespace_metrics.generator import random_network
+from treespace_metrics.profiling import SlowestNetworks
+from treespace_metrics.stages import STAGES, columns as stage_columns
 
 
 class TestTreespace(unittest.TestCase):
 
     def test_using_networks(self):
-        analyze_generated_graphs("Graph", is_newick=False, draw_image=True)
+        analyze_generated_graphs("Graph", is_newick=False, draw_image=True, fresh=True)
+
+    def test_using_networks_in_parallel(self):
+        analyze_generated_graphs("Graph", is_newick=False, draw_image=False, jobs=2, fresh=True)
+        with open(os.path.join("Graph", "images", "metrics.csv"), 'r') as fd:
+            rows = fd.read().splitlines()
+        with open(os.path.join("test", "answers.csv"), 'r') as fd:
+            answers = {line.split(',')[0]: line.split(',')[1:5] for line in fd.read().splitlines()[1:]}
+        graphs = [row.split(',')[0] for row in rows[1:]]
+        assert graphs == sorted(answers)
+        for row in rows[1:]:
+            row = row.split(',')
+            assert row[1:5] == answers[row[0]]
+
+    def test_using_packed_corpus(self):
+        with tempfile.TemporaryDirectory() as directory:
+            corpus_file = os.path.join(directory, "Graph.corpus")
+            assert pack_corpus("Graph", corpus_file) == 6
+            assert Corpus(corpus_file).names == sorted(f.split('.')[0] for f in os.listdir("Graph")
+                                                       if os.path.isfile(os.path.join("Graph", f)))
+            analyze_generated_graphs(corpus_file, is_newick=False, draw_image=False, jobs=2)
+            with open(os.path.join(directory, "Graph-images", "metrics.csv"), 'r') as fd:
+                rows = fd.read().splitlines()
+            # Run again, the unchanged corpus is resumed without analyzing a network
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                analyze_generated_graphs(corpus_file, is_newick=False, draw_image=False, jobs=2)
+            assert "Opening" not in stderr.getvalue()
+            with open(os.path.join(directory, "Graph-images", "metrics.csv"), 'r') as fd:
+                assert fd.read().splitlines() == rows
+        with open(os.path.join("test", "answers.csv"), 'r') as fd:
+            answers = {line.split(',')[0]: line.split(',')[1:5] for line in fd.read().splitlines()[1:]}
+        assert len(rows) == len(answers) + 1
+        for row in rows[1:]:
+            row = row.split(',')
+            assert row[1:5] == answers[row[0]]
+
+    def test_using_result_cache(self):
+        with open(os.path.join("test", "answers.csv"), 'r') as fd:
+            answers = {line.split(',')[0]: line.split(',')[1:5] for line in fd.read().splitlines()[1:]}
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "cache.sqlite")
+            # The second run reads every network from the cache the first run filled
+            for jobs in (2, 1):
+                analyze_generated_graphs("Graph", is_newick=False, draw_image=False, jobs=jobs, cache=database,
+                                         fresh=True)
+                with open(os.path.join("Graph", "images", "metrics.csv"), 'r') as fd:
+                    rows = fd.read().splitlines()
+                assert len(rows) == len(answers) + 1
+                for row in rows[1:]:
+                    row = row.split(',')
+                    assert row[1:5] == answers[row[0]]
+            assert len(ResultCache(database)) == len(answers)
+
+    def test_benchmarks(self):
+        current = run_benchmarks(leaves=(10,), reticulations=(3,), repeat=1)
+        assert [record['benchmark'] for record in current['results']] == list(BENCHMARKS) + ['parse_newick']
+        assert not any(row[-1] for row in compare(current, current))
+        # A baseline twice as fast and small flags every measurement slow enough to be trusted
+        baseline = {'results': [dict(record, seconds=record['seconds'] / 2, peak_bytes=record['peak_bytes'] / 2)
+                                for record in current['results'] if 'error' not in record]}
+        assert all(row[-1] for row in compare(baseline, current))
+        # Every run computes the node classification again
+        network = random_network(10, 3, 2017)
+        assert network.classification is not None and 'classification' not in vars(uncached(network))
+
+    def test_svg_images(self):
+        names = sorted(f.split('.')[0] for f in os.listdir("Graph") if os.path.isfile(os.path.join("Graph", f)))
+        suffixes = ['', '-MAX-CST', '-francis-bipartite', '-initial-disjoint-paths', '-spanning-tree-with-leaves']
+        for jobs in (1, 2):
+            analyze_generated_graphs("Graph", is_newick=False, draw_image=True, jobs=jobs, svg=True, fresh=True)
+            images = os.listdir(os.path.join("Graph", "images"))
+            svgs = sorted(name + suffix + '.svg' for name in names for suffix in suffixes)
+            assert sorted(f for f in images if f.endswith('.svg')) == svgs
+            assert not any(f.endswith('.png') for f in images)
+            for image in images:
+                if image.endswith('.svg'):
+                    ElementTree.parse(os.path.join("Graph", "images", image))
+
+    def test_rendering_artifacts(self):
+        names = sorted(f.split('.')[0] for f in os.listdir("Graph") if os.path.isfile(os.path.join("Graph", f)))
+        suffixes = ['', '-MAX-CST', '-francis-bipartite', '-initial-disjoint-paths', '-spanning-tree-with-leaves']
+        analyze_generated_graphs("Graph", is_newick=False, draw_image=True, jobs=2, artifacts=True, fresh=True)
+        artifact_dir = os.path.join("Graph", "images", ARTIFACT_DIR)
+        assert not any(f.endswith('.png') for f in os.listdir(os.path.join("Graph", "images")))
+        assert sorted(os.listdir(artifact_dir)) == [name + '.json.gz' for name in names]
+
+        # Only the chosen networks are drawn, with the names a run with --draw gives their images
+        paths = find_artifacts([artifact_dir], ['Francis_*', 'tree_based'])
+        assert [os.path.basename(path) for path in paths] == ['Francis_2.json.gz', 'tree_based.json.gz']
+        for svg, extension in ((False, '.png'), (True, '.svg')):
+            with tempfile.TemporaryDirectory() as output_dir:
+                render_artifacts(paths, output_dir, jobs=2, svg=svg)
+                assert sorted(os.listdir(output_dir)) == sorted(name + suffix + extension
+                                                                for name in ('Francis_2', 'tree_based')
+                                                                for suffix in suffixes)
+        render_artifacts(find_artifacts(paths[:1]))
+        assert os.path.isfile(os.path.join("Graph", "images", "Francis_2-MAX-CST.png"))
+
+    def test_ndjson_results(self):
+        with open(os.path.join("test", "answers.csv"), 'r') as fd:
+            answers = {line.split(',')[0]: line.split(',')[1:5] for line in fd.read().splitlines()[1:]}
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            analyze_generated_graphs("Graph", is_newick=False, draw_image=False, jobs=2, output_format='ndjson',
+                                     fresh=True)
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        assert [record['graph'] for record in records] == sorted(answers)
+        for record in records:
+            assert [int(record[column]) for column in METRICS] == [int(value) for value in answers[record['graph']]]
+        assert not os.path.exists(os.path.join("Graph", "images", "metrics.csv"))
+
+    def test_stage_columns(self):
+        for stage_memory in (False, True):
+            analyze_generated_graphs("Graph", is_newick=False, draw_image=True, stages=True, fresh=True,
+                                     stage_memory=stage_memory)
+            with open(os.path.join("Graph", "images", "metrics.csv"), 'r') as fd:
+                rows = [row.split(',') for row in fd.read().splitlines()]
+            assert rows[0] == ['graph'] + list(METRICS) + ['rooted_tree_optimal'] + stage_columns(stage_memory)
+            for row in rows[1:]:
+                stages = dict(zip(rows[0][len(METRICS) + 2:], row[len(METRICS) + 2:]))
+                assert len(stages) == (2 if stage_memory else 1) * len(STAGES)
+                assert all(float(stages[stage + '_seconds']) > 0 for stage in STAGES)
+                if stage_memory:
+                    assert all(int(stages[stage + '_bytes']) > 0 for stage in STAGES)
+
+    def test_profile_slowest_networks(self):
+        analyze_generated_graphs("Graph", is_newick=False, draw_image=False, jobs=2, profile=2, profile_memory=True,
+                                 fresh=True)
+        profile_dir = os.path.join("Graph", "images", "profile")
+        with open(os.path.join(profile_dir, "slowest.csv"), 'r') as fd:
+            slowest = [row.split(',') for row in fd.read().splitlines()[1:]]
+        assert len(slowest) == 2 and float(slowest[0][1]) >= float(slowest[1][1])
+        for name, _ in slowest:
+            assert os.path.isfile(os.path.join(profile_dir, name + ".prof"))
+            assert os.path.isfile(os.path.join(profile_dir, name + ".tracemalloc"))
+        with open(os.path.join(profile_dir, "hotspots.csv"), 'r') as fd:
+            functions = [row.split(',')[0] for row in fd.read().splitlines()[1:]]
+        assert 'maximum_covering_subtree' in functions
+
+    def test_resuming_runs(self):
+        with open(os.path.join("test", "answers.csv"), 'r') as fd:
+            header, *answers = fd.read().splitlines()
+        answers = {line.split(',')[0]: line.split(',')[1:] for line in answers}
+        with tempfile.TemporaryDirectory() as directory:
+            input_dir = os.path.join(directory, "Graph")
+            shutil.copytree("Graph", input_dir, ignore=shutil.ignore_patterns("images"))
+            analyze_generated_graphs(input_dir, is_newick=False, draw_image=False, jobs=2)
+            metric_path = os.path.join(input_dir, "images", "metrics.csv")
+            # Only the modified network and the new ones are analyzed again, even one named like another
+            tree_based = os.path.join(input_dir, "tree_based.txt")
+            with open(tree_based, 'r') as fd:
+                text = fd.read()
+            with open(tree_based, 'w') as fd:
+                fd.write(text.replace("L1", "L5"))
+            # A file that is only touched, or rewritten with the same network, is hashed and skipped
+            with open(os.path.join(input_dir, "edge_case.txt"), 'a') as fd:
+                fd.write("# touched\n")
+            shutil.copy(os.path.join(input_dir, "Francis_2.txt"), os.path.join(input_dir, "Francis_3.txt"))
+            shutil.copy(os.path.join(input_dir, "Francis_2.txt"), os.path.join(input_dir, "Francis_2.copy.txt"))
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                analyze_generated_graphs(input_dir, is_newick=False, draw_image=False)
+            opened = [line.split(': ')[1] for line in stderr.getvalue().splitlines() if line.startswith("Opening")]
+            assert sorted(opened) == ["Francis_2", "Francis_3", "tree_based"]
+            # The results keep every network, in file name order
+            files = sorted(f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f)))
+            names = [f.split('.')[0] for f in files]
+            with open(metric_path, 'r') as fd:
+                rows = fd.read().splitlines()
+            # Every cover of these small networks is proven minimum
+            expected = [','.join([name] + answers.get(name, answers["Francis_2"]) + ['1']) for name in names]
+            assert rows == [header + ',rooted_tree_optimal'] + expected
+            # Other settings, or fresh, start over
+            for options in ({'metrics': ['max_cst']}, {'fresh': True}):
+                stderr = io.StringIO()
+                with redirect_stderr(stderr):
+                    analyze_generated_graphs(input_dir, is_newick=False, draw_image=False, **options)
+                assert stderr.getvalue().count("Opening") == len(files)
 
     def test_using_newick_networks(self):
-        analyze_generated_graphs("Phylo", is_newick=True, draw_image=False)
+        analyze_generated_graphs("Phylo", is_newick=True, draw_image=False, fresh=True)
 
     def test_using_random_networks(self):
-        new_dir = create_local_random_dag(3, 15, 10)
-        analyze_generated_graphs(new_dir, is_newick=False, draw_image=True)
+        new_dir = create_local_random_dag(3, 15, 10, seed=2017)
+        analyze_generated_graphs(new_dir, is_newick=False, draw_image=True, fresh=True)
+
+    def test_analyze_in_order(self):
+        consumed = []
+
+        def networks():
+            for network in range(-50, 0):
+                consumed.append(network)
+                yield network
+
+        # The input is read as the workers get to it, with a bounded number of networks in flight
+        results = []
+        for network, result in analyze_in_order(networks(), abs, jobs=2):
+            assert len(consumed) <= len(results) + 1 + WINDOW_PER_JOB * 2
+            results.append((network, result))
+        assert results == [(network, -network) for network in range(-50, 0)]
+
+        # Only the slowest inputs are kept for profiling, however long the stream
+        slowest = SlowestNetworks(3)
+        for network, result in analyze_in_order(networks(), abs, jobs=2):
+            slowest.add(float(result), str(network), network)
+        assert [network for _, _, network in slowest.slowest()] == [-50, -49, -48]
+
+    def test_streaming_random_networks(self):
+        first = [(name, set(network.to_digraph().edges())) for name, network in generate_random_networks(3, 15, 5, 7)]
+        second = [(name, set(network.to_digraph().edges())) for name, network in generate_random_networks(3, 15, 5, 7)]
+        assert [name for name, _ in first] == ["00", "01", "02", "03", "04"]
+        assert first == second
+        # binary_ntk_generator only makes binary networks, it can not honor the NumPy generator options
+        with self.assertRaises(ValueError):
+            next(generate_random_networks(3, 15, 5, 7, tree_child=True))
+
+        analyze_random_networks(3, 15, 5, draw_image=False, jobs=2, seed=7)
+        with open(os.path.join("output_ret=15_leaves=3", "images", "metrics.csv"), 'r') as fd:
+            rows = fd.read().splitlines()
+        assert [row.split(',')[0] for row in rows[1:]] == ["00", "01", "02", "03", "04"]
 
 
 if __name__ == '__main__':
@@ -1,12 +1,41 @@
+import gzip
+import io
+import json
 import os
+import sqlite3
+import tempfile
+import time
 import unittest
+import numpy as np
 
 from treespace_metrics.jetten import is_tree_based
 from treespace_metrics.max_cst import maximum_covering_subtree
 from treespace_metrics.francis import vertex_disjoint_paths, rooted_spanning_tree, tree_based_network
-from treespace_metrics.utils import read_adjacency_list
-from treespace_metrics.drawing import draw_tree
-# from treespace.create_trees import enum_trees
+from treespace_metrics.utils import read_adjacency_list, classify_nodes, is_omnian, is_reticulation
+from treespace_metrics.utils import get_leaves, get_all_roots, read_compact_adjacency_list
+from treespace_metrics.drawing import draw_tree, graph_layout
+from treespace_metrics import drawing
+from treespace_metrics.svg import layered_layout, tree_svg, SVGRenderer
+from xml.etree import ElementTree
+from treespace_metrics.compact import CompactNetwork
+from treespace_metrics.jetten import jetten_edges
+from treespace_metrics.matching import maximum_bipartite_matching, ENGINES
+from treespace_metrics.max_cst import max_cst_paths
+from treespace_metrics.paths import successors_from_matching, decompose_paths
+from treespace_metrics.analysis import NetworkAnalysis
+from treespace_metrics.newick import read_newick, parse_newick
+from treespace_metrics.generator import random_network, random_networks
+from treespace_metrics.incremental import IncrementalNetwork
+from treespace_metrics.cache import ResultCache, canonical_hash
+from treespace_metrics.results import CSVSink, NDJSONSink, ArrowSink, pyarrow
+from treespace_metrics.manifest import RunManifest, resume_manifest, network_hash
+from treespace_metrics.neighborhood import evaluate_neighborhood, rearrangement_moves, apply_move
+import random
+from networkx import DiGraph, is_directed_acyclic_graph, is_arborescence
+from treespace_metrics.utils import create_dag, get_root, path_to_edges
+from Bio import Phylo
+from treespace_metrics.create_trees import enum_trees
+from treespace_metrics.tree_cover import minimum_tree_cover, greedy_tree_cover, tree_cover_lower_bound
 
 
 def read_test_answers(file_path: str) -> dict:
@@ -50,6 +79,15 @@ class TestTreespace(unittest.TestCase):
             _, eta = maximum_covering_subtree(graph, draw=True)
             assert values[1] == eta
 
+    def test_max_cst_methods(self):
+        for file_name in self.graph_files:
+            compact = CompactNetwork.from_digraph(read_adjacency_list(os.path.join(self.graph_directory, file_name)))
+            values = self.answer[file_name.split('.')[0]]
+            for method in ['scipy', 'ssp']:
+                starts, successors = max_cst_paths(compact, method=method)
+                covered = len(starts) + int((successors != -1).sum())
+                assert len(compact) - covered == values[1]
+
     def test_spanning_tree(self):
         for file_name in self.graph_files:
             graph = read_adjacency_list(os.path.join(self.graph_directory, file_name))
@@ -61,14 +99,379 @@ class TestTreespace(unittest.TestCase):
             rooted_tree = tree_based_network(graph, spanning_tree)
             draw_tree(rooted_tree)
 
-    # TODO: Technically still a WIP
-    def test_enum_tree(self):
+    def test_graph_layout_cache(self):
+        graph = read_adjacency_list(os.path.join(self.graph_directory, "justin_list.txt"))
+        drawing._layouts.clear()
+        layout = graph_layout(graph)
+        assert set(layout) == set(graph) and len(drawing._layouts) == 1
+        # A copy with other internal node labels is the same topology, so dot is not run again
+        renamed = DiGraph((f"x{u}" if graph.out_degree(u) else u, f"x{v}" if graph.out_degree(v) else v)
+                          for u, v in graph.edges())
+        relabeled = graph_layout(renamed)
+        assert len(drawing._layouts) == 1
+        assert all(relabeled[f"x{v}" if graph.out_degree(v) else v] == layout[v] for v in graph)
+        with tempfile.TemporaryDirectory() as directory:
+            draw_tree(graph, os.path.join(directory, "network"), highlight_edges=list(graph.edges())[:3])
+            draw_tree(renamed, os.path.join(directory, "renamed"), color_node_type=True)
+            assert sorted(os.listdir(directory)) == ["network.png", "renamed.png"]
+        assert len(drawing._layouts) == 1
+
+    def test_svg_renderer(self):
+        graphs = [read_adjacency_list(os.path.join(self.graph_directory, file_name)) for file_name in self.graph_files]
+        graphs += [random_network(8, 6, seed).to_digraph() for seed in range(3)]
+        renderer = SVGRenderer()
+        with tempfile.TemporaryDirectory() as directory:
+            for k, graph in enumerate(graphs):
+                positions, routes = layered_layout(graph)
+                assert set(positions) == set(graph) and set(routes) == set(graph.edges())
+                # Every edge points down, and no two nodes overlap
+                assert all(positions[u][1] < positions[v][1] for u, v in graph.edges())
+                assert len(set(positions.values())) == len(graph)
+                assert all(route[0] == positions[u] and route[-1] == positions[v] for (u, v), route in routes.items())
+                _, paths = vertex_disjoint_paths(graph)
+                renderer.render(os.path.join(directory, str(k)), tree_svg, graph, str(k), path_to_edges(paths), True)
+            renderer.close()
+            for k, graph in enumerate(graphs):
+                root = ElementTree.parse(os.path.join(directory, f"{k}.svg")).getroot()
+                circles = root.findall('.//{http://www.w3.org/2000/svg}circle')
+                assert len(circles) == len(graph)
+
+    def test_compact_network(self):
         for file_name in self.graph_files:
             graph = read_adjacency_list(os.path.join(self.graph_directory, file_name))
+            loaded = read_compact_adjacency_list(os.path.join(self.graph_directory, file_name))
             file_name = file_name.split('.')[0]
             values = self.answer[file_name]
-    #        trees = enum_trees(graph, os.path.join(self.graph_directory, file_name), draw=True)
-    #        assert values[3] == len(trees)
+            compact = CompactNetwork.from_digraph(graph)
+            assert set(compact.to_digraph().edges()) == set(graph.edges())
+            assert loaded.labels == compact.labels
+            assert set(loaded.to_digraph().edges()) == set(graph.edges())
+            assert int(is_tree_based(compact)) == values[0]
+            _, eta = maximum_covering_subtree(compact)
+            assert values[1] == eta
+            missing_v1, paths = vertex_disjoint_paths(compact)
+            assert values[2] == missing_v1
+            assert sorted(node for path in paths for node in path) == sorted(graph.nodes())
+            rooted_tree = tree_based_network(compact, rooted_spanning_tree(compact, paths))
+            assert set(graph.nodes()) <= set(rooted_tree.nodes())
+
+    def test_read_compressed_adjacency_list(self):
+        with open(os.path.join(self.graph_directory, 'Francis_2.txt')) as fd:
+            text = fd.read()
+        graph = read_adjacency_list(os.path.join(self.graph_directory, 'Francis_2.txt'))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'Francis_2.txt.gz')
+            with gzip.open(path, 'wt') as fd:
+                fd.write('# Francis_2\n\n' + text.replace(' ', '\t'))
+            assert set(read_adjacency_list(path).edges()) == set(graph.edges())
+            assert set(read_compact_adjacency_list(path).to_digraph().edges()) == set(graph.edges())
+            # A line of three labels is not paired up with the next one, even without comments
+            path = os.path.join(directory, 'malformed.txt')
+            with open(path, 'w') as fd:
+                fd.write('r a b\nL1\n')
+            self.assertRaises(ValueError, read_adjacency_list, path)
+
+    def test_newick(self):
+        networks = list(parse_newick("((a,(b)h1#H1)x,(#H1,c)y)r;\n(d,e)[a comment]f:0.5;"))
+        assert len(networks) == 2
+        assert set(networks[0].edges()) == {('r', 'x'), ('r', 'y'), ('x', 'a'), ('x', 'h1#H1'), ('y', 'h1#H1'),
+                                            ('y', 'c'), ('h1#H1', 'b')}
+        assert set(networks[1].edges()) == {('f', 'd'), ('f', 'e')}
+        # A quote inside a comment does not start a quoted label, and a network without its ';' is an error
+        text = "((a,b)x[it's a note],'c''s')r;"
+        assert set(next(parse_newick(text)).edges()) == {('r', 'x'), ('r', "c's"), ('x', 'a'), ('x', 'b')}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'comment.tree')
+            with open(path, 'w') as fd:
+                fd.write(text + '\n')
+            assert set(read_newick(path).edges()) == set(next(parse_newick(text)).edges())
+        self.assertRaises(ValueError, list, parse_newick("(a,b)r;(c,d)"))
+
+        # The networks match the ones Biopython reads, up to the labels of unnamed internal nodes
+        phylo_directory = "Phylo"
+        for file_name in os.listdir(phylo_directory):
+            if not os.path.isfile(os.path.join(phylo_directory, file_name)):
+                continue
+            old = create_dag(Phylo.to_networkx(Phylo.read(os.path.join(phylo_directory, file_name), 'newick')))
+            new = read_newick(os.path.join(phylo_directory, file_name), compact=True)
+            assert (len(new), new.num_edges) == (old.number_of_nodes(), old.number_of_edges())
+            assert NetworkAnalysis(new).metrics() == NetworkAnalysis(old).metrics()
+
+    def test_random_networks(self):
+        for num_leaves, num_reticulations, tree_child, contraction in [(2, 1, False, 0.0), (3, 15, False, 0.0),
+                                                                       (10, 9, True, 0.0), (30, 20, True, 0.5)]:
+            for seed in range(10):
+                network = random_network(num_leaves, num_reticulations, seed, tree_child, contraction)
+                classification = classify_nodes(network)
+                assert is_directed_acyclic_graph(network.to_digraph())
+                assert classification.root.sum() == 1 and classification.leaf.sum() == num_leaves
+                assert classification.reticulation.sum() == num_reticulations
+                if contraction == 0:
+                    assert (classification.out_degree[classification.tree | classification.root] == 2).all()
+                if tree_child:
+                    sources, targets = network.edges()
+                    tree_children = np.bincount(sources, weights=~classification.reticulation[targets],
+                                                minlength=len(network))
+                    assert (tree_children[~classification.leaf] > 0).all()
+
+        # The most reticulations a tree-child network can have, where the sampled batches often stall
+        for num_leaves in [18, 26, 33, 34, 36]:
+            for seed in range(5):
+                network = random_network(num_leaves, num_leaves - 1, seed, tree_child=True)
+                assert classify_nodes(network).reticulation.sum() == num_leaves - 1
+        with self.assertRaises(ValueError):
+            random_network(5, 5, tree_child=True)
+
+        # The networks only depend on the seed, not on how they are split between workers
+        one_worker = [(name, network.labels, network.edges()[1].tolist())
+                      for name, network in random_networks(6, 5, 3, seed=9)]
+        three_workers = [(name, network.labels, network.edges()[1].tolist()) for worker in range(3)
+                         for name, network in random_networks(6, 5, 3, seed=9, worker=worker, workers=3)]
+        assert sorted(one_worker) == sorted(three_workers)
+
+    def test_incremental_network(self):
+        rng = random.Random(2017)
+        for seed in range(20):
+            network = random_network(rng.randint(2, 10), rng.randint(0, 8), seed, contraction=0.3 * (seed % 2))
+            incremental = IncrementalNetwork(network)
+            labels = network.labels
+            for _ in range(40):
+                sources, targets = incremental.to_compact().edges()
+                if len(sources) and rng.random() < 0.5:
+                    edge = rng.randrange(len(sources))
+                    incremental.remove_edge(labels[sources[edge]], labels[targets[edge]])
+                else:
+                    # Node ids go down from the root, so edges from smaller to larger ids keep the network acyclic
+                    u, v = sorted(rng.sample(range(len(labels)), 2))
+                    incremental.add_edge(labels[u], labels[v])
+                analysis = NetworkAnalysis(incremental.to_compact())
+                assert incremental.unmatched_omnians == len(analysis.unmatched_omnians)
+                assert incremental.tree_based == analysis.tree_based
+                assert incremental.missing_v1 == analysis.missing_v1
+
+    def test_neighborhood(self):
+        for seed in range(6):
+            network = random_network(4 + seed, 3 + seed, seed, contraction=0.3 * (seed % 2))
+            graph = network.to_digraph()
+            results = evaluate_neighborhood(network)
+            assert [result.move for result in results] == list(rearrangement_moves(graph))
+            rnni = {result.move for result in evaluate_neighborhood(network, rnni=True)}
+            assert rnni <= {result.move for result in results}
+            for result in results:
+                neighbor = apply_move(graph, result.move)
+                assert is_directed_acyclic_graph(neighbor)
+                assert neighbor.number_of_edges() == graph.number_of_edges()
+                analysis = NetworkAnalysis(neighbor)
+                assert result.tree_based == analysis.tree_based
+                assert result.unmatched_omnians == len(analysis.unmatched_omnians)
+                assert result.missing_v1 == analysis.missing_v1
+                assert result.eta == maximum_covering_subtree(neighbor)[1]
+
+    def test_result_cache(self):
+        rng = np.random.default_rng(2017)
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "cache.sqlite")
+            cache = ResultCache(database)
+            for file_name in self.graph_files:
+                network = read_compact_adjacency_list(os.path.join(self.graph_directory, file_name))
+                # Shuffle the node ids and rename the internal nodes, the network stays the same
+                permutation = rng.permutation(len(network))
+                labels = [None] * len(network)
+                for node, label in enumerate(network.labels):
+                    labels[permutation[node]] = label if network.out_degree[node] == 0 else f"internal-{label}"
+                sources, targets = network.edges()
+                isomorphic = CompactNetwork(labels, permutation[sources], permutation[targets])
+                assert canonical_hash(network) == canonical_hash(isomorphic) is not None
+
+                expected = NetworkAnalysis(network, cache=cache).metrics()
+                cached = NetworkAnalysis(isomorphic, cache=ResultCache(database))
+                assert cached.metrics() == expected
+                assert cached.cached is not None
+                assert cached.missing_v1 == NetworkAnalysis(isomorphic).missing_v1
+                # The cached path cover is translated to the nodes of the isomorphic network
+                graph = isomorphic.to_digraph()
+                paths = cached.disjoint_paths
+                assert sorted(node for path in paths for node in path) == sorted(labels)
+                assert all(graph.has_edge(u, v) for path in paths for u, v in zip(path, path[1:]))
+            assert len(ResultCache(database)) == len(self.graph_files)
+            cache.close()
+
+            # The library functions read the answers of an isomorphic network from the cache
+            cache = ResultCache()
+            for file_name in self.graph_files:
+                network = read_compact_adjacency_list(os.path.join(self.graph_directory, file_name))
+                permutation = rng.permutation(len(network))
+                sources, targets = network.edges()
+                isomorphic = CompactNetwork([network.labels[node] for node in np.argsort(permutation)],
+                                            permutation[sources], permutation[targets])
+                tree_based = is_tree_based(network, cache=cache)
+                missing_v1, _ = vertex_disjoint_paths(network, cache=cache)
+                entry = cache.get(canonical_hash(isomorphic))
+                assert entry.metrics == {'is_tree_based': int(tree_based), 'spanning_tree': missing_v1}
+                assert is_tree_based(isomorphic, cache=cache) == tree_based
+                cached_v1, paths = vertex_disjoint_paths(isomorphic, cache=cache)
+                assert cached_v1 == missing_v1
+                graph = isomorphic.to_digraph()
+                assert sorted(node for path in paths for node in path) == sorted(isomorphic.labels)
+                assert all(graph.has_edge(u, v) for path in paths for u, v in zip(path, path[1:]))
+            # A database of an older version, such as one with the rooted_tree of the path covers, is emptied
+            connection = sqlite3.connect(database)
+            connection.execute('PRAGMA user_version = 1')
+            connection.commit()
+            connection.close()
+            assert len(ResultCache(database)) == 0
+        hashes = {canonical_hash(network) for network in (random_network(8, 4, seed) for seed in range(10))}
+        assert len(hashes) == 10
+
+    def test_result_sinks(self):
+        header = ['graph', 'is_tree_based', 'max_cst', 'parse_seconds', 'parse_bytes']
+        rows = [[f"network-{i}", i % 2, i, f"{i / 8:.6f}", 64 * i] for i in range(5)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.csv")
+            # Rows are only written once a batch is full, and the rest when the sink is closed
+            with CSVSink(path, header, flush_rows=2) as sink:
+                for row in rows:
+                    sink.write(row)
+                with open(path, 'r') as fd:
+                    assert len(fd.read().splitlines()) == 1 + 4
+            with open(path, 'r') as fd:
+                assert fd.read().splitlines() == [','.join(header)] + [','.join(map(str, row)) for row in rows]
+            stream = io.StringIO()
+            with NDJSONSink(header, stream, flush_rows=2) as sink:
+                for row in rows:
+                    sink.write(row)
+            records = [json.loads(line) for line in stream.getvalue().splitlines()]
+            assert records[3] == {'graph': 'network-3', 'is_tree_based': True, 'max_cst': 3, 'parse_seconds': 0.375,
+                                  'parse_bytes': 192}
+            if pyarrow is None:
+                self.assertRaises(ImportError, ArrowSink, os.path.join(directory, "metrics.parquet"), header)
+            else:
+                with ArrowSink(os.path.join(directory, "metrics.parquet"), header, flush_rows=2) as sink:
+                    for row in rows:
+                        sink.write(row)
+                table = pyarrow.parquet.read_table(os.path.join(directory, "metrics.parquet"))
+                assert table.to_pylist() == records
+
+    def test_run_manifest(self):
+        settings = {'metrics': ['max_cst']}
+        with tempfile.TemporaryDirectory() as directory:
+            assert resume_manifest(directory, settings) is None
+            manifest = RunManifest(directory, settings)
+            manifest.finish('a', 'stamp-a', 'hash-a', ['a', 1])
+            manifest.finish('b', 'stamp-b', 'hash-b', ['b', 2])
+            manifest.finish('d', 'stamp-d', 'hash-d', ['d', 4])
+            manifest.commit()
+            manifest.finish('c', 'stamp-c', 'hash-c', ['c', 3])
+            manifest._connection.close()
+            # c was never committed, a network is only hashed when its stamp changed: b was touched, d changed
+            manifest = resume_manifest(directory, settings)
+            hashed = []
+            assert manifest.done('a', 'stamp-a', lambda: hashed.append('a')) and manifest.row('a') == ['a', 1]
+            assert manifest.done('b', 'stamp-b2', lambda: 'hash-b')
+            assert not manifest.done('c', 'stamp-c', lambda: hashed.append('c'))
+            assert not manifest.done('d', 'stamp-d2', lambda: 'hash-d2')
+            assert hashed == []
+            manifest.close()
+            # The new stamp of b was recorded, so it is not hashed again
+            manifest = resume_manifest(directory, settings)
+            assert manifest.done('b', 'stamp-b2', lambda: hashed.append('b'))
+            assert hashed == []
+            manifest.close()
+            assert resume_manifest(directory, {'metrics': ['rooted_tree']}) is None
+        network = random_network(8, 4, 3)
+        assert network_hash(network) == network_hash(random_network(8, 4, 3)) != network_hash(random_network(8, 4, 4))
+
+    def test_classify_nodes(self):
+        for file_name in self.graph_files:
+            graph = read_adjacency_list(os.path.join(self.graph_directory, file_name))
+            compact = CompactNetwork.from_digraph(graph)
+            classification = classify_nodes(compact)
+            for node, label in enumerate(compact.labels):
+                assert classification.reticulation[node] == is_reticulation(graph, label)
+                assert classification.omnian[node] == is_omnian(graph, label)
+                assert classification.leaf[node] == (graph.out_degree(label) == 0)
+                assert classification.tree[node] == (graph.in_degree(label) == 1 and graph.out_degree(label) != 0)
+            assert get_leaves(compact) == get_leaves(graph)
+            assert get_all_roots(compact) == get_all_roots(graph)
+
+    def test_matching_engines(self):
+        for file_name in self.graph_files:
+            compact = CompactNetwork.from_digraph(read_adjacency_list(os.path.join(self.graph_directory, file_name)))
+            n = len(compact)
+            for left, right in [jetten_edges(compact), compact.edges()]:
+                edges = set(zip(left.tolist(), right.tolist()))
+                sizes = set()
+                for method in ENGINES:
+                    mate_left, mate_right = maximum_bipartite_matching(left, right, n, n, method=method)
+                    matched = [(u, v) for u, v in enumerate(mate_left) if v != -1]
+                    assert all(edge in edges and mate_right[edge[1]] == edge[0] for edge in matched)
+                    sizes.add(len(matched))
+                assert len(sizes) == 1
+
+    def test_decompose_paths(self):
+        successors, predecessors = successors_from_matching([2, -1, 4, 1, -1], 5)
+        assert predecessors.tolist() == [-1, 3, 0, -1, 2]
+        assert decompose_paths(successors) == [[0, 2, 4], [3, 1]]
+
+    def test_network_analysis(self):
+        for file_name in self.graph_files:
+            graph = read_adjacency_list(os.path.join(self.graph_directory, file_name))
+            values = self.answer[file_name.split('.')[0]]
+            for method in ENGINES:
+                analysis = NetworkAnalysis(graph, matching_method=method)
+                assert analysis.metrics(['is_tree_based', 'spanning_tree']) == [values[0], values[2]]
+                assert 'max_cst' not in analysis.__dict__
+                assert analysis.metrics(['max_cst']) == [values[1]]
+
+    def test_tree_cover(self):
+        graphs = []
+        for file_name in self.graph_files:
+            graph = read_adjacency_list(os.path.join(self.graph_directory, file_name))
+            assert NetworkAnalysis(graph).metrics(['rooted_tree']) == [self.answer[file_name.split('.')[0]][3]]
+            graphs.append(graph)
+        graphs += [random_network(6 + seed, 4 * seed, seed, contraction=0.2 * (seed % 2)).to_digraph()
+                   for seed in range(8)]
+        for graph in graphs:
+            cover = minimum_tree_cover(graph, jobs=2)
+            assert cover.optimal and tree_cover_lower_bound(graph) <= cover.lower_bound == len(cover.trees)
+            assert len(cover.trees) <= len(greedy_tree_cover(graph))
+            # Every tree is a base tree, and together they cover every node
+            for tree in cover.trees:
+                assert is_arborescence(tree)
+                assert get_root(tree) == get_root(graph)
+                assert all(graph.has_edge(u, v) for u, v in tree.edges())
+                assert {v for v in tree if tree.out_degree(v) == 0} == get_leaves(graph)
+            assert set().union(*cover.trees) == set(graph)
+            # Out of time, it still returns a cover, that is only minimum if it meets the lower bound
+            anytime = minimum_tree_cover(graph, time_limit=0)
+            assert set().union(*anytime.trees) == set(graph)
+            assert anytime.lower_bound <= len(cover.trees) <= len(anytime.trees)
+            assert anytime.optimal == (len(anytime.trees) == anytime.lower_bound)
+            # The results mark a rooted_tree that is not known to be minimum
+            analysis = NetworkAnalysis(graph, tree_cover_seconds=0)
+            assert analysis.results(['rooted_tree']) == [analysis.rooted_tree, int(analysis.tree_cover.optimal)]
+        # The bounds and heuristics stop at the deadline too, so a large network keeps to its budget
+        network = random_network(400, 2000, 0)
+        start = time.perf_counter()
+        anytime = minimum_tree_cover(network, time_limit=1.0)
+        assert time.perf_counter() - start < 10
+        assert np.all(np.any([[v in tree for v in network.labels] for tree in anytime.trees], axis=0))
+
+    # TODO: Technically still a WIP
+    def test_enum_tree(self):
+        # enum_trees stops after its first tree, which has to be a base tree: rooted at the root of N,
+        # made of edges of N, with exactly the leaves of N
+        graphs = [read_adjacency_list(os.path.join(self.graph_directory, file_name)) for file_name in self.graph_files]
+        graphs += [random_network(5 + seed, 3 * seed, seed, contraction=0.2 * (seed % 2)).to_digraph()
+                   for seed in range(10)]
+        for graph in graphs:
+            trees = enum_trees(graph, 'enum')
+            assert len(trees) == 1
+            for tree in trees:
+                assert is_arborescence(tree)
+                assert get_root(tree) == get_root(graph)
+                assert all(graph.has_edge(u, v) for u, v in tree.edges())
+                assert {v for v in tree if tree.out_degree(v) == 0} == get_leaves(graph)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,6 @@
+from treespace_metrics.compact import CompactNetwork, as_compact
 from treespace_metrics.drawing import draw_tree, draw_bipartite
 from treespace_metrics.francis import vertex_disjoint_paths, rooted_spanning_tree, tree_based_network
 from treespace_metrics.jetten import is_tree_based
 from treespace_metrics.max_cst import maximum_covering_subtree
+from treespace_metrics.analysis import NetworkAnalysis
@@ -0,0 +1,339 @@
+from functools import cached_property
+from typing import Union
+import numpy as np
+from networkx import DiGraph
+
+from treespace_metrics.cache import ResultCache, canonical_form
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.create_trees import enum_trees
+from treespace_metrics.drawing import draw_tree
+from treespace_metrics.francis import rooted_spanning_tree, tree_based_network, draw_francis_bipartite
+from treespace_metrics.francis import francis_bipartite_matching
+from treespace_metrics.jetten import jetten_edges, unmatched_omnians
+from treespace_metrics.matching import maximum_bipartite_matching
+from treespace_metrics.max_cst import maximum_covering_subtree, draw_max_cst
+from treespace_metrics.paths import successors_from_matching, decompose_paths
+from treespace_metrics.stages import StageRecorder, stage
+from treespace_metrics.svg import SVGRenderer, tree_svg, bipartite_svg
+from treespace_metrics.tree_cover import TreeCover, TREE_COVER_SECONDS, minimum_tree_cover
+from treespace_metrics.utils import path_to_edges
+
+# The columns of metrics.csv, in order, and the NetworkAnalysis attribute that answers each one
+METRICS = {
+    'is_tree_based': 'tree_based',
+    'max_cst': 'eta',
+    'spanning_tree': 'missing_v1',
+    'rooted_tree': 'rooted_tree',
+}
+# The column after rooted_tree that tells a minimum cover from the smallest one found in tree_cover_seconds
+ROOTED_TREE_OPTIMAL = 'rooted_tree_optimal'
+
+
+def result_columns(metrics=tuple(METRICS)) -> list:
+    """
+    Args:
+        metrics (iterable, optional): The metrics.csv columns to compute. Defaults to all of them.
+
+    Returns:
+        list: The columns of NetworkAnalysis.results, the requested METRICS in order,
+            with ROOTED_TREE_OPTIMAL after rooted_tree.
+    """
+    columns = [column for column in METRICS if column in metrics]
+    if 'rooted_tree' in columns:
+        columns.append(ROOTED_TREE_OPTIMAL)
+    return columns
+
+
+class NetworkAnalysis:
+    """
+    Computes the metrics of one phylogenetic network in a single pass.
+    Every intermediate result (leaves, root, node classification, bipartite graphs, matchings, paths)
+    is computed lazily the first time a metric needs it, and at most once,
+    so asking for a subset of the metrics only pays for what that subset depends on.
+    With a ResultCache, the metrics and the Francis path cover of a network isomorphic to an earlier one
+    are read from the cache instead. With a StageRecorder, the time of every stage is recorded,
+    and its peak allocation with memory.
+    A rooted_tree that is not known to be minimum, when the tree cover search ran out of time, is never cached.
+
+    Args:
+        network (DiGraph | CompactNetwork): The input phylogenetic network.
+        matching_method (str, optional): The matching engine from treespace_metrics.matching. Defaults to None.
+        cache (ResultCache, optional): The cache of results keyed by canonical hash. Defaults to None.
+        stages (StageRecorder, optional): The recorder of the time, and with memory the peak allocation,
+            of every stage. Defaults to None.
+        tree_cover_seconds (float, optional): The seconds the minimum tree cover may search for,
+            None to search until the cover is minimum. Defaults to TREE_COVER_SECONDS.
+    """
+    def __init__(self, network: Union[DiGraph, CompactNetwork], matching_method=None, cache: ResultCache = None,
+                 stages: StageRecorder = None, tree_cover_seconds=TREE_COVER_SECONDS):
+        self.network = network
+        self.matching_method = matching_method
+        self.cache = cache
+        self.stages = stages
+        self.tree_cover_seconds = tree_cover_seconds
+
+    @cached_property
+    def compact(self) -> CompactNetwork:
+        return as_compact(self.network)
+
+    @cached_property
+    def graph(self) -> DiGraph:
+        """The network as a networkx DiGraph, only built when drawing or enumerating trees."""
+        if isinstance(self.network, DiGraph):
+            return self.network
+        return self.compact.to_digraph()
+
+    @cached_property
+    def canonical(self):
+        """The canonical key and node ranks of the network, None without a cache or if it has no key."""
+        if self.cache is None:
+            return None
+        return canonical_form(self.compact)
+
+    @cached_property
+    def cached(self):
+        """The CacheEntry of an isomorphic network analyzed before, None if there is none."""
+        if self.canonical is None:
+            return None
+        return self.cache.get(self.canonical.key)
+
+    @cached_property
+    def leaves(self) -> np.ndarray:
+        """A boolean mask of the leaf node ids."""
+        return self.compact.out_degree == 0
+
+    @cached_property
+    def jetten_edges(self) -> tuple:
+        with stage(self.stages, 'jetten_bipartite'):
+            return jetten_edges(self.compact)
+
+    @cached_property
+    def jetten_matching(self) -> list:
+        """The reticulation node id matched to each node id in the Jetten bipartite graph, -1 if unmatched."""
+        n = len(self.compact)
+        omnians, reticulations = self.jetten_edges
+        with stage(self.stages, 'jetten_matching'):
+            mate_left, _ = maximum_bipartite_matching(omnians, reticulations, n, n, method=self.matching_method)
+        return mate_left
+
+    @cached_property
+    def unmatched_omnians(self) -> np.ndarray:
+        return unmatched_omnians(self.jetten_edges[0], self.jetten_matching)
+
+    @cached_property
+    def tree_based(self) -> bool:
+        return len(self.unmatched_omnians) == 0
+
+    @cached_property
+    def francis_matching(self) -> list:
+        """The node id matched to each node id in the Francis bipartite graph, -1 if unmatched."""
+        n = len(self.compact)
+        with stage(self.stages, 'francis_matching'):
+            sources, targets = self.compact.edges()
+            mate_left, _ = maximum_bipartite_matching(sources, targets, n, n, method=self.matching_method)
+        return mate_left
+
+    @cached_property
+    def francis_successors(self) -> tuple:
+        if self.cached is not None and self.cached.paths is not None:
+            # Rebuild the successors from the cached path cover, translated from canonical ranks to node ids
+            with stage(self.stages, 'francis_paths'):
+                n = len(self.compact)
+                node = np.argsort(self.canonical.rank)
+                successors = np.full(n, -1, dtype=np.int64)
+                predecessors = np.full(n, -1, dtype=np.int64)
+                for path in self.cached.paths:
+                    path = node[path]
+                    successors[path[:-1]] = path[1:]
+                    predecessors[path[1:]] = path[:-1]
+            return successors, predecessors
+        francis_matching = self.francis_matching
+        with stage(self.stages, 'francis_paths'):
+            return successors_from_matching(francis_matching, len(self.compact))
+
+    @cached_property
+    def missing_v1(self) -> int:
+        successors, _ = self.francis_successors
+        return int(np.count_nonzero((successors == -1) & ~self.leaves))
+
+    @cached_property
+    def disjoint_paths(self) -> list:
+        successors, predecessors = self.francis_successors
+        with stage(self.stages, 'francis_paths'):
+            return [self.compact.translate(path)
+                    for path in decompose_paths(successors, np.flatnonzero(predecessors == -1))]
+
+    @cached_property
+    def spanning_tree(self) -> DiGraph:
+        disjoint_paths = self.disjoint_paths
+        with stage(self.stages, 'spanning_tree'):
+            return rooted_spanning_tree(self.compact, disjoint_paths)
+
+    @cached_property
+    def tree_based_network(self) -> DiGraph:
+        # tree_based_network appends the new leaves to the tree it is given
+        spanning_tree = self.spanning_tree
+        with stage(self.stages, 'spanning_tree'):
+            return tree_based_network(self.compact, spanning_tree.copy())
+
+    @cached_property
+    def max_cst(self) -> tuple:
+        with stage(self.stages, 'max_cst'):
+            return maximum_covering_subtree(self.compact)
+
+    @cached_property
+    def eta(self) -> int:
+        return self.max_cst[1]
+
+    @cached_property
+    def tree_cover(self) -> TreeCover:
+        """The fewest base trees that cover every node, or the fewest found in tree_cover_seconds."""
+        eta, missing_v1 = self.eta, self.missing_v1
+        with stage(self.stages, 'tree_cover'):
+            return minimum_tree_cover(self.compact, self.tree_cover_seconds, eta=eta, missing_v1=missing_v1)
+
+    @cached_property
+    def rooted_tree(self) -> int:
+        return len(self.tree_cover.trees)
+
+    @cached_property
+    def rooted_tree_optimal(self) -> bool:
+        """Whether rooted_tree is known to be minimum, as a cached rooted_tree always is."""
+        if self.cached is not None and 'rooted_tree' in self.cached.metrics:
+            return True
+        return self.tree_cover.optimal
+
+    def enum_trees(self, graph_name: str, draw=False) -> list:
+        """
+        Run enum_trees, reusing the disjoint paths and the spanning tree that were already computed.
+
+        Args:
+            graph_name (str): The name of the graph to be drawn.
+            draw (bool, optional): Whether to draw the trees. Defaults to False.
+
+        Returns:
+            list: A list of DiGraphs, each representing a rooted tree.
+        """
+        return enum_trees(self.graph, graph_name, draw, paths=self.disjoint_paths, spanning_tree=self.spanning_tree)
+
+    def metrics(self, columns=tuple(METRICS)) -> list:
+        """
+        Compute the requested metrics, plus only the intermediates they depend on.
+
+        Args:
+            columns (iterable, optional): The metrics.csv columns to compute. Defaults to all of them.
+
+        Returns:
+            list: The value of each requested column, in the order of METRICS.
+        """
+        known = {} if self.cached is None else self.cached.metrics
+        values = {column: known[column] if column in known else int(getattr(self, attribute))
+                  for column, attribute in METRICS.items() if column in columns}
+        if self.canonical is not None:
+            paths = self._paths_to_cache()
+            exact = {column: value for column, value in values.items()
+                     if column != 'rooted_tree' or 'tree_cover' not in self.__dict__ or self.tree_cover.optimal}
+            if exact.keys() - known.keys() or paths is not None:
+                self.cache.put(self.canonical.key, exact, paths)
+        return list(values.values())
+
+    def results(self, columns=tuple(METRICS)) -> list:
+        """
+        Compute the requested metrics, as metrics does, and with rooted_tree whether it is known to be minimum.
+
+        Args:
+            columns (iterable, optional): The metrics.csv columns to compute. Defaults to all of them.
+
+        Returns:
+            list: The value of each column of result_columns.
+        """
+        values = self.metrics(columns)
+        if 'rooted_tree' in columns:
+            values.append(int(self.rooted_tree_optimal))
+        return values
+
+    def _paths_to_cache(self):
+        """The Francis path cover as lists of canonical ranks, if it was computed and is not cached yet."""
+        if 'francis_successors' not in self.__dict__ or self.cached is not None and self.cached.paths is not None:
+            return None
+        successors, predecessors = self.francis_successors
+        rank = self.canonical.rank
+        return [rank[path].tolist() for path in decompose_paths(successors, np.flatnonzero(predecessors == -1))]
+
+    def artifact(self, columns=tuple(METRICS)) -> dict:
+        """
+        Collect what draw draws for the computed metrics, so treespace_metrics.artifacts can draw it later:
+        the network, the Max-CST, the Francis matching, the disjoint paths and the spanning tree with leaves,
+        all as labels.
+
+        Args:
+            columns (iterable, optional): The metrics.csv columns that were computed. Defaults to all of them.
+
+        Returns:
+            dict: The lists of nodes, edges and paths, by name.
+        """
+        compact = self.compact
+        sources, targets = compact.edges()
+        artifact = {'nodes': list(compact.labels),
+                    'edges': list(zip(compact.translate(sources), compact.translate(targets)))}
+        if 'max_cst' in columns:
+            artifact['max_cst'] = list(self.max_cst[0].edges())
+        if 'spanning_tree' in columns:
+            successors = self.francis_successors[0]
+            matched = np.flatnonzero(successors != -1)
+            artifact['matching'] = list(zip(compact.translate(matched), compact.translate(successors[matched])))
+            artifact['paths'] = self.disjoint_paths
+            artifact['spanning_tree'] = list(self.tree_based_network.edges())
+        return artifact
+
+    def draw(self, location: str, draw_image: bool, columns=tuple(METRICS), renderer: SVGRenderer = None):
+        """
+        Draw the images analyze_generated_graphs saves for a network, for the computed metrics only.
+
+        Args:
+            location (str): The path and file name prefix of the images.
+            draw_image (bool): Whether to draw the bipartite graphs and the Max-CST.
+            columns (iterable, optional): The metrics.csv columns that were computed. Defaults to all of them.
+            renderer (SVGRenderer, optional): Queue the images as SVG on this renderer instead of drawing PNGs,
+                so the stages only record the time to queue them. Defaults to None.
+        """
+        if renderer is not None:
+            self._render(location, draw_image, columns, renderer)
+            return
+        if draw_image and 'max_cst' in columns:
+            with stage(self.stages, 'draw_max_cst'):
+                draw_max_cst(self.graph, self.max_cst[0], location)
+        if 'spanning_tree' in columns:
+            if draw_image:
+                with stage(self.stages, 'draw_francis_bipartite'):
+                    draw_francis_bipartite(self.network, self.francis_successors[0], location)
+            with stage(self.stages, 'draw_disjoint_paths'):
+                draw_tree(self.graph, location + '-initial-disjoint-paths',
+                          highlight_edges=path_to_edges(self.disjoint_paths))
+            with stage(self.stages, 'draw_spanning_tree'):
+                draw_tree(self.tree_based_network, location + '-spanning-tree-with-leaves')
+
+    def _render(self, location: str, draw_image: bool, columns, renderer: SVGRenderer):
+        """The same images as draw, queued on the SVG renderer."""
+        if draw_image and 'max_cst' in columns:
+            max_cst = self.max_cst[0]
+            with stage(self.stages, 'draw_max_cst'):
+                renderer.render(location, tree_svg, self.graph, location)
+                renderer.render(location + '-MAX-CST', tree_svg, max_cst, location + '-MAX-CST')
+        if 'spanning_tree' in columns:
+            if draw_image:
+                successors = self.francis_successors[0]
+                with stage(self.stages, 'draw_francis_bipartite'):
+                    renderer.render(location + '-francis-bipartite', _francis_bipartite_svg, self.network, successors)
+            highlight_edges = path_to_edges(self.disjoint_paths)
+            with stage(self.stages, 'draw_disjoint_paths'):
+                renderer.render(location + '-initial-disjoint-paths', tree_svg, self.graph,
+                                location + '-initial-disjoint-paths', highlight_edges)
+            tree = self.tree_based_network
+            with stage(self.stages, 'draw_spanning_tree'):
+                renderer.render(location + '-spanning-tree-with-leaves', tree_svg, tree,
+                                location + '-spanning-tree-with-leaves')
+
+
+def _francis_bipartite_svg(network: Union[DiGraph, CompactNetwork], successors: np.ndarray) -> str:
+    return bipartite_svg(*francis_bipartite_matching(network, successors))
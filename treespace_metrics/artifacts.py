@@ -0,0 +1,149 @@
+import fnmatch
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from networkx import DiGraph
+
+from treespace_metrics.compact import as_compact
+from treespace_metrics.drawing import draw_tree, draw_bipartite
+from treespace_metrics.francis import francis_bipartite_matching
+from treespace_metrics.svg import tree_svg, bipartite_svg
+from treespace_metrics.utils import path_to_edges
+
+# The extension of artifact files, and the directory of the images directory they are saved in
+EXTENSION = '.json.gz'
+ARTIFACT_DIR = 'artifacts'
+
+
+def write_artifact(location: str, artifact: dict):
+    """
+    Save the artifact of a network, from NetworkAnalysis.artifact, as gzipped JSON.
+
+    Args:
+        location (str): The path and name of the artifact, without the extension.
+        artifact (dict): The artifact.
+    """
+    os.makedirs(os.path.dirname(location) or '.', exist_ok=True)
+    with gzip.open(location + EXTENSION, 'wt', encoding='utf-8') as fd:
+        json.dump(artifact, fd, separators=(',', ':'))
+
+
+def read_artifact(path: str) -> dict:
+    """
+    Args:
+        path (str): The artifact file.
+
+    Returns:
+        dict: The artifact, with its name, the file name without the extension.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as fd:
+        artifact = json.load(fd)
+    artifact['name'] = os.path.basename(path)[:-len(EXTENSION)]
+    return artifact
+
+
+def find_artifacts(locations: list, patterns=None) -> list:
+    """
+    List the artifact files of the given files and directories, keeping only the networks whose name
+    matches one of the patterns.
+
+    Args:
+        locations (list): Artifact files, or directories of artifact files.
+        patterns (list, optional): fnmatch patterns of network names, such as 'random-*'. Defaults to None, for all.
+
+    Returns:
+        list: The artifact files, sorted.
+    """
+    paths = []
+    for location in locations:
+        if os.path.isdir(location):
+            paths += [os.path.join(location, f) for f in os.listdir(location) if f.endswith(EXTENSION)]
+        else:
+            paths.append(location)
+    if patterns:
+        paths = [path for path in paths
+                 if any(fnmatch.fnmatchcase(os.path.basename(path)[:-len(EXTENSION)], p) for p in patterns)]
+    return sorted(paths)
+
+
+def _network(artifact: dict) -> DiGraph:
+    network = DiGraph()
+    network.add_nodes_from(artifact['nodes'])
+    network.add_edges_from(artifact['edges'])
+    return network
+
+
+def render_artifact(path: str, output_dir=None, svg=False) -> list:
+    """
+    Draw the images NetworkAnalysis.draw would have drawn with draw_image for the network of an artifact,
+    for the parts the artifact has.
+
+    Args:
+        path (str): The artifact file.
+        output_dir (str, optional): The directory to draw the images in. Defaults to None, for the images
+            directory the artifact was saved in, where the run would have drawn them.
+        svg (bool, optional): Draw SVG images with tree_svg and bipartite_svg instead of PNGs. Defaults to False.
+
+    Returns:
+        list: The paths of the images, without their extension.
+    """
+    artifact = read_artifact(path)
+    network = _network(artifact)
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+    location = os.path.join(output_dir, artifact['name'])
+    # Every image is (name, graph, highlighted edges) of a tree, or (name, bipartite graph, matches)
+    trees, bipartite = [], []
+    if 'max_cst' in artifact:
+        trees += [(location, network, None), (location + '-MAX-CST', DiGraph(artifact['max_cst']), None)]
+    if 'matching' in artifact:
+        compact = as_compact(network)
+        successors = np.full(len(compact), -1, dtype=np.int64)
+        for u, v in artifact['matching']:
+            successors[compact.index[u]] = compact.index[v]
+        bipartite.append((location + '-francis-bipartite',) + francis_bipartite_matching(network, successors))
+    if 'paths' in artifact:
+        trees.append((location + '-initial-disjoint-paths', network, path_to_edges(artifact['paths'])))
+    if 'spanning_tree' in artifact:
+        trees.append((location + '-spanning-tree-with-leaves', DiGraph(artifact['spanning_tree']), None))
+
+    os.makedirs(output_dir, exist_ok=True)
+    for name, graph, highlight_edges in trees:
+        if svg:
+            with open(name + '.svg', 'w') as fd:
+                fd.write(tree_svg(graph, name, highlight_edges))
+        else:
+            draw_tree(graph, name, highlight_edges=highlight_edges)
+    for name, graph, matches in bipartite:
+        if svg:
+            with open(name + '.svg', 'w') as fd:
+                fd.write(bipartite_svg(graph, matches))
+        else:
+            draw_bipartite(graph, matches, name)
+    return [name for name, _, _ in trees + bipartite]
+
+
+def render_artifacts(paths: list, output_dir=None, jobs=1, svg=False) -> list:
+    """
+    Draw the images of many artifacts, in parallel with jobs > 1.
+
+    Args:
+        paths (list): The artifact files, from find_artifacts.
+        output_dir (str, optional): The directory to draw the images in. Defaults to None, for the images
+            directory every artifact was saved in.
+        jobs (int, optional): The number of worker processes. Defaults to 1.
+        svg (bool, optional): Draw SVG images instead of PNGs. Defaults to False.
+
+    Returns:
+        list: The paths of the images, without their extension.
+    """
+    render = partial(render_artifact, output_dir=output_dir, svg=svg)
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            rendered = list(pool.map(render, paths))
+    else:
+        rendered = [render(path) for path in paths]
+    return [name for names in rendered for name in names]
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import sqlite3
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from typing import Union
+import numpy as np
+from networkx import DiGraph
+
+from treespace_metrics.compact import CompactNetwork, as_compact
+
+# The cache key of a network, and the rank of every node id in the canonical node order
+CanonicalForm = namedtuple('CanonicalForm', ['key', 'rank'])
+
+# The cached results of a network, the metrics.csv values by column and the Francis path cover as canonical ranks
+CacheEntry = namedtuple('CacheEntry', ['metrics', 'paths'])
+
+# The database name of a cache without an on-disk tier
+MEMORY = ':memory:'
+MAX_SIZE = 4096
+DIGEST_SIZE = 16
+# The number of canonical forms tried when a network has symmetric nodes, before giving up on its key
+MAX_BRANCHES = 64
+# The version of the cached results, bumped whenever a metric changes its definition, so a database written
+# for an older definition is emptied instead of answering with stale values. 2: rooted_tree is the minimum tree cover
+VERSION = 2
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def canonical_colors(network: Union[DiGraph, CompactNetwork]) -> list:
+    """
+    Color every node by the structure around it, so that two networks that are isomorphic
+    with the same leaf labels get the same colors. Leaves are colored by their label, then every other node
+    by the sorted colors of its children, bottom up. Nodes that still share a color are refined
+    with the colors of their parents and children, until the number of colors stops growing.
+    Internal node labels are ignored.
+
+    Args:
+        network (DiGraph | CompactNetwork): The phylogenetic network.
+
+    Returns:
+        list: The color of every node id, as bytes.
+    """
+    compact = as_compact(network)
+    child_ptr = compact.child_ptr.tolist()
+    child_idx = compact.child_idx.tolist()
+    color = [b''] * len(compact)
+    for v in reversed(compact.topological_order()):
+        if child_ptr[v] == child_ptr[v + 1]:
+            color[v] = _digest(b'L' + str(compact.labels[v]).encode('utf-8'))
+        else:
+            children = sorted(color[c] for c in child_idx[child_ptr[v]:child_ptr[v + 1]])
+            color[v] = _digest(b'N' + b''.join(children))
+    return _refine(compact, color)
+
+
+def _refine(compact: CompactNetwork, color: list) -> list:
+    """Split the color classes by the colors of the parents and children of their nodes, until they are stable."""
+    child_ptr = compact.child_ptr.tolist()
+    child_idx = compact.child_idx.tolist()
+    parent_ptr = compact.parent_ptr.tolist()
+    parent_idx = compact.parent_idx.tolist()
+    distinct = len(set(color))
+    while distinct < len(color):
+        refined = [_digest(color[v] + b''.join(sorted(color[c] for c in child_idx[child_ptr[v]:child_ptr[v + 1]]))
+                           + b'|' + b''.join(sorted(color[p] for p in parent_idx[parent_ptr[v]:parent_ptr[v + 1]])))
+                   for v in range(len(color))]
+        refined_distinct = len(set(refined))
+        if refined_distinct == distinct:
+            break
+        color, distinct = refined, refined_distinct
+    return color
+
+
+def _encode(compact: CompactNetwork, color: list) -> tuple:
+    """
+    Returns:
+        tuple: The network written with its node colors, all distinct, and the rank of every node id.
+    """
+    n = len(color)
+    rank = np.empty(n, dtype=np.int64)
+    rank[sorted(range(n), key=color.__getitem__)] = np.arange(n)
+    sources, targets = compact.edges()
+    edges = np.sort(rank[sources] * n + rank[targets])
+    return b''.join(sorted(color)) + edges.astype('<i8').tobytes(), rank
+
+
+def _search(compact: CompactNetwork, color: list, budget: list):
+    """
+    Individualize every node of the smallest color class in turn and refine, keeping the smallest encoding.
+    The encodings of all branches only depend on the network up to isomorphism, so their minimum is canonical.
+
+    Returns:
+        tuple: The smallest encoding and its node ranks, None if the budget ran out.
+    """
+    if len(set(color)) == len(color):
+        budget[0] -= 1
+        return _encode(compact, color)
+    classes = {}
+    for v, c in enumerate(color):
+        classes.setdefault(c, []).append(v)
+    members = min((nodes for nodes in classes.values() if len(nodes) > 1),
+                  key=lambda nodes: (len(nodes), color[nodes[0]]))
+    best = None
+    for v in members:
+        if budget[0] <= 0:
+            return None
+        individualized = list(color)
+        individualized[v] = _digest(color[v] + b'*')
+        result = _search(compact, _refine(compact, individualized), budget)
+        if result is None:
+            return None
+        if best is None or result[0] < best[0]:
+            best = result
+    return best
+
+
+def canonical_form(network: Union[DiGraph, CompactNetwork]):
+    """
+    Compute the cache key of a network. Once every node has its own color, the edges written as color pairs
+    are a canonical form of the network, so the key is exact: two networks share it only if they are isomorphic
+    with the same leaf labels. Symmetric nodes, such as the two parents of the same two reticulations,
+    are told apart by trying every choice, up to MAX_BRANCHES of them.
+
+    Args:
+        network (DiGraph | CompactNetwork): The phylogenetic network.
+
+    Returns:
+        CanonicalForm: The hex key and the canonical rank of every node id, None if the network has too many
+            symmetries to get a key.
+    """
+    compact = as_compact(network)
+    result = _search(compact, canonical_colors(compact), [MAX_BRANCHES])
+    if result is None:
+        return None
+    encoding, rank = result
+    return CanonicalForm(hashlib.blake2b(encoding, digest_size=DIGEST_SIZE).hexdigest(), rank)
+
+
+def canonical_hash(network: Union[DiGraph, CompactNetwork]):
+    """
+    Returns:
+        str: The canonical key of the network, see canonical_form, None if it has none.
+    """
+    form = canonical_form(network)
+    return None if form is None else form.key
+
+
+def lookup(cache, network: Union[DiGraph, CompactNetwork]) -> tuple:
+    """
+    Args:
+        cache (ResultCache): The result cache, None for no cache.
+        network (DiGraph | CompactNetwork): The phylogenetic network.
+
+    Returns:
+        tuple:
+            - CanonicalForm: The canonical form of the network, None without a cache or if it has no key.
+            - CacheEntry: The cached results of an isomorphic network, None if there are none.
+    """
+    if cache is None:
+        return None, None
+    form = canonical_form(network)
+    if form is None:
+        return None, None
+    return form, cache.get(form.key)
+
+
+class ResultCache:
+    """
+    Results of analyzed networks, keyed by canonical_hash, so a network that repeats an earlier one
+    up to isomorphism is not computed again. The most recently used entries are kept in memory,
+    and every entry is also written to an SQLite database that persists across runs and is shared
+    by the worker processes. A database written with another VERSION is emptied when it is opened.
+
+    Args:
+        database (str, optional): Path to the SQLite database, MEMORY to only keep the in-memory tier.
+            Defaults to MEMORY.
+        max_size (int, optional): The number of entries kept in memory. Defaults to MAX_SIZE.
+    """
+    def __init__(self, database=MEMORY, max_size=MAX_SIZE):
+        self.database = database
+        self.max_size = max_size
+        self._memory = OrderedDict()
+        self._connection = None
+        if database != MEMORY:
+            self._connection = sqlite3.connect(database, timeout=60)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                     '(key TEXT PRIMARY KEY, metrics TEXT NOT NULL, paths TEXT)')
+            if self._connection.execute('PRAGMA user_version').fetchone()[0] != VERSION:
+                self._connection.execute('DELETE FROM results')
+                self._connection.execute(f'PRAGMA user_version = {VERSION}')
+            self._connection.commit()
+
+    def get(self, key: str):
+        """
+        Args:
+            key (str): The canonical key of a network.
+
+        Returns:
+            CacheEntry: The cached results of the network, None if it was never cached.
+        """
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        if self._connection is None:
+            return None
+        row = self._connection.execute('SELECT metrics, paths FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(json.loads(row[0]), None if row[1] is None else json.loads(row[1]))
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, metrics: dict, paths=None):
+        """
+        Cache the results of a network, merged with the results already cached for it.
+
+        Args:
+            key (str): The canonical key of the network.
+            metrics (dict): The metrics.csv value of each computed column.
+            paths (list, optional): The Francis path cover, as lists of canonical node ranks. Defaults to None.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            metrics = {**entry.metrics, **metrics}
+            paths = entry.paths if paths is None else paths
+        entry = CacheEntry(metrics, paths)
+        self._remember(key, entry)
+        if self._connection is not None:
+            self._connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                                     (key, json.dumps(metrics), None if paths is None else json.dumps(paths)))
+            self._connection.commit()
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def __len__(self) -> int:
+        if self._connection is None:
+            return len(self._memory)
+        return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def open_cache(database=MEMORY) -> ResultCache:
+    """
+    Open a result cache once per process, like open_corpus, so every network a worker analyzes
+    shares its in-memory tier.
+
+    Args:
+        database (str, optional): Path to the SQLite database, MEMORY to only keep the in-memory tier.
+            Defaults to MEMORY.
+
+    Returns:
+        ResultCache: The result cache.
+    """
+    return _open_cache(database if database == MEMORY else os.path.abspath(database))
+
+
+@lru_cache(maxsize=8)
+def _open_cache(database: str) -> ResultCache:
+    return ResultCache(database)
@@ -0,0 +1,218 @@
+from collections import namedtuple
+from functools import cached_property
+from typing import Iterable, Union
+import numpy as np
+from networkx import DiGraph
+
+# Degree arrays and boolean masks of every node type, all indexed by node id
+NodeClassification = namedtuple('NodeClassification',
+                                ['in_degree', 'out_degree', 'root', 'leaf', 'tree', 'reticulation', 'omnian'])
+
+
+class CompactNetwork:
+    """
+    An integer-indexed, read-only representation of a rooted phylogenetic network.
+    Node labels are mapped to dense ids 0..n-1 once, the children and parents of every node are stored
+    as CSR arrays, and the label table is used to translate ids back to the original node labels.
+
+    Attributes:
+        labels (list): The label of every node, indexed by node id.
+        index (dict): Maps a node label to its node id.
+        child_ptr (np.ndarray): CSR offsets, the children of node i are child_idx[child_ptr[i]:child_ptr[i + 1]].
+        child_idx (np.ndarray): CSR column array of children.
+        parent_ptr (np.ndarray): CSR offsets, the parents of node i are parent_idx[parent_ptr[i]:parent_ptr[i + 1]].
+        parent_idx (np.ndarray): CSR column array of parents.
+    """
+    def __init__(self, labels: list, sources: np.ndarray, targets: np.ndarray, index=None):
+        """
+        Build the CSR arrays of a network from its label table and its edges as node ids.
+
+        Args:
+            labels (list): The label of every node, indexed by node id.
+            sources (np.ndarray): The node id of the tail of every edge.
+            targets (np.ndarray): The node id of the head of every edge, aligned with sources.
+            index (dict, optional): The node id of every label, to share it with a network with the same labels.
+                Defaults to building it from the labels.
+        """
+        n = len(labels)
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+        self.labels = labels
+        self.index = {label: i for i, label in enumerate(labels)} if index is None else index
+        self.child_ptr, self.child_idx = _build_csr(n, sources, targets)
+        self.parent_ptr, self.parent_idx = _build_csr(n, targets, sources)
+
+    @classmethod
+    def from_digraph(cls, network: DiGraph) -> 'CompactNetwork':
+        """
+        Convert a networkx phylogenetic network to its compact form, keeping the node order of the DiGraph.
+
+        Args:
+            network (DiGraph): The input phylogenetic network.
+
+        Returns:
+            CompactNetwork: The compact form of the network.
+        """
+        labels = list(network.nodes())
+        index = {label: i for i, label in enumerate(labels)}
+        m = network.number_of_edges()
+        sources = np.fromiter((index[s] for s, _ in network.edges()), dtype=np.int32, count=m)
+        targets = np.fromiter((index[t] for _, t in network.edges()), dtype=np.int32, count=m)
+        return cls(labels, sources, targets)
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[tuple]) -> 'CompactNetwork':
+        """
+        Build a compact network straight from (source, target) label pairs, without a DiGraph in between.
+
+        Args:
+            edges (Iterable[tuple]): The edges of the network as label pairs.
+
+        Returns:
+            CompactNetwork: The compact form of the network.
+        """
+        index = {}
+        sources = []
+        targets = []
+        for s, t in edges:
+            sources.append(index.setdefault(s, len(index)))
+            targets.append(index.setdefault(t, len(index)))
+        return cls(list(index), np.array(sources, dtype=np.int32), np.array(targets, dtype=np.int32))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.child_idx)
+
+    @property
+    def out_degree(self) -> np.ndarray:
+        """The out-degree of every node, indexed by node id."""
+        return np.diff(self.child_ptr)
+
+    @property
+    def in_degree(self) -> np.ndarray:
+        """The in-degree of every node, indexed by node id."""
+        return np.diff(self.parent_ptr)
+
+    @cached_property
+    def classification(self) -> NodeClassification:
+        """
+        Classify every node in one vectorized pass over the degree arrays, computed once per network.
+        A tree node has one parent and at least one child, a reticulation has at least two parents and one child,
+        and an omnian has children that are all reticulations.
+
+        Returns:
+            NodeClassification: The in/out-degree arrays and the root, leaf, tree, reticulation and omnian masks.
+        """
+        in_degree = self.in_degree
+        out_degree = self.out_degree
+        sources, targets = self.edges()
+        reticulation = (in_degree >= 2) & (out_degree == 1)
+        tree_children = np.bincount(sources, weights=~reticulation[targets], minlength=len(self.labels))
+        return NodeClassification(
+            in_degree=in_degree,
+            out_degree=out_degree,
+            root=in_degree == 0,
+            leaf=out_degree == 0,
+            tree=(in_degree == 1) & (out_degree != 0),
+            reticulation=reticulation,
+            omnian=(out_degree != 0) & (tree_children == 0),
+        )
+
+    def children(self, node: int) -> np.ndarray:
+        """Return the node ids of the children of a node id."""
+        return self.child_idx[self.child_ptr[node]:self.child_ptr[node + 1]]
+
+    def parents(self, node: int) -> np.ndarray:
+        """Return the node ids of the parents of a node id."""
+        return self.parent_idx[self.parent_ptr[node]:self.parent_ptr[node + 1]]
+
+    def edges(self) -> tuple:
+        """
+        Get all edges of the network, ordered by their source node id.
+
+        Returns:
+            tuple: Two aligned arrays with the source and target node ids of every edge.
+        """
+        return np.repeat(np.arange(len(self.labels), dtype=np.int32), self.out_degree), self.child_idx
+
+    def topological_order(self) -> list:
+        """
+        Order the node ids so every parent comes before its children, using Kahn's algorithm.
+
+        Returns:
+            list: The node ids in topological order.
+
+        Raises:
+            ValueError: If the network has a directed cycle.
+        """
+        child_ptr = self.child_ptr.tolist()
+        child_idx = self.child_idx.tolist()
+        remaining = self.in_degree.tolist()
+        order = [v for v, d in enumerate(remaining) if d == 0]
+        for u in order:
+            for k in range(child_ptr[u], child_ptr[u + 1]):
+                v = child_idx[k]
+                remaining[v] -= 1
+                if remaining[v] == 0:
+                    order.append(v)
+        if len(order) != len(self.labels):
+            raise ValueError("The phylogenetic network has a directed cycle")
+        return order
+
+    def label(self, node: int):
+        """Return the original label of a node id."""
+        return self.labels[node]
+
+    def translate(self, nodes: Iterable[int]) -> list:
+        """Translate a sequence of node ids back to their original labels."""
+        labels = self.labels
+        return [labels[i] for i in nodes]
+
+    def to_digraph(self) -> DiGraph:
+        """
+        Convert the compact network back to a networkx DiGraph with the original labels.
+
+        Returns:
+            DiGraph: The phylogenetic network as a networkx DiGraph.
+        """
+        g = DiGraph()
+        g.add_nodes_from(self.labels)
+        sources, targets = self.edges()
+        g.add_edges_from(zip(self.translate(sources.tolist()), self.translate(targets.tolist())))
+        return g
+
+
+def _build_csr(n: int, rows: np.ndarray, cols: np.ndarray) -> tuple:
+    """
+    Helper function for CompactNetwork. Sort an edge list by its rows and build the CSR offsets.
+
+    Args:
+        n (int): The number of nodes.
+        rows (np.ndarray): The row of every edge.
+        cols (np.ndarray): The column of every edge.
+
+    Returns:
+        tuple: The CSR offset array (length n + 1) and the column array sorted by row.
+    """
+    order = np.argsort(rows, kind='stable')
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=ptr[1:])
+    return ptr, cols[order]
+
+
+def as_compact(network: Union[DiGraph, CompactNetwork]) -> CompactNetwork:
+    """
+    Get the compact form of a network, converting it only if it is a networkx DiGraph.
+
+    Args:
+        network (DiGraph | CompactNetwork): The input phylogenetic network.
+
+    Returns:
+        CompactNetwork: The compact form of the network.
+    """
+    if isinstance(network, CompactNetwork):
+        return network
+    return CompactNetwork.from_digraph(network)
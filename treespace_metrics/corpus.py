@@ -0,0 +1,191 @@
+import json
+import os
+from functools import lru_cache
+from typing import Iterable, Iterator
+import numpy as np
+
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.newick import iter_newick
+from treespace_metrics.utils import read_compact_adjacency_list
+
+# A corpus file starts with MAGIC, then the byte length of the JSON header as a little-endian uint64,
+# then the JSON header, which gives the dtype, offset and length of every array stored after it.
+MAGIC = b'TSPCORP1'
+ALIGNMENT = 8
+VERSION = 1
+
+
+def write_corpus(corpus_file: str, networks: Iterable[tuple]) -> int:
+    """
+    Pack many networks in a single corpus file. The edges of network i are
+    sources[edge_offsets[i]:edge_offsets[i + 1]] -> targets[...], as node ids local to that network,
+    and its labels are label_bytes[label_offsets[i]:label_offsets[i + 1]], separated by NUL bytes.
+
+    Args:
+        corpus_file (str): Path to the corpus file to write.
+        networks (Iterable[tuple]): The (name, network) pairs to pack, network is a DiGraph or a CompactNetwork.
+
+    Returns:
+        int: The number of networks written.
+
+    Raises:
+        ValueError: If a network name or node label holds a NUL character.
+    """
+    names = []
+    edge_offsets = [0]
+    label_offsets = [0]
+    sources = []
+    targets = []
+    label_bytes = []
+    for name, network in networks:
+        compact = as_compact(network)
+        labels = '\0'.join(str(label) for label in compact.labels).encode('utf-8')
+        if labels.count(b'\0') != max(len(compact) - 1, 0) or '\0' in name:
+            raise ValueError(f"Network {name} holds a NUL character, which can not be packed")
+        network_sources, network_targets = compact.edges()
+        names.append(name)
+        sources.append(network_sources.astype(np.int32))
+        targets.append(network_targets.astype(np.int32))
+        label_bytes.append(labels)
+        edge_offsets.append(edge_offsets[-1] + compact.num_edges)
+        label_offsets.append(label_offsets[-1] + len(labels))
+
+    arrays = {
+        'edge_offsets': np.array(edge_offsets, dtype=np.int64),
+        'label_offsets': np.array(label_offsets, dtype=np.int64),
+        'sources': np.concatenate(sources) if sources else np.zeros(0, dtype=np.int32),
+        'targets': np.concatenate(targets) if targets else np.zeros(0, dtype=np.int32),
+        'label_bytes': np.frombuffer(b''.join(label_bytes), dtype=np.uint8),
+    }
+    header = {'version': VERSION, 'names': names, 'arrays': {}}
+    offset = 0
+    for key, array in arrays.items():
+        header['arrays'][key] = {'dtype': array.dtype.str, 'offset': offset, 'length': len(array)}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps(header).encode('utf-8')
+    # Pad the header so the arrays start aligned
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % ALIGNMENT)
+
+    with open(corpus_file, 'wb') as fd:
+        fd.write(MAGIC)
+        fd.write(np.uint64(len(header)).tobytes())
+        fd.write(header)
+        for array in arrays.values():
+            fd.write(array.tobytes())
+            fd.write(b'\0' * (-array.nbytes % ALIGNMENT))
+    return len(names)
+
+
+def pack_corpus(input_dir: str, corpus_file: str, is_newick=False) -> int:
+    """
+    Convert a directory of adjacency lists or Newick files, such as the output of the network generator,
+    into a single corpus file. Networks are named after their file like in analyze_generated_graphs,
+    and a Newick file holding several networks gets one entry per network, named file-0, file-1, ...
+
+    Args:
+        input_dir (str): The directory with one network file per network.
+        corpus_file (str): Path to the corpus file to write.
+        is_newick (bool, optional): Whether the files are in Newick format. Defaults to False.
+
+    Returns:
+        int: The number of networks written.
+    """
+    def networks() -> Iterator[tuple]:
+        for network_file in sorted(f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f))):
+            path = os.path.join(input_dir, network_file)
+            name = network_file.split('.')[0]
+            if not is_newick:
+                yield name, read_compact_adjacency_list(path)
+                continue
+            file_networks = list(iter_newick(path, compact=True))
+            if len(file_networks) == 1:
+                yield name, file_networks[0]
+            else:
+                for i, network in enumerate(file_networks):
+                    yield f"{name}-{i}", network
+
+    return write_corpus(corpus_file, networks())
+
+
+def is_corpus(path: str) -> bool:
+    """
+    Returns:
+        bool: True if the path is a file that starts like a corpus file.
+    """
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as fd:
+        return fd.read(len(MAGIC)) == MAGIC
+
+
+class Corpus:
+    """
+    Memory-mapped reader of a corpus file written by write_corpus.
+    Opening it only reads the header, the edges and labels of a network are only paged in when it is accessed.
+
+    Args:
+        corpus_file (str): Path to the corpus file.
+
+    Raises:
+        ValueError: If the file is not a corpus file, or was written by a newer version.
+    """
+    def __init__(self, corpus_file: str):
+        self.corpus_file = corpus_file
+        with open(corpus_file, 'rb') as fd:
+            if fd.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{corpus_file} is not a corpus file")
+            header_length = int(np.frombuffer(fd.read(8), dtype=np.uint64)[0])
+            header = json.loads(fd.read(header_length))
+        if header['version'] > VERSION:
+            raise ValueError(f"{corpus_file} has version {header['version']}, only {VERSION} is supported")
+        self.names = header['names']
+        start = len(MAGIC) + 8 + header_length
+        self._arrays = {}
+        for key, array in header['arrays'].items():
+            if array['length'] == 0:
+                self._arrays[key] = np.zeros(0, dtype=array['dtype'])
+            else:
+                self._arrays[key] = np.memmap(corpus_file, dtype=array['dtype'], mode='r',
+                                              offset=start + array['offset'], shape=(array['length'],))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, i: int) -> CompactNetwork:
+        """
+        Returns:
+            CompactNetwork: The i-th network of the corpus.
+        """
+        edge_offsets = self._arrays['edge_offsets']
+        label_offsets = self._arrays['label_offsets']
+        labels = self._arrays['label_bytes'][label_offsets[i]:label_offsets[i + 1]]
+        labels = labels.tobytes().decode('utf-8').split('\0') if len(labels) else []
+        edges = slice(edge_offsets[i], edge_offsets[i + 1])
+        return CompactNetwork(labels, self._arrays['sources'][edges], self._arrays['targets'][edges])
+
+    def __iter__(self) -> Iterator[tuple]:
+        """
+        Returns:
+            Iterator[tuple]: The (name, CompactNetwork) pairs, in the order they were packed.
+        """
+        for i, name in enumerate(self.names):
+            yield name, self[i]
+
+
+def open_corpus(corpus_file: str) -> Corpus:
+    """
+    Open a corpus once per process, so worker processes only map the file the first time they need it.
+    A corpus file that was rewritten since is opened again.
+
+    Args:
+        corpus_file (str): Path to the corpus file.
+
+    Returns:
+        Corpus: The memory-mapped corpus.
+    """
+    return _open_corpus(corpus_file, os.stat(corpus_file).st_mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _open_corpus(corpus_file: str, modified: int) -> Corpus:
+    return Corpus(corpus_file)
@@ -1,82 +1,314 @@
-from networkx import DiGraph, all_simple_paths, add_path
+import logging
+import numpy as np
+from networkx import DiGraph
 from typing import List, Tuple
-from treespace_metrics.utils import get_leaves, get_root, get_all_roots, path_to_edges
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.utils import path_to_edges
 from treespace_metrics.drawing import draw_tree
 from treespace_metrics.francis import vertex_disjoint_paths, rooted_spanning_tree
 
+# enum_trees traces every step at DEBUG level, nothing is formatted unless that level is enabled
+logger = logging.getLogger(__name__)
 
-def least_common_ancestor(network: DiGraph, leaf_ending_path: list,
-                          omnian_nodes: list) -> Tuple[str, str]:
+
+class PathForest:
     """
-    This function helps find the least common ancestor, if one exists
+    The vertex disjoint paths of the tree being built by iter_tree, over the node ids of the network N.
+    Every path is a linked list of next and previous node ids, and every node in the forest knows its path id
+    and its position on that path, so membership, the root and end of a path and the order of two nodes
+    are all O(1) lookups. Splitting and joining paths only renumbers the nodes that changed path.
+
     Args:
-        network: the original phylogenetic network N
-        leaf_ending_path: This is a path that ends in a leaf node in tree being generated
-        omnian_nodes: This is the omnian ending path
-    Returns:
-        Tuple: The base tree with only leaf paths, and the list of omnian paths
+        network (CompactNetwork): The original phylogenetic network N.
+        paths (list, optional): The initial paths, as lists of node ids. Defaults to None.
     """
-    lca = None
-    for omnian_path_node in omnian_nodes:
-        print("[LCA] finding LCA for", omnian_path_node)
-        for parent in network.predecessors(omnian_path_node):
-            print("[LCA] Checking edge", parent, omnian_path_node, "in N")
-            if parent in leaf_ending_path:
-                print("[LCA] Found LCA", parent)
-                lca = (parent, omnian_path_node)
-                break
-    return lca
-
-
-def continue_building_tree(generated_tree: DiGraph, network: DiGraph) -> bool:
+    def __init__(self, network: CompactNetwork, paths=()):
+        n = len(network)
+        self.network = network
+        self.next = [-1] * n
+        self.prev = [-1] * n
+        # The path id of every node id, -1 when the node is not in the forest, and its position from the path root
+        self.path_of = [-1] * n
+        self.position = [0] * n
+        # The root and end node of every path id, in the order the paths were created
+        self.root = {}
+        self.end = {}
+        self._next_id = 0
+        for path in paths:
+            self.add_path(path)
+
+    def __contains__(self, node: int) -> bool:
+        return self.path_of[node] != -1
+
+    def __len__(self) -> int:
+        return sum(path_id != -1 for path_id in self.path_of)
+
+    def add_path(self, nodes: list) -> int:
+        """
+        Add a path of nodes that are not in the forest yet.
+
+        Args:
+            nodes (list): The node ids of the path, from its root to its end.
+
+        Returns:
+            int: The id of the new path.
+        """
+        path_id = self._next_id
+        self._next_id += 1
+        previous = -1
+        for position, node in enumerate(nodes):
+            self.path_of[node] = path_id
+            self.position[node] = position
+            self.prev[node] = previous
+            if previous != -1:
+                self.next[previous] = node
+            previous = node
+        self.next[previous] = -1
+        self.root[path_id] = nodes[0]
+        self.end[path_id] = previous
+        return path_id
+
+    def path(self, path_id: int) -> list:
+        """
+        Returns:
+            list: The node ids of the path, from its root to its end, so each node is at its position.
+        """
+        nodes = []
+        node = self.root[path_id]
+        while node != -1:
+            nodes.append(node)
+            node = self.next[node]
+        return nodes
+
+    def paths(self) -> list:
+        """
+        Returns:
+            list: Every path of the forest, as lists of node ids.
+        """
+        return [self.path(path_id) for path_id in self.root]
+
+    def split(self, node: int) -> int:
+        """
+        Cut the path of node just above it, so node becomes the root of a new path.
+
+        Args:
+            node (int): A node id in the forest.
+
+        Returns:
+            int: The id of the path node is now the root of.
+        """
+        above = self.prev[node]
+        path_id = self.path_of[node]
+        if above == -1:
+            return path_id
+        new_id = self._next_id
+        self._next_id += 1
+        offset = self.position[node]
+        self.root[new_id] = node
+        self.end[new_id] = self.end[path_id]
+        self.end[path_id] = above
+        self.next[above] = -1
+        self.prev[node] = -1
+        while node != -1:
+            self.path_of[node] = new_id
+            self.position[node] -= offset
+            node = self.next[node]
+        return new_id
+
+    def join(self, upper: int, lower: int):
+        """
+        Link the end of one path to the root of another, the lower path is renumbered into the upper one.
+
+        Args:
+            upper (int): The node id at the end of its path.
+            lower (int): The node id at the root of another path.
+        """
+        path_id = self.path_of[upper]
+        lower_id = self.path_of[lower]
+        self.next[upper] = lower
+        self.prev[lower] = upper
+        self.end[path_id] = self.end.pop(lower_id)
+        del self.root[lower_id]
+        position = self.position[upper]
+        node = lower
+        while node != -1:
+            position += 1
+            self.path_of[node] = path_id
+            self.position[node] = position
+            node = self.next[node]
+
+    def discard(self, path_id: int) -> list:
+        """
+        Remove a whole path from the forest.
+
+        Returns:
+            list: The node ids that were removed.
+        """
+        nodes = self.path(path_id)
+        for node in nodes:
+            self.path_of[node] = -1
+            self.next[node] = -1
+            self.prev[node] = -1
+        del self.root[path_id]
+        del self.end[path_id]
+        return nodes
+
+
+class OmnianPaths:
+    """
+    The paths of the Francis path cover that end in an omnian node, which iter_tree grafts onto the forest.
+    Every node knows its omnian path and position, and each path keeps prefix counts of its nodes untouched
+    by earlier trees and of its nodes currently in the forest, so the gain of grafting any slice of it is O(1).
+
+    Args:
+        paths (list): The omnian paths, as lists of node ids.
+        n (int): The number of nodes in the network.
+    """
+    def __init__(self, paths: list, n: int):
+        self.paths = paths
+        self.path_of = [-1] * n
+        self.position = [0] * n
+        for path_id, path in enumerate(paths):
+            for position, node in enumerate(path):
+                self.path_of[node] = path_id
+                self.position[node] = position
+        self._untouched = []
+        self._in_forest = {}
+
+    def start_tree(self, used: np.ndarray):
+        """
+        Count the untouched nodes of every path again, before building the next tree.
+
+        Args:
+            used (np.ndarray): Whether each node id is already covered by an earlier tree.
+        """
+        self._untouched = [np.concatenate(([0], np.cumsum(~used[path]))).tolist() for path in self.paths]
+        self._in_forest.clear()
+
+    def untouched(self, path_id: int, start: int, end: int) -> int:
+        """
+        Returns:
+            int: The number of nodes untouched by earlier trees in the slice [start, end) of the path.
+        """
+        counts = self._untouched[path_id]
+        return counts[end] - counts[start]
+
+    def in_forest(self, path_id: int, start: int, end: int, forest: PathForest) -> int:
+        """
+        Returns:
+            int: The number of nodes of the slice [start, end) of the path that are already in the forest.
+        """
+        counts = self._in_forest.get(path_id)
+        if counts is None:
+            counts = [0]
+            for node in self.paths[path_id]:
+                counts.append(counts[-1] + (node in forest))
+            self._in_forest[path_id] = counts
+        return counts[end] - counts[start]
+
+    def changed(self, nodes: list):
+        """
+        Forget the forest counts of the paths of nodes that entered or left the forest.
+        """
+        for node in nodes:
+            self._in_forest.pop(self.path_of[node], None)
+
+
+def continue_building_tree(forest: PathForest, root: int) -> bool:
     """
     This is a helper function to iter_tree
     I check the current tree being made and see if I should continue trying to check the existing omnian paths to build higher
     Args:
-        generated_tree: the tree currently being built to solve the minimum enum problem
-        network: the original network N
+        forest: the disjoint paths of the tree currently being built to solve the minimum enum problem
+        root: the node id of the root of the original network N
     Returns:
         Boolean: True - keep working on building the tree, False - stop building the tree
     """
-    root = get_root(network)
-
-    root_path = None
-    non_root_paths = []
-    for path in find_disjoint_paths(generated_tree, network):
-        if path[0] != root:
-            non_root_paths.append(path)
-        else:
-            root_path = path
-
-    # Print the adjacency list of the tree
-    print("[Checking Building Tree] Adjacency List of Tree")
-    for node, neighbors in generated_tree.adj.items():
-        print(f"{node}: {list(neighbors)}")
-
-    print("[Checking Building Tree] Root Path", root_path)
-    print("[Checking Building Tree] Non-Root Paths", non_root_paths)
-
     # There has to be a path to the root already...
-    # if not keep searching then damn it!
-    if root_path is None:
+    if root not in forest or forest.prev[root] != -1:
         return True
-    else:
-        # Check that all non-root paths are connected to the root path
-        for path in non_root_paths:
-            path_root = path[0]
-            parents_in_network = set(network.predecessors(path_root))
-            if not any(node in generated_tree for node in parents_in_network):
-                return True
-    
+
+    # Check that all non-root paths are connected to another path
+    network = forest.network
+    for path_root in forest.root.values():
+        if path_root != root and not any(parent in forest for parent in network.parents(path_root).tolist()):
+            return True
+
     # Otherwise, no need to continue building!
     return False
 
 
-def combine_paths_based_on_edge(generated_tree: DiGraph,
-                                omnian_path: List[str],
-                                current_leaf_path: List[str],
-                                opl_to_ler_edge: List[str],
-                                lca_to_opr_edge: List[str]) -> DiGraph:
+def best_exchange(forest: PathForest, path_id: int, omnian_paths: OmnianPaths, used: np.ndarray):
+    """
+    This is a helper function to iter_tree.
+    Find the omnian path slice that gains the most untouched nodes when grafted above a node of a leaf ending path.
+    Every edge (OPL, LER) of N from an omnian path node outside the forest to a node of the path is a candidate,
+    either on its own, grafting OP[0..OPL] and dropping the LEP nodes above LER,
+    or with an edge (LCA, OPR) from an LCA above LER on the path, grafting OP[OPR..OPL] and dropping
+    the LEP nodes between LCA and LER. The grafted slice must not overlap the forest.
+
+    Args:
+        forest: the disjoint paths of the tree being built
+        path_id: the leaf ending path whose root has no parent in the forest
+        omnian_paths: the omnian ending paths of N
+        used: whether each node id is already covered by an earlier tree
+    Returns:
+        Tuple: the score, the omnian path id, the slice [OPR, OPL] of positions, the (OPL, LER) edge
+        and the (LCA, OPR) edge or None, or None if there is no candidate
+    """
+    network = forest.network
+    leaf_ending_path = forest.path(path_id)
+    # The untouched nodes of the path before each position
+    untouched = np.concatenate(([0], np.cumsum(~used[leaf_ending_path]))).tolist()
+
+    # The (OPR position, LCA position) pairs of every omnian path with an edge from this path, found once
+    ancestors = {}
+
+    def lca_edges(omnian_id: int) -> list:
+        edges = ancestors.get(omnian_id)
+        if edges is None:
+            edges = []
+            for position, omnian_node in enumerate(omnian_paths.paths[omnian_id]):
+                for parent in network.parents(omnian_node).tolist():
+                    if forest.path_of[parent] == path_id:
+                        edges.append((position, forest.position[parent]))
+            ancestors[omnian_id] = edges
+        return edges
+
+    best = None
+    for ler_position, leaf_ending_root in enumerate(leaf_ending_path):
+        for omnian_leaf in network.parents(leaf_ending_root).tolist():
+            omnian_id = omnian_paths.path_of[omnian_leaf]
+            if omnian_id == -1 or omnian_leaf in forest:
+                continue
+            opl_position = omnian_paths.position[omnian_leaf]
+            options = [(0, None)] + [(opr_position, lca_position) for opr_position, lca_position in lca_edges(omnian_id)
+                                     if opr_position <= opl_position and lca_position < ler_position]
+            for opr_position, lca_position in options:
+                if omnian_paths.in_forest(omnian_id, opr_position, opl_position + 1, forest) > 0:
+                    continue
+                # You subtract, because you gain the nodes in omnian path,
+                # but lose the nodes of the leaf ending path that are cut to keep the paths disjoint
+                score = omnian_paths.untouched(omnian_id, opr_position, opl_position + 1)
+                if lca_position is None:
+                    score -= untouched[ler_position]
+                    lca_to_opr_edge = None
+                else:
+                    score -= untouched[ler_position] - untouched[lca_position + 1]
+                    lca_to_opr_edge = (leaf_ending_path[lca_position], omnian_paths.paths[omnian_id][opr_position])
+                logger.debug("[ITER] edge %s -> %s with LCA edge %s has a score of %s",
+                             omnian_leaf, leaf_ending_root, lca_to_opr_edge, score)
+                # On a tie, prefer grafting below an LCA, as it keeps the paths connected
+                if best is None or (score, lca_to_opr_edge is not None) > (best[0], best[4] is not None):
+                    best = (score, omnian_id, (opr_position, opl_position), (omnian_leaf, leaf_ending_root),
+                            lca_to_opr_edge)
+    return best
+
+
+def combine_paths_based_on_edge(forest: PathForest,
+                                omnian_nodes: List[int],
+                                opl_to_ler_edge: Tuple[int, int],
+                                lca_to_opr_edge=None) -> list:
     """
     This is a helper function to iter_tree
     To make life easier, I can use this to add a new path to an existing leaf path
@@ -86,144 +318,60 @@ def combine_paths_based_on_edge(generated_tree: DiGraph,
     (Leaf, currently on the graph) 9 -> 14 -> 17 -> 18 -> 19 -> L2
     My output will be the tree will only have path
     10 -> 12 -> 15 -> 16 -> 17 -> 18 -> 19 -> L2 (drops 9 and 14 to keep the path disjoint)
-    The function is assuming current_leaf_path ends in a leaf node
+    With an edge (LCA, OPR), only the nodes strictly between LCA and LER are dropped,
+    and the path becomes [..., LCA, OPR, ..., OPL, LER, ...].
+    The forest is updated in place, in time linear in the length of the paths that change.
 
     Args:
-        generated_tree (DiGraph): The tree being generated in `iter_tree`.
-        omnian_path (list): The omnian path selected that will be added to the tree as this will give most unused nodes.
-        current_leaf_path (list): The path that is currently in the tree, ending in a leaf at the moment.
-        opl_to_ler_edge (tuple): The edge to add that will connect the updating path to the current leaf path.
-        lca_to_opr_edge (tuple): If the omnian path has a common ancestor with the leaf-ending path, this is how to factor that in.
+        forest (PathForest): The disjoint paths of the tree being generated in `iter_tree`.
+        omnian_nodes (list): The slice [OPR, ..., OPL] of the omnian path to add, none of them in the forest.
+        opl_to_ler_edge (tuple): The edge to add that will connect the omnian nodes to the current leaf path.
+        lca_to_opr_edge (tuple, optional): If the omnian path has a common ancestor with the leaf-ending path,
+            the edge from it to the omnian nodes. Defaults to None.
 
     Returns:
-        DiGraph: The updated tree with the new path added.
-
+        list: The node ids dropped from the forest.
     """
-
-    omnian_path_leaf, leaf_ending_root = opl_to_ler_edge
+    _, leaf_ending_root = opl_to_ler_edge
+    dropped = []
     if lca_to_opr_edge is None:
-        lca, omnian_path_root = current_leaf_path[0], omnian_path[0]
+        # Drop the nodes above LER
+        if forest.prev[leaf_ending_root] != -1:
+            above = forest.path_of[leaf_ending_root]
+            forest.split(leaf_ending_root)
+            dropped = forest.discard(above)
     else:
-        lca, omnian_path_root = lca_to_opr_edge
-
-    # Identify the nodes in the first path up to the start of the edge to add
-    omnian_nodes = omnian_path[omnian_path_root:omnian_path.index(omnian_path_leaf) + 1]
-
-    # Identify the nodes in the second path from the end of the edge to add
-    leaf_nodes = current_leaf_path[current_leaf_path.index(leaf_ending_root):lca]
-
-    # Combine these nodes to create the new path
-    new_path = omnian_nodes + leaf_nodes
-    print("[UPDATE_PATH] New Path based on omnians", omnian_path)
-    print("[UPDATE_PATH] Current Leaf Path", current_leaf_path)
-    print("[UPDATE_PATH] New Path", new_path)
-
-    # Remove the old paths from the graph
-    generated_tree.remove_nodes_from(new_path)
-    generated_tree.remove_nodes_from(current_leaf_path)
-
-    # Add the new path to the graph
-    add_path(generated_tree, new_path)
-    return generated_tree
-
-
-def find_disjoint_paths(generated_tree: DiGraph, network: DiGraph) -> list:
-    """
-    This is a helper function to iter_tree.
-    Find all disjoint paths between all pairs of nodes in the graph.
-    Each graph I generate will be just disjoint paths, on the final step I will join these
-    disjoint paths to create a tree with root rho and the same leaf set
-
-    Args:
-        generated_tree: the tree that is currently being built to solve the minimum enum problem
-        network: the original network N
-    Returns:
-        List: The list of all paths found on the tree being generated
-    """
-    leaves = get_leaves(network)
-    disjoint_paths = []
-    for target in generated_tree.nodes():
-        # target is a leaf node
-        if generated_tree.out_degree(target) == 0:
-            for source in generated_tree.nodes():
-                if source != target:
-                    paths = list(all_simple_paths(generated_tree, source, target))
-                    for path in paths:
-                        # Check if a path is not a subset of any path in disjoint_paths
-                        if not any(set(path).issubset(set(p)) for p in disjoint_paths):
-                            disjoint_paths.append(path)
-
-    # Check JUST IN CASE the generated tree has a path of just a stray leaf node
-    current_leaves_found = set()
-    for path in disjoint_paths:
-        disjoint_path_leaf = path[len(path) - 1]
-        current_leaves_found.add(disjoint_path_leaf)
-    for leaf in leaves - current_leaves_found:
-        disjoint_paths.append([leaf])
-
-    return disjoint_paths
-
-
-def all_nodes_covered(nodes_used: dict) -> bool:
+        lca, _ = lca_to_opr_edge
+        below_lca = forest.next[lca]
+        forest.split(leaf_ending_root)
+        # Drop the nodes between LCA and LER
+        if below_lca != leaf_ending_root:
+            dropped = forest.discard(forest.split(below_lca))
+
+    omnian_path_root, omnian_path_leaf = omnian_nodes[0], omnian_nodes[-1]
+    forest.add_path(omnian_nodes)
+    forest.join(omnian_path_leaf, leaf_ending_root)
+    if lca_to_opr_edge is not None:
+        forest.join(lca_to_opr_edge[0], omnian_path_root)
+    if logger.isEnabledFor(logging.DEBUG):
+        network = forest.network
+        new_path = forest.path(forest.path_of[omnian_path_leaf])
+        logger.debug("[UPDATE_PATH] New Path %s, dropped %s", network.translate(new_path), network.translate(dropped))
+    return dropped
+
+
+def all_nodes_covered(used: np.ndarray) -> bool:
     """
     Check if all nodes were covered at least once
     Args:
-        nodes_used: a dictionary with the number of times each node was used in a tree
+        used: whether each node id is covered by a tree
     Returns:
         Boolean: True - all nodes were covered, False - some nodes were not covered
     """
-    for node_usage in nodes_used.values():
-        if node_usage == 0:
-            return False
-    return True
-
+    return bool(used.all())
 
-def count_untouched_score_in_path(omnian_path: list, nodes_used: dict,
-                                  start='', end='', inclusive=False) -> int:
-    """
-    This is a helper function to iter_tree.
-    Used within exchange argument to prioritize which path with unmatched omnian to pick
-    There is an option to have a start and end parameter.
-    Say you have [1, 2, 3, 4, 5], and start = 2 end = 5,
-    you will only get the number of 0's for 3, 4; this is for inclusive=False.
-    However, if inclusive was true, then you would get the number of 0's for 2, 3, 4, 5.
-    This is to make the call whether to cut or not.
 
-    Args:
-        omnian_path: a list of a path that does end in an omnian node
-        nodes_used: a dictionary with the number of times each node was used in a tree
-        start: the start node to consider in the path
-        end: the end node to consider in the path
-        inclusive: a boolean to determine if the start and end nodes should be included in the count
-    Returns:
-        Int: the number of untouched nodes in the specified path slice
-    """
-    count = 0
-
-    # Determine the slice of the path to consider
-    if start == '' and end == '':
-        path_slice = omnian_path
-    else:
-        try:
-            if inclusive:
-                start_index = omnian_path.index(start)
-                end_index = omnian_path.index(end) + 1
-            else:
-                start_index = omnian_path.index(start) + 1
-                end_index = omnian_path.index(end)
-            path_slice = omnian_path[start_index:end_index]
-        except ValueError:
-            raise ValueError("[COUNT_UNTOUCHED] Start or end node not found in the given path")
-
-    # Count the number of untouched nodes in the specified path slice
-    for node in path_slice:
-        if nodes_used[node] == 0:
-            count += 1
-    print("[COUNT_UNTOUCHED] Path ", path_slice, "has", count, "untouched nodes, inclusive", inclusive)
-    return count
-
-
-def prune_tree(tree: DiGraph, network: DiGraph):
+def prune_tree(forest: PathForest, root: int) -> Tuple[list, list]:
     """
     This is a helper function to iter_tree
     This takes care of
@@ -232,64 +380,60 @@ def prune_tree(tree: DiGraph, network: DiGraph):
     So when I occasionally change paths, just leaving a hanging omnian will be cleaned up here
 
     Args:
-        tree: the result of iter_tree, but we want to comply with the same leaf and root as N
-        network: the original network N
+        forest: the result of iter_tree, but we want to comply with the same leaf and root as N
+        root: the node id of the root of N
+    Returns:
+        Tuple: the parent node id of every node id, -1 at the root and for nodes not in the tree,
+        and whether every node id is in the tree
     """
-    root = get_root(network)
-    leaves = get_leaves(network)
+    network = forest.network
+    parent = list(forest.prev)
+    in_tree = [path_id != -1 for path_id in forest.path_of]
 
     # Make sure there is only one root in the tree you are making
-    current_roots = get_all_roots(tree)
-    while len(current_roots) != 1:
-        roots_to_delete = set()
-        for temp_root in current_roots:
-            if temp_root == root:
-                continue
-            else:
-                print("[Prune Tree] An extra root was found", temp_root)
-
-            parents = list(network.predecessors(temp_root))
-            found_root_path = False
-            for parent in parents:
-                # Try to pick node already existing in the generated tree
-                # This will make it easier to not lose track of the initial disjoint paths
-                if parent in tree.nodes():
-                    tree.add_edge(parent, temp_root)
-                    found_root_path = True
-                    print("[Prune Tree] Will remove by adding edge: ", parent, '->', temp_root)
-                    break
-
-            # If nothing found, just pick any predecessor from N
-            if not found_root_path:
-                tree.add_edge(parents[0], temp_root)
-                print("[Prune Tree] Will remove by adding edge: ", parents[0], '->', temp_root)
-
-            roots_to_delete.add(temp_root)
-        # Delete temp_roots and check if you need to keep adding more paths up...
-        for remove_node in roots_to_delete:
-            current_roots.remove(remove_node)
-        current_roots = current_roots.union(get_all_roots(tree))
+    extra_roots = [path_root for path_root in forest.root.values() if path_root != root]
+    while extra_roots:
+        temp_root = extra_roots.pop()
+        logger.debug("[Prune Tree] An extra root was found %s", network.labels[temp_root])
+        parents = network.parents(temp_root).tolist()
+        # Try to pick node already existing in the generated tree
+        # This will make it easier to not lose track of the initial disjoint paths
+        chosen = next((p for p in parents if in_tree[p]), None)
+        if chosen is None:
+            # If nothing found, just pick any predecessor from N, it is a new root to connect further up
+            chosen = parents[0]
+            in_tree[chosen] = True
+            if chosen != root:
+                extra_roots.append(chosen)
+        parent[temp_root] = chosen
+        logger.debug("[Prune Tree] Will remove by adding edge: %s -> %s",
+                     network.labels[chosen], network.labels[temp_root])
 
     # Make sure there are only the specified leaves allowed in the tree you are making
-    current_leaves = get_leaves(tree)
-    while leaves != current_leaves:
-        leaves_to_delete = set()
-        for leaf in current_leaves:
-            if leaf not in leaves:
-                print("[Prune Tree] Found invalid leaf", leaf, " deleting from generated tree")
-                tree.remove_node(leaf)
-                leaves_to_delete.add(leaf)
-        for leaf in leaves_to_delete:
-            current_leaves.remove(leaf)
-        current_leaves = current_leaves.union(get_leaves(tree))
-
-
-def iter_tree(new_tree: DiGraph, omnian_paths: List,
-              nodes_used: dict, network: DiGraph) -> DiGraph:
+    children = [0] * len(parent)
+    for node, above in enumerate(parent):
+        if in_tree[node] and above != -1:
+            children[above] += 1
+    leaf = network.classification.leaf.tolist()
+    invalid = [node for node in range(len(parent)) if in_tree[node] and children[node] == 0 and not leaf[node]]
+    while invalid:
+        node = invalid.pop()
+        logger.debug("[Prune Tree] Found invalid leaf %s deleting from generated tree", network.labels[node])
+        in_tree[node] = False
+        above = parent[node]
+        parent[node] = -1
+        if above != -1:
+            children[above] -= 1
+            if children[above] == 0 and not leaf[above]:
+                invalid.append(above)
+    return [above if in_tree[node] else -1 for node, above in enumerate(parent)], in_tree
+
+
+def iter_tree(forest: PathForest, omnian_paths: OmnianPaths, used: np.ndarray) -> DiGraph:
     """
     Iterate Tree:
     Using the input disjoint paths, create a tree with 1 root and all leaves in N.
-    The general gist, the new_tree should start with disjoint paths ending with leaves in N.
+    The general gist, the forest should start with disjoint paths ending with leaves in N.
     I want to extend the disjoint paths using the omnian paths, to reach the root.
 
     So taking the 'root' of these leaf ending disjoint paths, there are two cases
@@ -313,199 +457,129 @@ def iter_tree(new_tree: DiGraph, omnian_paths: List,
     2. Omnian Path Root (OPR), the root of the OP, there is an edge (LCA, OPR) in network N
 
     I check if LCA -> [LEP Nodes] -> LER or LCA -> OPR -> [OP Nodes] OPL -> LER gives me more unused nodes or not.
-    Once the decision is made, I update the generating tree to update the LEP.
+    Once the decision is made, I update the forest to update the LEP.
 
     Main things I need to worry about to do this correctly are:
     1- Cut [LCA, ..., LER]
     2- Add [LCA, OPR, ..., OPL, LER]
     Main edges to worry about are (LCA, OPR) (OPL, LER) if you decide to swap!
 
-    TODO: A note to PIs, you may want to do ONE more loop of omnian paths, because you may terminate too early
-     and no discover paths that only become 'visible' once you reach the root.
+    Every pass over the paths costs time linear in the size of N, and passes repeat until one changes nothing,
+    so paths that only become 'visible' once another path reaches the root are still extended.
     Args:
-        new_tree: the base tree based from network N with only paths ending in a leaf.
-        omnian_paths: a list of disjoint paths in the network N where the last node is an omnian node
-        nodes_used: a dictionary with the number of times each node was used in a tree
-        network: the original network N
+        forest: the base tree from network N with only paths ending in a leaf, as a PathForest
+        omnian_paths: the disjoint paths in the network N where the last node is an omnian node
+        used: whether each node id was covered by an earlier tree, updated with this tree
     Returns:
-        Tuple: a new tree that is the output of the iteration, with updated metrics
+        DiGraph: a new tree that is the output of the iteration
     """
-    tripwire = 0
-
-    while continue_building_tree(new_tree, network):
-        for leaf_ending_path in find_disjoint_paths(new_tree, network):
-            print("[ITER] Checking Leaf Ending Path", leaf_ending_path)
-            # First, check the parent of the disjoint path, if it goes to another leaf path, 
-            # no need to check this further
-            path_root = leaf_ending_path[0]
-            parents_in_network = set(network.predecessors(path_root))
-            if any(node in new_tree for node in parents_in_network):
-                print("[ITER] This path has a parent going to another leaf ending path in Network N", leaf_ending_path)
-                continue
-            else:
-                # I need to poke around the omnian paths to see which nodes to go up to the root
-                print("[ITER] This path has no parent going to another leaf ending path", leaf_ending_path)
-                # Iterate through all the omnian ending paths, check g.predecessors to get the viable edges
-                # and respective disjoint path
-                candidate_edges_and_paths = []
-                for omnian_path in omnian_paths:
-                    print("[ITER] Checking Omnian Path", omnian_path)
-                    for omnian_node in omnian_path:
-                        # I want to check which omnian paths would be connected to current disjoint paths on the tree
-                        for potential_leaf_path_node in network.successors(omnian_node):
-                            print("[ITER] Checking if edge exists in N, [Omnian]", omnian_node, "[Leaf]", potential_leaf_path_node)
-                            if potential_leaf_path_node in leaf_ending_path:
-                                opl_to_ler_edge = [omnian_node, potential_leaf_path_node]
-                                print("[ITER] Found edge to exchange in N", opl_to_ler_edge)
-                                candidate_edges_and_paths.append((opl_to_ler_edge, omnian_path))
-
-                # If no candidate edges, continue to the next leaf ending path that should be changed up
-                if len(candidate_edges_and_paths) == 0:
-                    print("[ITER] no valid edge found")
-                    continue
+    network = forest.network
+    root = int(np.flatnonzero(network.classification.root)[0])
+    omnian_paths.start_tree(used)
 
-                # Compute which edge to pick based on the number of untouched nodes
-                scores = {}
-                edge_to_path = {}
-                edge_to_lca_opl_edge = {}
-                for opl_to_ler_edge, omnian_path in candidate_edges_and_paths:
-                    omnian_path_leaf, leaf_ending_root = opl_to_ler_edge
-                    lca_omnian_root_edge = least_common_ancestor(network, leaf_ending_path, omnian_path)
-                    # Case 1- Omnian path helps extend a leaf path up, so no least common ancestor within the path
-                    # Case 2- Omnian path has the least common ancestor within the path
-                    if lca_omnian_root_edge is None:
-                        omnian_score = count_untouched_score_in_path(omnian_path, nodes_used,
-                                                                     inclusive=True)
-                        tree_score = 0
-                    else:
-                        lca, omnian_path_root = lca_omnian_root_edge
-                        # Remember, LCA is technically ONLY part of leaf ending path, NOT omnian path!
-                        omnian_score = count_untouched_score_in_path(omnian_path, nodes_used,
-                                                                     start=omnian_path_root,
-                                                                     end=omnian_path_leaf,
-                                                                     inclusive=True)
-                        tree_score = count_untouched_score_in_path(leaf_ending_path, nodes_used,
-                                                                   start=lca,
-                                                                   end=leaf_ending_root)
-
-                    # You subtract, because you gain the nodes in omnian path, 
-                    # but might lose nodes in an existing leaf ending path
-                    total_score = omnian_score - tree_score
-                    scores[tuple(opl_to_ler_edge)] = total_score
-                    edge_to_path[tuple(opl_to_ler_edge)] = omnian_path
-                    if lca_omnian_root_edge is None:
-                        edge_to_lca_opl_edge[tuple(opl_to_ler_edge)] = []
-                    else:
-                        edge_to_lca_opl_edge[tuple(opl_to_ler_edge)] = lca_omnian_root_edge
-
-                    print("[ITER] edge", opl_to_ler_edge, " has a score of ", total_score)
-
-                best_opl_to_ler_edge = max(scores, key=scores.get)
-                best_score = scores[best_opl_to_ler_edge]
-
-                if best_score <= 0:
-                    print("[ITER] Best score is negative or zero, skipping update since you will NOT gain new nodes!")
-                else:
-                    omnian_path = edge_to_path[tuple(best_opl_to_ler_edge)]
-                    best_edge_opl_to_ler = list(best_opl_to_ler_edge)
-                    best_edge_lca_to_opr = edge_to_lca_opl_edge[tuple(best_opl_to_ler_edge)]
-                    print("[ITER] Best Edge to pick", best_edge_opl_to_ler, "Updating Path now!")
-                    combine_paths_based_on_edge(new_tree,
-                                                omnian_path,
-                                                leaf_ending_path,
-                                                best_edge_opl_to_ler,
-                                                best_edge_lca_to_opr)
-
-        print("[ITER] Completed Path Update", tripwire)
-        tripwire += 1
-        if tripwire > 3:
-            print("[ITER] Breaking out of loop! POST MORTEM NOW!")
+    # Every pass grafts at least one untouched node, so there are fewer passes than nodes
+    for iteration in range(len(network)):
+        if not continue_building_tree(forest, root):
             break
+        changed = False
+        for path_id in list(forest.root):
+            # Earlier updates of this pass may have merged or dropped the path
+            if path_id not in forest.root:
+                continue
+            # First, check the parent of the disjoint path, if it goes to another path, no need to check this further
+            path_root = forest.root[path_id]
+            if path_root == root or any(parent in forest for parent in network.parents(path_root).tolist()):
+                continue
 
-    print("[ITER] Completed Disjoint path creation, now pruning tree...")
+            # I need to poke around the omnian paths to see which nodes to go up to the root
+            best = best_exchange(forest, path_id, omnian_paths, used)
+            if best is None or best[0] <= 0:
+                logger.debug("[ITER] No edge gains untouched nodes for the path rooted at %s", path_root)
+                continue
+            _, omnian_id, (opr_position, opl_position), opl_to_ler_edge, lca_to_opr_edge = best
+            omnian_nodes = omnian_paths.paths[omnian_id][opr_position:opl_position + 1]
+            logger.debug("[ITER] Best Edge to pick %s Updating Path now!", opl_to_ler_edge)
+            dropped = combine_paths_based_on_edge(forest, omnian_nodes, opl_to_ler_edge, lca_to_opr_edge)
+            omnian_paths.changed(omnian_nodes + dropped)
+            changed = True
+
+        logger.debug("[ITER] Completed Path Update %s", iteration)
+        if not changed:
+            break
 
-    # I should not need this function tbh...
-    # This should only be joining the disjoint paths
-    prune_tree(new_tree, network)
+    logger.debug("[ITER] Completed Disjoint path creation, now pruning tree...")
+    parent, in_tree = prune_tree(forest, root)
 
     # Update Metrics of which nodes have been used in a tree
-    for node in new_tree.nodes():
-        counter = nodes_used[node]
-        counter += 1
-        nodes_used[node] = counter
-    return new_tree
+    nodes = [node for node, kept in enumerate(in_tree) if kept]
+    used[nodes] = True
+    tree = DiGraph()
+    tree.add_nodes_from(network.translate(nodes))
+    tree.add_edges_from((network.labels[parent[node]], network.labels[node]) for node in nodes if parent[node] != -1)
+    return tree
 
 
-def initialize_enum(g: DiGraph, disjoint_paths: list) -> Tuple[DiGraph, List]:
+def initialize_enum(network: CompactNetwork, disjoint_paths: list) -> Tuple[PathForest, OmnianPaths]:
     """
     This function has two important things to do
     1- Create a Tree, with just the paths to leaves
     2- Return Omnian paths
     Args:
-        g: the original phylogenetic network N
+        network: the original phylogenetic network N
         disjoint_paths: a list of disjoint paths in the network N, each path is generated from spanning tree algorithm
     Returns:
-        Tuple: The base tree with only leaf paths, and the list of omnian paths
+        Tuple: The base tree with only leaf paths, and the omnian paths, over the node ids of N
     """
-    omnian_paths = []
+    leaf = network.classification.leaf.tolist()
     leaf_paths = []
-
-    base_tree = DiGraph()
-    leaves = get_leaves(g)
+    omnian_paths = []
 
     # Essentially similar to the spanning tree:
     # - Only add all paths ending in a leaf
     for path in disjoint_paths:
-        if path[len(path) - 1] in leaves:
+        path = [network.index[node] for node in path]
+        if leaf[path[-1]]:
             leaf_paths.append(path)
-            # Add the path to the tree, if the path is just leaf node,
-            # this fail-safe ensures it is added
-            if len(path) == 1:
-                base_tree.add_node(path[0])
-            else:
-                add_path(base_tree, path)
         else:
             omnian_paths.append(path)
 
-    for path in leaf_paths:
-        print("[INIT] This path is OK because it ends in a leaf", path)
-    
-    for path in omnian_paths:
-        print("[INIT] This path ends in an unmatched omnian node", path)
-    
-    return base_tree, omnian_paths
+    logger.debug("[INIT] %s paths end in a leaf, %s end in an unmatched omnian node",
+                 len(leaf_paths), len(omnian_paths))
+    return PathForest(network, leaf_paths), OmnianPaths(omnian_paths, len(network))
 
 
-def enum_trees(g: DiGraph, graph_name: str, draw=False) -> list:
+def enum_trees(g: DiGraph, graph_name: str, draw=False, paths=None, spanning_tree=None) -> list:
     """
     The main function to compute minimum number of rooted trees spanning the network N
     Args:
         g: the original phylogenetic network N
         graph_name: the name of the graph to be drawn, based on input file name
         draw: a boolean to determine if the tree should be drawn in the images/ directory
+        paths: the vertex disjoint paths of N, if they were already computed
+        spanning_tree: the rooted spanning tree built from paths, if it was already computed
     Returns:
         List: a list of DiGraphs, each representing a rooted tree
     """
     trees = []
+    network = as_compact(g)
     # Start with getting disjoint paths and drawing it on the graph for visualization
-    _, paths = vertex_disjoint_paths(g)
-    spanning_tree = rooted_spanning_tree(g, paths)
+    if paths is None:
+        _, paths = vertex_disjoint_paths(network)
 
     if draw:
+        if spanning_tree is None:
+            spanning_tree = rooted_spanning_tree(network, paths)
         draw_tree(g, graph_name + '-spanning-tree', highlight_edges=spanning_tree.edges())
         draw_tree(g, graph_name + '-initial-disjoint-paths', highlight_edges=path_to_edges(paths))
 
-    node_used_count = {}
-    for node in g.nodes():
-        node_used_count[node] = 0
-
-    base_tree, omnian_tuple = initialize_enum(g, paths)
+    used = np.zeros(len(network), dtype=bool)
 
     # Compute a metric for each disjoint part...
-    while not all_nodes_covered(node_used_count):
+    while not all_nodes_covered(used):
         # 1- Use disjoint paths to create a tree with only leaves L
         # Be sure to update the metrics too
-        tree = iter_tree(base_tree.copy(as_view=False), omnian_tuple, node_used_count, g)
+        forest, omnian_paths = initialize_enum(network, paths)
+        tree = iter_tree(forest, omnian_paths, used)
         trees.append(tree)
 
         if draw:
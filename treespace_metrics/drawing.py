@@ -1,21 +1,78 @@
+import logging
+from collections import OrderedDict
 from networkx.drawing.nx_agraph import graphviz_layout
 from networkx.drawing.nx_pylab import draw_networkx_labels
 from networkx import draw_networkx_nodes, draw_networkx_edges, DiGraph
 from networkx import draw
 from networkx.exception import AmbiguousSolution, NetworkXPointlessConcept
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from textwrap import wrap
 import platform
 import matplotlib as mlt
-from treespace_metrics.utils import get_root, get_leaves, is_omnian
+from treespace_metrics.utils import get_root
+from treespace_metrics.compact import as_compact
+from treespace_metrics.cache import canonical_form
+from treespace_metrics.svg import node_color_groups, edge_style_groups
 
 plat = platform.system()
+logger = logging.getLogger(__name__)
+
+# The layouts of the most recently drawn topologies, by canonical key, as positions by canonical rank
+MAX_LAYOUTS = 256
+_layouts = OrderedDict()
+# The figure every draw_tree call draws on, created on first use
+_figure = None
+
+
+def graph_layout(graph: DiGraph) -> dict:
+    """
+    Lay out a phylogenetic network top down with graphviz dot. Layouts are cached by canonical_form,
+    so drawing the same network again, or a network isomorphic to it, does not run dot again.
+
+    Args:
+        graph (DiGraph): Input phylogenetic network.
+
+    Returns:
+        dict: The (x, y) position of every node.
+
+    Raises:
+        ImportError: If pygraphviz is not installed.
+    """
+    compact = as_compact(graph)
+    form = canonical_form(compact)
+    if form is not None and form.key in _layouts:
+        _layouts.move_to_end(form.key)
+        positions = _layouts[form.key]
+        return {label: positions[rank] for label, rank in zip(compact.labels, form.rank.tolist())}
+
+    pos = graphviz_layout(graph, prog='dot', root=get_root(graph))
+    if form is not None:
+        positions = [None] * len(compact)
+        for label, rank in zip(compact.labels, form.rank.tolist()):
+            positions[rank] = pos[label]
+        _layouts[form.key] = positions
+        if len(_layouts) > MAX_LAYOUTS:
+            _layouts.popitem(last=False)
+    return pos
+
+
+def _draw_figure() -> Figure:
+    """The figure draw_tree draws on, cleared. It is kept out of pyplot, so closing pyplot figures leaves it be."""
+    global _figure
+    if _figure is None:
+        mlt.rcParams['figure.dpi'] = 200
+        # For printing...
+        _figure = Figure(figsize=(8.5, 11))
+    _figure.clf()
+    return _figure
 
 
 def draw_tree(graph: DiGraph, tree_name=None, highlight_edges=None, color_node_type=False):
     """
     Draw the phylogenetic network
     https://stackoverflow.com/questions/11479624/is-there-a-way-to-guarantee-hierarchical-output-from-networkx
+    The layout comes from graph_layout, and nodes and edges are drawn with one call per color.
 
     Args:
         graph (DiGraph): Input phylogenetic network.
@@ -26,59 +83,31 @@ def draw_tree(graph: DiGraph, tree_name=None, highlight_edges=None, color_node_t
     Returns:
         None: Saves an output file with the drawn tree.
     """
-    r = get_root(graph)
-    leaves = get_leaves(graph)
     try:
-        pos = graphviz_layout(graph, prog='dot', root=r)
+        pos = graph_layout(graph)
     except ImportError:
-        print("Please install graphviz to draw the tree")
+        logger.warning("Please install graphviz to draw the tree")
         return
 
-    mlt.rcParams['figure.dpi'] = 200
-    # For printing...
-    fig = plt.figure(figsize=(8.5, 11))
-    # fig = plt.figure(figsize=(20, 10))
+    fig = _draw_figure()
     ax = fig.add_subplot(111)
 
-    for node, data in graph.nodes(data=True):
-        try:
-            if color_node_type:
-                if is_omnian(graph, node):
-                    draw_networkx_nodes(graph, pos, node_color='red', nodelist=[node])
-                elif node in leaves:
-                    draw_networkx_nodes(graph, pos, node_color='green', nodelist=[node])
-                else:
-                    draw_networkx_nodes(graph, pos, nodelist=[node])
-            else:
-                draw_networkx_nodes(graph, pos, node_color=data['color'], nodelist=[node])
-        except KeyError:
-            draw_networkx_nodes(graph, pos, nodelist=[node])
-
-    for source, target, data in graph.edges(data=True):
-        try:
-            if highlight_edges is not None:
-                if (source, target) in highlight_edges:
-                    draw_networkx_edges(graph, pos, edgelist=[(source, target)], edge_color='r', width=3)
-                else:
-                    draw_networkx_edges(graph, pos, edgelist=[(source, target)], edge_color=data['color'], width=3)
-            else:
-                draw_networkx_edges(graph, pos, edgelist=[(source, target)], edge_color=data['color'], width=3)
-        except KeyError:
-            draw_networkx_edges(graph, pos, edgelist=[(source, target)], width=1)
+    for color, nodes in node_color_groups(graph, color_node_type).items():
+        draw_networkx_nodes(graph, pos, nodelist=nodes, node_color=color, ax=ax)
+    for (color, width), edges in edge_style_groups(graph, highlight_edges).items():
+        draw_networkx_edges(graph, pos, edgelist=edges, edge_color=color, width=width, ax=ax)
 
     all_nodes = set(graph.nodes())
     labels = dict(zip(all_nodes, all_nodes))
-    draw_networkx_labels(graph, pos, labels=labels)
+    draw_networkx_labels(graph, pos, labels=labels, ax=ax)
 
-    # plt.show()
     # Use this site to edit: https://edotor.net/
     if tree_name is None:
-        plt.title('Phylogenetic network')
-        plt.savefig('network.png')
+        ax.set_title('Phylogenetic network')
+        fig.savefig('network.png')
     else:
         ax.set_title('\n'.join(wrap(tree_name)))
-        plt.savefig(tree_name + '.png')
-    plt.close()
+        fig.savefig(tree_name + '.png')
 
 
 def draw_bipartite(graph, matches=None, graph_name="bipartite"):
@@ -1,9 +1,14 @@
-from networkx import DiGraph, Graph, all_simple_paths
+from networkx import DiGraph, Graph
 from networkx import get_node_attributes
+from typing import Union
+import numpy as np
 import platform
 
 from treespace_metrics.drawing import draw_bipartite
-from treespace_metrics.utils import get_root, maximum_matching_all, get_leaves
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.cache import ResultCache, lookup
+from treespace_metrics.matching import maximum_bipartite_matching
+from treespace_metrics.paths import successors_from_matching, decompose_paths
 
 plt = platform.system()
 
@@ -31,123 +36,115 @@ def build_francis_bipartite(network: DiGraph) -> Graph:
     return francis
 
 
-def vertex_disjoint_paths(network: DiGraph, name=None, draw=False) -> [int, list]:
+def vertex_disjoint_paths(network: Union[DiGraph, CompactNetwork], name=None, draw=False,
+                          cache: ResultCache = None) -> [int, list]:
     """
     Taken from "New Characterisations of Tree-Based Networks and Proximity Measures"
     Computes vertex disjoint paths from the given phylogenetic network.
 
     Args:
-        network (DiGraph): The input phylogenetic network.
+        network (DiGraph | CompactNetwork): The input phylogenetic network.
         name (str, optional): The name of the graph for saving output images. Defaults to None.
         draw (bool, optional): If True, draws the bipartite graph. Defaults to False.
+        cache (ResultCache, optional): The cache of results keyed by canonical hash, the path cover is read
+            from it unless drawing, and written to it otherwise. Defaults to None.
 
     Returns:
         tuple: 
             - int: The number of unmatched omnian nodes in the network.
             - list: The list of vertex disjoint paths in the bipartite graph.
     """
-    francis = build_francis_bipartite(network)
-    max_matchings = maximum_matching_all(francis)
-
-    # Step 1: Compute disjoint paths
-    u2 = set()
-    matches = []
-    nodes = set(network.nodes())
-    missing_v1 = set()
-
-    data = get_node_attributes(francis, 'biparite')
-    for s, t in max_matchings.items():
-        if data[s] == 0:
-            matches.append((s, t[2:]))
-            u2.add(t[2:])
-            missing_v1.add(s)
-
-    u2 = nodes - u2
-    missing_v1 = nodes - missing_v1
-
-    # Build all Vertex Disjoint paths
-    paths = []
-    for u in u2:
-        # You do delete matches, so you need to pass a copy
-        p = build_path(u, matches.copy())
-        paths.append(p)
+    compact = as_compact(network)
+    form, entry = lookup(cache, compact)
+    if not draw and entry is not None and entry.paths is not None:
+        # Translate the cached path cover from canonical ranks to node ids, a path ending above a leaf misses one
+        node = np.argsort(form.rank)
+        paths = [node[path] for path in entry.paths]
+        missing_v1 = sum(int(compact.out_degree[path[-1]] != 0) for path in paths)
+        return missing_v1, [compact.translate(path) for path in paths]
+
+    n = len(compact)
+    sources, targets = compact.edges()
+    mate_left, _ = maximum_bipartite_matching(sources, targets, n, n)
+
+    # Step 1: Compute disjoint paths, each matched edge (u, v') makes v the next node after u
+    successors, predecessors = successors_from_matching(mate_left, n)
+    node_paths = decompose_paths(successors, np.flatnonzero(predecessors == -1))
+    paths = [compact.translate(path) for path in node_paths]
 
     # Step 2: Exclude leaves to know number of new leaves
-    leaves = get_leaves(network)
-    missing_v1 = len(missing_v1 - set(leaves))
+    leaves = compact.out_degree == 0
+    missing_v1 = int(np.count_nonzero((successors == -1) & ~leaves))
 
     if draw:
-        if name is None:
-            draw_bipartite(francis, max_matchings, "francis-bipartite")
-        else:
-            draw_bipartite(francis, max_matchings, name + "-francis-bipartite")
+        draw_francis_bipartite(network, successors, name)
 
+    if form is not None:
+        cache.put(form.key, {'spanning_tree': missing_v1}, [form.rank[path].tolist() for path in node_paths])
     return missing_v1, paths
 
 
-def get_next_node(u: str, matches):
+def francis_bipartite_matching(network: Union[DiGraph, CompactNetwork], successors: np.ndarray) -> tuple:
     """
-    Helper function for rooted_spanning_tree and starting_match.
-    Finds the next node in the path from the given node.
+    Build the Francis bipartite graph of a network and its maximum matching, as draw_bipartite takes them.
 
     Args:
-        u (str): A node in the network.
-        matches (list): Maximum matching used to generate the vertex disjoint path.
+        network (DiGraph | CompactNetwork): The input phylogenetic network.
+        successors (np.ndarray): The node id matched to each node id, -1 if unmatched.
 
     Returns:
-        str: The next node in the path, or None if no match is found.
+        tuple: The bipartite Graph and the matched node of every matched node.
     """
-    for match in matches:
-        if match[0] == u:
-            matches.remove(match)
-            return match[1]
-    return None
+    compact = as_compact(network)
+    graph = network if isinstance(network, DiGraph) else compact.to_digraph()
+    francis_matchings = {}
+    matched = np.flatnonzero(successors != -1)
+    for s, t in zip(compact.translate(matched), compact.translate(successors[matched])):
+        francis_matchings[s] = 'V-' + t
+        francis_matchings['V-' + t] = s
+    return build_francis_bipartite(graph), francis_matchings
 
 
-def build_path(u: str, matches):
+def draw_francis_bipartite(network: Union[DiGraph, CompactNetwork], successors: np.ndarray, name=None):
     """
-    Helper function for rooted_spanning_tree.
-    Builds a path starting from the given node using maximum matching.
+    Draw the Francis bipartite graph of a network with its maximum matching highlighted.
 
     Args:
-        u (str): The starting node.
-        matches (list): The complete maximum matching.
-
-    Returns:
-        list: The maximum path starting at the given node.
+        network (DiGraph | CompactNetwork): The input phylogenetic network.
+        successors (np.ndarray): The node id matched to each node id, -1 if unmatched.
+        name (str, optional): The name of the graph for saving output images. Defaults to None.
     """
-    max_path = list()
-    new_vertex = u
-    max_path.append(u)
-    while True:
-        new_vertex = get_next_node(new_vertex, matches)
-        if new_vertex is None:
-            return max_path
-        else:
-            max_path.append(new_vertex)
-
-
-def rooted_spanning_tree(network: DiGraph, paths: list) -> DiGraph:
+    bipartite, francis_matchings = francis_bipartite_matching(network, successors)
+    if name is None:
+        draw_bipartite(bipartite, francis_matchings, "francis-bipartite")
+    else:
+        draw_bipartite(bipartite, francis_matchings, name + "-francis-bipartite")
+
+
+def rooted_spanning_tree(network: Union[DiGraph, CompactNetwork], paths: list) -> DiGraph:
     """
     Taken from "New Characterisations of Tree-Based Networks and Proximity Measures"
     Builds a rooted spanning tree using vertex disjoint paths.
 
     Args:
-        network (DiGraph): The input phylogenetic network.
+        network (DiGraph | CompactNetwork): The input phylogenetic network.
         paths (list): The vertex disjoint paths.
 
     Returns:
         DiGraph: A rooted spanning tree based on the vertex disjoint paths.
     """
     spanning_tree = DiGraph()
-    root = get_root(network)
+    compact = as_compact(network)
+    roots = np.flatnonzero(compact.in_degree == 0)
+    if len(roots) > 1:
+        raise NotImplementedError(f"Found multiple roots: {compact.translate(roots)}")
+    root = compact.label(roots[0]) if len(roots) == 1 else None
 
     # Build the Spanning Tree from each path
     for path in paths:
-        parents = list(network.predecessors(path[0]))
-
         if root not in path:
-            spanning_tree.add_edge(parents[0], path[0])
+            parents = compact.parents(compact.index[path[0]])
+            spanning_tree.add_edge(compact.label(parents[0]), path[0])
 
         # Add the disjoint path
         for i in range(len(path) - 1):
@@ -156,26 +153,29 @@ def rooted_spanning_tree(network: DiGraph, paths: list) -> DiGraph:
     return spanning_tree
 
 
-def tree_based_network(network: DiGraph, spanning_tree: DiGraph) -> DiGraph:
+def tree_based_network(network: Union[DiGraph, CompactNetwork], spanning_tree: DiGraph) -> DiGraph:
     """
     Taken from "New Characterisations of Tree-Based Networks and Proximity Measures"
     Builds a tree-based network by appending leaves to unmatched omnian nodes to generated spanning tree.
 
     Args:
-        network (DiGraph): The input phylogenetic network.
+        network (DiGraph | CompactNetwork): The input phylogenetic network.
         spanning_tree (DiGraph): The rooted spanning tree.
 
     Returns:
         DiGraph: A tree-based network based on the rooted spanning tree.
     """
-    leaves = get_leaves(network)
-    paths = get_paths(spanning_tree)
+    compact = as_compact(network)
+    leaves = set(compact.translate(np.flatnonzero(compact.out_degree == 0)))
+    # In a tree every path from the root ends in a node without children, so no need to enumerate the paths
+    path_ends = [node for node in spanning_tree.nodes()
+                 if spanning_tree.out_degree(node) == 0 and spanning_tree.in_degree(node) != 0]
     leaf_count = 0
-    for path in paths:
-        if not path[len(path) - 1] in leaves:
+    for end in path_ends:
+        if end not in leaves:
             node = 'new-leaf-' + str(leaf_count)
             spanning_tree.add_node(node)
-            spanning_tree.add_edge(path[len(path) - 1], node)
+            spanning_tree.add_edge(end, node)
             leaf_count += 1
     return spanning_tree
 
@@ -192,16 +192,13 @@ def get_paths(spanning_tree: DiGraph) -> list:
         list: The list of disjoint paths in the spanning tree.
     """
     paths = []
-    roots = []
-    leaves = []
     for node in spanning_tree.nodes():
-        if spanning_tree.in_degree(node) == 0:
-            roots.append(node)
-        elif spanning_tree.out_degree(node) == 0:
-            leaves.append(node)
-
-    for root in roots:
-        for leaf in leaves:
-            for path in all_simple_paths(spanning_tree, root, leaf):
-                paths.append(path)
-    return paths
\ No newline at end of file
+        if spanning_tree.out_degree(node) == 0 and spanning_tree.in_degree(node) != 0:
+            # Every node of a tree has one parent, so walk up from each leaf to its root
+            path = [node]
+            while spanning_tree.in_degree(node) != 0:
+                node = next(iter(spanning_tree.predecessors(node)))
+                path.append(node)
+            path.reverse()
+            paths.append(path)
+    return paths
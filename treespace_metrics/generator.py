@@ -0,0 +1,304 @@
+from typing import Iterator
+import numpy as np
+
+from treespace_metrics.compact import CompactNetwork
+
+# Reticulations are added in batches, sampling this many candidate edge pairs per missing reticulation
+OVERSAMPLING = 4
+
+
+def random_tree(num_leaves: int, rng: np.random.Generator) -> tuple:
+    """
+    Build a uniformly random binary tree shape as the Cartesian tree of a random permutation.
+    The internal nodes are the n - 1 keys, leaf j sits between keys j - 1 and j, and every node hangs
+    below the smaller of its nearest larger keys on either side. The key of an internal node is its height,
+    so every edge goes down in height, leaves are at height 0.
+
+    Args:
+        num_leaves (int): The number of leaves n.
+        rng (np.random.Generator): The random number generator.
+
+    Returns:
+        tuple:
+            - np.ndarray: The parent of every edge, internal nodes are 0..n-2 and leaves n-1..2n-2.
+            - np.ndarray: The child of every edge.
+            - np.ndarray: The height of every node.
+    """
+    num_internal = num_leaves - 1
+    if num_internal == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(1)
+    keys = rng.permutation(num_internal) + 1
+
+    # Nearest larger key on the left and on the right of every internal node, -1 if there is none
+    left = np.full(num_internal, -1, dtype=np.int64)
+    right = np.full(num_internal, -1, dtype=np.int64)
+    stack = []
+    key = keys.tolist()
+    for i in range(num_internal):
+        while stack and key[stack[-1]] < key[i]:
+            right[stack.pop()] = i
+        if stack:
+            left[i] = stack[-1]
+        stack.append(i)
+
+    # The parent is the smaller of the two nearest larger keys, the root has neither
+    padded = np.append(keys, np.iinfo(np.int64).max)
+    internal_parent = np.where(padded[left] < padded[right], left, right)
+    internal_parent[(left == -1) & (right == -1)] = -1
+
+    # Leaf j hangs below the smaller of the keys j - 1 and j, index -1 and n - 1 both read the padding
+    below = np.arange(num_leaves) - 1
+    above = np.arange(num_leaves)
+    leaf_parent = np.where(padded[below] < padded[above], below, above)
+
+    children = np.arange(num_internal)[internal_parent != -1]
+    sources = np.concatenate([internal_parent[children], leaf_parent])
+    targets = np.concatenate([children, num_internal + np.arange(num_leaves)])
+    heights = np.concatenate([keys, np.zeros(num_leaves)]).astype(np.float64)
+    return sources, targets, heights
+
+
+def _siblings(sources: np.ndarray, targets: np.ndarray, n: int) -> np.ndarray:
+    """Returns the other child of the source of every edge, the target itself if the source has one child."""
+    order = np.argsort(sources, kind='stable')
+    first = np.full(n, -1, dtype=np.int64)
+    last = np.full(n, -1, dtype=np.int64)
+    first[sources[order[::-1]]] = targets[order[::-1]]
+    last[sources[order]] = targets[order]
+    return np.where(first[sources] == targets, last[sources], first[sources])
+
+
+def _enumerated_pair(sources: np.ndarray, targets: np.ndarray, heights: np.ndarray, reticulation: np.ndarray,
+                     rng: np.random.Generator, tree_child=False):
+    """
+    Pick one reticulation uniformly among all the edge pairs that can take it, when the sampled batches find none.
+    The edge of p and the edge of q can be joined when the top of the edge of p is above the bottom of the edge
+    of q, and, for a tree-child network, when they pass the checks of the batches.
+
+    Returns:
+        tuple: The edge of p, the edge of q and the heights of p and q, None if no pair can take a reticulation.
+    """
+    m = len(sources)
+    p_ok = np.ones(m, dtype=bool)
+    q_ok = np.ones(m, dtype=bool)
+    if tree_child:
+        sibling = _siblings(sources, targets, len(heights))
+        p_ok = ~reticulation[targets]
+        q_ok = ~reticulation[sources] & ~reticulation[targets] & ~reticulation[sibling]
+    p_edges = np.flatnonzero(p_ok)
+    q_edges = np.flatnonzero(q_ok)
+    tops = np.sort(heights[sources[p_edges]])
+    # The edges of p above the bottom of every edge of q, but the edge of q itself
+    counts = len(tops) - np.searchsorted(tops, heights[targets[q_edges]], side='right') - p_ok[q_edges]
+    if counts.sum() <= 0:
+        return None
+    edge_q = rng.choice(q_edges, p=counts / counts.sum())
+    bottom = heights[targets[edge_q]]
+    edge_p = rng.choice(p_edges[(heights[sources[p_edges]] > bottom) & (p_edges != edge_q)])
+    q_height = rng.uniform(bottom, min(heights[sources[edge_q]], heights[sources[edge_p]]))
+    p_height = rng.uniform(max(heights[targets[edge_p]], q_height), heights[sources[edge_p]])
+    return edge_p, edge_q, p_height, q_height
+
+
+def add_reticulations(sources: np.ndarray, targets: np.ndarray, heights: np.ndarray, num_reticulations: int,
+                      rng: np.random.Generator, tree_child=False) -> tuple:
+    """
+    Add reticulations to a binary network, keeping it binary and acyclic.
+    Each reticulation subdivides two edges with new nodes p and q, at random heights along their edges,
+    and joins the higher one to the lower one, which becomes the reticulation. Every edge still goes down in height,
+    so the network stays acyclic. Candidate edge pairs are sampled in batches, and the pairs of a batch
+    subdivide distinct edges so they can all be applied at once. When a batch keeps no pair, such as close to
+    the most reticulations a tree-child network can have, one pair is picked among all the pairs that fit.
+
+    Args:
+        sources (np.ndarray): The parent of every edge.
+        targets (np.ndarray): The child of every edge.
+        heights (np.ndarray): The height of every node, every edge goes down in height.
+        num_reticulations (int): The number of reticulations to add.
+        rng (np.random.Generator): The random number generator.
+        tree_child (bool, optional): Whether to only add reticulations that keep the network tree-child,
+            where every non-leaf node has a child that is not a reticulation. Defaults to False.
+
+    Returns:
+        tuple: The sources, targets and heights of the new network.
+
+    Raises:
+        ValueError: If no edge pair of the network built so far can take another reticulation.
+    """
+    while num_reticulations > 0:
+        n = len(heights)
+        m = len(sources)
+        if m < 2:
+            raise ValueError("A network with reticulations needs at least two edges")
+        # Subdividing an edge never changes the in-degree of an existing node, so this holds for the whole batch
+        reticulation = np.bincount(targets, minlength=n) >= 2
+
+        candidates = rng.integers(0, m, size=(OVERSAMPLING * num_reticulations, 2))
+        candidates = candidates[candidates[:, 0] != candidates[:, 1]]
+        p_height = rng.uniform(heights[targets[candidates[:, 0]]], heights[sources[candidates[:, 0]]])
+        q_height = rng.uniform(heights[targets[candidates[:, 1]]], heights[sources[candidates[:, 1]]])
+        # Orient every pair so the new reticulation q is the lower one
+        swap = p_height < q_height
+        candidates[swap] = candidates[swap][:, ::-1]
+        p_height, q_height = np.where(swap, q_height, p_height), np.where(swap, p_height, q_height)
+        v = targets[candidates[:, 0]]
+        x, y = sources[candidates[:, 1]], targets[candidates[:, 1]]
+
+        keep = p_height != q_height
+        keys = candidates
+        if tree_child:
+            # p keeps v as a child and q must have a tree child, and x keeps its other child,
+            # so x is the parent of at most one q in the batch
+            sibling = _siblings(sources, targets, n)[candidates[:, 1]]
+            keep &= ~reticulation[v] & ~reticulation[x] & ~reticulation[y] & ~reticulation[sibling]
+            keys = np.column_stack([candidates, m + x])
+
+        # Keep a pair only if none of its keys is used by an earlier kept pair of the batch
+        pairs = np.arange(len(keys))
+        first_pair = np.full(m + n, len(keys), dtype=np.int64)
+        np.minimum.at(first_pair, keys[keep].reshape(-1), np.repeat(pairs[keep], keys.shape[1]))
+        keep &= np.all(first_pair[keys] == pairs[:, None], axis=1)
+        accepted = np.flatnonzero(keep)[:num_reticulations]
+        edge_p, edge_q = candidates[accepted, 0], candidates[accepted, 1]
+        p_height, q_height = p_height[accepted], q_height[accepted]
+        if len(accepted) == 0:
+            pair = _enumerated_pair(sources, targets, heights, reticulation, rng, tree_child)
+            if pair is None:
+                raise ValueError(f"Could not add {num_reticulations} more reticulations, no edge pair of the "
+                                 f"network can take one")
+            edge_p, edge_q, p_height, q_height = (np.array([value]) for value in pair)
+
+        k = len(edge_p)
+        p = n + np.arange(k)
+        q = n + k + np.arange(k)
+        v, y = targets[edge_p], targets[edge_q]
+        targets = targets.copy()
+        targets[edge_p] = p
+        targets[edge_q] = q
+        sources = np.concatenate([sources, p, q, p])
+        targets = np.concatenate([targets, v, y, q])
+        heights = np.concatenate([heights, p_height, q_height])
+        num_reticulations -= k
+    return sources, targets, heights
+
+
+def contract_edges(sources: np.ndarray, targets: np.ndarray, heights: np.ndarray, probability: float,
+                   rng: np.random.Generator) -> tuple:
+    """
+    Make a binary network non-binary by contracting random edges between two tree nodes,
+    the child is merged into its parent which inherits its children. A contraction that would create
+    a parallel edge, when the parent and the child share a reticulation child, is not done.
+
+    Args:
+        sources (np.ndarray): The parent of every edge.
+        targets (np.ndarray): The child of every edge.
+        heights (np.ndarray): The height of every node.
+        probability (float): The probability to contract each edge between two tree nodes.
+        rng (np.random.Generator): The random number generator.
+
+    Returns:
+        tuple: The sources, targets and heights of the new network, nodes are renumbered 0..n'-1.
+    """
+    n = len(heights)
+    in_degree = np.bincount(targets, minlength=n)
+    out_degree = np.bincount(sources, minlength=n)
+    tree_edge = (in_degree[sources] <= 1) & (in_degree[targets] == 1) & (out_degree[targets] >= 2)
+    parent = np.arange(n)
+    parent[targets[tree_edge]] = sources[tree_edge]
+    contracted = np.zeros(n, dtype=bool)
+    contracted[targets[tree_edge & (rng.random(len(sources)) < probability)]] = True
+
+    while True:
+        # Pointer jumping merges every chain of contracted nodes into its topmost node
+        representative = np.where(contracted, parent, np.arange(n))
+        while True:
+            jumped = representative[representative]
+            if np.array_equal(jumped, representative):
+                break
+            representative = jumped
+        new_sources, new_targets = representative[sources], representative[targets]
+        loop = new_sources == new_targets
+        pairs = new_sources[~loop] * n + new_targets[~loop]
+        unique, counts = np.unique(pairs, return_counts=True)
+        repeated = np.isin(pairs, unique[counts > 1])
+        if not repeated.any():
+            break
+        # Undo the contraction of the nodes whose edges became parallel
+        contracted[sources[~loop][repeated]] = False
+
+    keep = ~contracted
+    new_id = np.cumsum(keep) - 1
+    return new_id[new_sources[~loop]], new_id[new_targets[~loop]], heights[keep]
+
+
+def random_network(num_leaves: int, num_reticulations: int, rng=None, tree_child=False,
+                   contraction=0.0) -> CompactNetwork:
+    """
+    Generate a random rooted phylogenetic network in memory. It starts from a random binary tree
+    and adds reticulations in batches, then optionally contracts tree edges to make it non-binary.
+    Leaves are labeled leaf1..leafn and the other nodes by their node id, like binary_ntk_generator.
+
+    Args:
+        num_leaves (int): The number of leaves.
+        num_reticulations (int): The number of reticulations.
+        rng (np.random.Generator | int, optional): The random number generator or a seed. Defaults to None.
+        tree_child (bool, optional): Whether the network must be tree-child. Defaults to False.
+        contraction (float, optional): The probability to contract each edge between two tree nodes,
+            0 keeps the network binary. Defaults to 0.
+
+    Returns:
+        CompactNetwork: The random network, the root is node 0.
+
+    Raises:
+        ValueError: If there are no leaves, too many reticulations for a tree-child network,
+            or the reticulations could not be added.
+    """
+    if num_leaves < 1 or num_reticulations < 0:
+        raise ValueError("A network needs at least one leaf and a non-negative number of reticulations")
+    if num_leaves == 1 and num_reticulations > 0:
+        raise ValueError("A network with reticulations needs at least two leaves")
+    if tree_child and num_reticulations >= num_leaves:
+        raise ValueError("Tree-child networks with n leaves have at most n - 1 reticulations")
+    rng = np.random.default_rng(rng)
+    sources, targets, heights = random_tree(num_leaves, rng)
+    sources, targets, heights = add_reticulations(sources, targets, heights, num_reticulations, rng, tree_child)
+    if contraction > 0:
+        sources, targets, heights = contract_edges(sources, targets, heights, contraction, rng)
+
+    # Number the nodes from the root down, by decreasing height
+    order = np.argsort(-heights, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    leaf = np.bincount(sources, minlength=len(heights))[order] == 0
+    labels = np.arange(len(order)).astype(str).astype(object)
+    labels[leaf] = ['leaf' + str(i) for i in range(1, int(leaf.sum()) + 1)]
+    return CompactNetwork(labels.tolist(), rank[sources], rank[targets])
+
+
+def random_networks(count: int, num_leaves: int, num_reticulations: int, seed=None, worker=0, workers=1,
+                    tree_child=False, contraction=0.0) -> Iterator[tuple]:
+    """
+    Generate random networks one at a time, as analyze_all and the metric functions expect them.
+    Network k always uses the k-th child of the seed's SeedSequence, so a run is reproducible
+    however the networks are split between workers.
+
+    Args:
+        count (int): The total number of networks.
+        num_leaves (int): The number of leaves of every network.
+        num_reticulations (int): The number of reticulations of every network.
+        seed (int, optional): The root seed, defaults to fresh entropy. Defaults to None.
+        worker (int, optional): This worker's index, it generates networks worker, worker + workers, ...
+            Defaults to 0.
+        workers (int, optional): The number of workers. Defaults to 1.
+        tree_child (bool, optional): Whether the networks must be tree-child. Defaults to False.
+        contraction (float, optional): The probability to contract each edge between two tree nodes. Defaults to 0.
+
+    Returns:
+        Iterator[tuple]: The (name, CompactNetwork) of every network of this worker, names are zero padded indices.
+    """
+    streams = np.random.SeedSequence(seed).spawn(count)
+    width = len(str(max(count - 1, 0)))
+    for k in range(worker, count, workers):
+        network = random_network(num_leaves, num_reticulations, np.random.default_rng(streams[k]),
+                                 tree_child, contraction)
+        yield str(k).zfill(width), network
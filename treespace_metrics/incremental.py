@@ -0,0 +1,274 @@
+from collections import deque
+from typing import Union
+import numpy as np
+from networkx import DiGraph
+
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.jetten import jetten_edges
+from treespace_metrics.matching import maximum_bipartite_matching
+from treespace_metrics.paths import successors_from_matching, decompose_paths
+
+
+class DynamicMatching:
+    """
+    A maximum matching of a bipartite graph, kept maximum under edge insertions and deletions.
+    After an insertion only an augmenting path through the new edge can exist, and after deleting a matched edge
+    only one starting at one of its endpoints, so every repair is a single alternating search
+    that only visits the vertices reachable by alternating paths from the edited edge.
+
+    Args:
+        n_left (int): The number of left nodes.
+        n_right (int): The number of right nodes.
+        left (np.ndarray): The left node id of every initial edge.
+        right (np.ndarray): The right node id of every initial edge, aligned with left.
+        method (str, optional): The matching engine used for the initial matching. Defaults to None.
+    """
+    def __init__(self, n_left: int, n_right: int, left: np.ndarray, right: np.ndarray, method=None):
+        self.succ = [set() for _ in range(n_left)]
+        self.pred = [set() for _ in range(n_right)]
+        for u, v in zip(np.asarray(left).tolist(), np.asarray(right).tolist()):
+            self.succ[u].add(v)
+            self.pred[v].add(u)
+        self.mate_left, self.mate_right = maximum_bipartite_matching(left, right, n_left, n_right, method=method)
+        self.size = sum(1 for v in self.mate_left if v != -1)
+
+    def add_edge(self, u: int, v: int):
+        """
+        Insert the edge (u, v) and augment along it if that makes the matching larger.
+
+        Args:
+            u (int): The left node.
+            v (int): The right node.
+        """
+        if v in self.succ[u]:
+            return
+        self.succ[u].add(v)
+        self.pred[v].add(u)
+        # The augmenting path runs from a free left node to u, then over (u, v), then from v to a free right node.
+        # Both halves can be searched on their own, if they met M was not maximum before the insertion.
+        head = [] if self.mate_left[u] == -1 else self._search_from_right(self.mate_left[u])
+        if head is None:
+            return
+        tail = [] if self.mate_right[v] == -1 else self._search_from_left(self.mate_right[v])
+        if tail is None:
+            return
+        self._augment(head + [(u, v)] + tail)
+
+    def remove_edge(self, u: int, v: int):
+        """
+        Delete the edge (u, v), if it was matched look for an augmenting path from either freed endpoint.
+
+        Args:
+            u (int): The left node.
+            v (int): The right node.
+        """
+        if v not in self.succ[u]:
+            return
+        self.succ[u].discard(v)
+        self.pred[v].discard(u)
+        if self.mate_left[u] != v:
+            return
+        self.mate_left[u] = -1
+        self.mate_right[v] = -1
+        self.size -= 1
+        # The maximum shrinks by one at most, so one augmentation is enough
+        path = self._search_from_left(u)
+        if path is None:
+            path = self._search_from_right(v)
+        if path is not None:
+            self._augment(path)
+
+    def _search_from_left(self, start: int):
+        """
+        Breadth first search of an alternating path from the left node start to a free right node,
+        leaving start by an unmatched edge.
+
+        Returns:
+            list: The (left, right) edges to match along the path, None if there is no such path.
+        """
+        mate_left = self.mate_left
+        mate_right = self.mate_right
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            x = queue.popleft()
+            for v in self.succ[x]:
+                if v == mate_left[x]:
+                    continue
+                w = mate_right[v]
+                if w == -1:
+                    path = [(x, v)]
+                    while previous[x] is not None:
+                        x, v = previous[x]
+                        path.append((x, v))
+                    return path
+                if w not in previous:
+                    previous[w] = (x, v)
+                    queue.append(w)
+        return None
+
+    def _search_from_right(self, start: int):
+        """
+        Breadth first search of an alternating path from the right node start back to a free left node,
+        entering start by an unmatched edge.
+
+        Returns:
+            list: The (left, right) edges to match along the path, None if there is no such path.
+        """
+        mate_left = self.mate_left
+        mate_right = self.mate_right
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            v = queue.popleft()
+            for x in self.pred[v]:
+                if x == mate_right[v]:
+                    continue
+                w = mate_left[x]
+                if w == -1:
+                    path = [(x, v)]
+                    while previous[v] is not None:
+                        x, v = previous[v]
+                        path.append((x, v))
+                    return path
+                if w not in previous:
+                    previous[w] = (x, v)
+                    queue.append(w)
+        return None
+
+    def _augment(self, path: list):
+        """Match every (left, right) edge of an augmenting path, the matching grows by one."""
+        for u, v in path:
+            self.mate_left[u] = v
+            self.mate_right[v] = u
+        self.size += 1
+
+
+class IncrementalNetwork:
+    """
+    A phylogenetic network under edge edits, that keeps the Jetten and Francis maximum matchings up to date.
+    An edit only changes the node types of its endpoints and the omnian status of their parents,
+    so only the Jetten edges of those nodes are diffed and repaired, and the Francis bipartite graph
+    is the network itself, so it is repaired for the edited edge alone.
+
+    Args:
+        network (DiGraph | CompactNetwork): The initial phylogenetic network, its node set is fixed.
+        matching_method (str, optional): The matching engine used for the initial matchings. Defaults to None.
+    """
+    def __init__(self, network: Union[DiGraph, CompactNetwork], matching_method=None):
+        compact = as_compact(network)
+        n = len(compact)
+        self.labels = compact.labels
+        self.index = compact.index
+        sources, targets = compact.edges()
+        # The Francis bipartite graph has an edge u -> v' for every edge u -> v, its adjacency is the network's
+        self.francis = DynamicMatching(n, n, sources, targets, matching_method)
+        self.children = self.francis.succ
+        self.parents = self.francis.pred
+        omnians, reticulations = jetten_edges(compact)
+        self.jetten = DynamicMatching(n, n, omnians, reticulations, matching_method)
+        classification = compact.classification
+        self.reticulation = classification.reticulation.tolist()
+        self.omnian = classification.omnian.tolist()
+        self.num_omnians = int(classification.omnian.sum())
+        self.num_internal = int(np.count_nonzero(~classification.leaf))
+
+    def add_edge(self, source, target):
+        """
+        Add the edge source -> target and repair both matchings.
+
+        Args:
+            source: The label of the parent node.
+            target: The label of the child node.
+        """
+        u, v = self.index[source], self.index[target]
+        if v in self.children[u]:
+            return
+        if not self.children[u]:
+            self.num_internal += 1
+        self.francis.add_edge(u, v)
+        self._update_jetten(u, v)
+
+    def remove_edge(self, source, target):
+        """
+        Remove the edge source -> target and repair both matchings.
+
+        Args:
+            source: The label of the parent node.
+            target: The label of the child node.
+        """
+        u, v = self.index[source], self.index[target]
+        if v not in self.children[u]:
+            return
+        self.francis.remove_edge(u, v)
+        if not self.children[u]:
+            self.num_internal -= 1
+        self._update_jetten(u, v)
+
+    def move_edge(self, source, target, new_source=None, new_target=None):
+        """
+        Move the tail or the head of the edge source -> target, such as a tail move or a head move.
+
+        Args:
+            source: The label of the parent node.
+            target: The label of the child node.
+            new_source (optional): The new parent of the edge. Defaults to source.
+            new_target (optional): The new child of the edge. Defaults to target.
+        """
+        self.remove_edge(source, target)
+        self.add_edge(source if new_source is None else new_source, target if new_target is None else new_target)
+
+    def _update_jetten(self, u: int, v: int):
+        """Diff and repair the Jetten bipartite edges around the edited edge u -> v."""
+        children = self.children
+        parents = self.parents
+        affected = {u}
+        for w in (u, v):
+            reticulation = len(parents[w]) >= 2 and len(children[w]) == 1
+            if reticulation != self.reticulation[w]:
+                self.reticulation[w] = reticulation
+                affected.update(parents[w])
+
+        for w in affected:
+            omnian = len(children[w]) != 0 and all(self.reticulation[c] for c in children[w])
+            self.num_omnians += omnian - self.omnian[w]
+            self.omnian[w] = omnian
+            old = self.jetten.succ[w]
+            new = {c for c in children[w] if self.reticulation[c]} if omnian else set()
+            # Every single edge change is repaired right away, so each repair starts from a maximum matching
+            for c in old - new:
+                self.jetten.remove_edge(w, c)
+            for c in new - old:
+                self.jetten.add_edge(w, c)
+
+    @property
+    def unmatched_omnians(self) -> int:
+        """The number of omnians left unmatched by the maximum Jetten matching."""
+        return self.num_omnians - self.jetten.size
+
+    @property
+    def tree_based(self) -> bool:
+        return self.unmatched_omnians == 0
+
+    @property
+    def missing_v1(self) -> int:
+        """The number of non-leaf nodes that end a path of the vertex disjoint path cover, as in vertex_disjoint_paths."""
+        return self.num_internal - self.francis.size
+
+    def disjoint_paths(self) -> list:
+        """
+        Returns:
+            list: The vertex disjoint paths of the current Francis matching, as lists of labels.
+        """
+        successors, predecessors = successors_from_matching(self.francis.mate_left, len(self.labels))
+        return [[self.labels[node] for node in path]
+                for path in decompose_paths(successors, np.flatnonzero(predecessors == -1))]
+
+    def to_compact(self) -> CompactNetwork:
+        """
+        Returns:
+            CompactNetwork: The current network.
+        """
+        sources = [u for u, nodes in enumerate(self.children) for _ in nodes]
+        targets = [v for nodes in self.children for v in nodes]
+        return CompactNetwork(self.labels, sources, targets)
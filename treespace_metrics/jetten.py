@@ -1,29 +1,104 @@
 import networkx as nx
 from networkx import get_node_attributes, DiGraph, Graph
+from typing import Union
+import numpy as np
 import platform
 
-from treespace_metrics.utils import maximum_matching_all, is_omnian, is_reticulation
+from treespace_metrics.utils import maximum_matching_all
+from treespace_metrics.matching import maximum_bipartite_matching
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.cache import ResultCache, lookup
 from treespace_metrics.drawing import draw_bipartite
 
 plt = platform.system()
 
 
-def is_tree_based(network: DiGraph, name=None, draw=False) -> bool:
+def is_tree_based(network: Union[DiGraph, CompactNetwork], name=None, draw=False, cache: ResultCache = None) -> bool:
     """
     Read the paper "Nonbinary tree-based phylogenetic networks' by Laura Jetten and Leo van Iersel".
     The complete algorithm that checks if a network is tree-based.
 
     Args:
-        network (DiGraph): Input phylogenetic network N.
+        network (DiGraph | CompactNetwork): Input phylogenetic network N.
         name (str, optional): The name of the graph, used to save output images of the network. Defaults to None.
         draw (bool, optional): Whether to draw the bipartite graph. Defaults to False.
+        cache (ResultCache, optional): The cache of results keyed by canonical hash, the answer is read from it
+            unless drawing, and written to it otherwise. Defaults to None.
 
     Returns:
         bool: True if the network is tree-based, False otherwise.
     """
-    jetten_bipartite_network = jetten_bipartite(network)
-    unmatched_omnian = jetten_network(jetten_bipartite_network, name, draw)
-    return len(unmatched_omnian) == 0
+    compact = as_compact(network)
+    form, entry = lookup(cache, compact)
+    if not draw and entry is not None and 'is_tree_based' in entry.metrics:
+        return bool(entry.metrics['is_tree_based'])
+
+    n = len(compact)
+    omnians, reticulations = jetten_edges(compact)
+    mate_left, _ = maximum_bipartite_matching(omnians, reticulations, n, n)
+
+    if draw:
+        draw_jetten_bipartite(network, mate_left, name)
+
+    tree_based = len(unmatched_omnians(omnians, mate_left)) == 0
+    if form is not None:
+        cache.put(form.key, {'is_tree_based': int(tree_based)})
+    return tree_based
+
+
+def unmatched_omnians(omnians: np.ndarray, mate_left: list) -> np.ndarray:
+    """
+    Get the omnian nodes left unmatched by a maximum matching of the Jetten bipartite graph.
+
+    Args:
+        omnians (np.ndarray): The omnian node id of every Jetten bipartite edge, as returned by jetten_edges.
+        mate_left (list): The reticulation node id matched to each node id, -1 if unmatched.
+
+    Returns:
+        np.ndarray: The unmatched omnian node ids, the network is tree-based if there are none.
+    """
+    omnians = np.unique(omnians)
+    return omnians[np.asarray(mate_left, dtype=np.int64)[omnians] == -1]
+
+
+def draw_jetten_bipartite(network: Union[DiGraph, CompactNetwork], mate_left: list, name=None):
+    """
+    Draw the Jetten bipartite graph of a network with its maximum matching highlighted.
+
+    Args:
+        network (DiGraph | CompactNetwork): Input phylogenetic network N.
+        mate_left (list): The reticulation node id matched to each node id, -1 if unmatched.
+        name (str, optional): The name of the graph, used to save output images of the network. Defaults to None.
+    """
+    compact = as_compact(network)
+    labels = compact.labels
+    matches = {}
+    for u, v in enumerate(mate_left):
+        if v != -1:
+            matches[labels[u]] = 'R-' + labels[v]
+            matches['R-' + labels[v]] = labels[u]
+    graph = network if isinstance(network, DiGraph) else compact.to_digraph()
+    if name is None:
+        draw_bipartite(jetten_bipartite(graph), matches, graph_name="jetten-bipartite")
+    else:
+        draw_bipartite(jetten_bipartite(graph), matches, graph_name=name + "-jetten-bipartite")
+
+
+def jetten_edges(network: CompactNetwork) -> tuple:
+    """
+    Read the paper "Nonbinary tree-based phylogenetic networks' by Laura Jetten and Leo van Iersel".
+    Build the edges of the bipartite graph used by Jetten et al. directly from the CSR arrays,
+    every edge goes from an omnian node to one of its reticulation children.
+
+    Args:
+        network (CompactNetwork): The input phylogenetic network.
+
+    Returns:
+        tuple: Two aligned arrays with the omnian and reticulation node ids of every bipartite edge.
+    """
+    sources, targets = network.edges()
+    keep = network.classification.omnian[sources]
+    return sources[keep], targets[keep]
 
 
 def jetten_bipartite(network: DiGraph) -> Graph:
@@ -38,20 +113,13 @@ def jetten_bipartite(network: DiGraph) -> Graph:
         Graph: A bipartite graph which will be used for the next step of the algorithm.
     """
     jetten = Graph()
-    omnians = []
-    reticulation = []
-
-    # Fill the nodes up
-    for node in network.nodes():
-        # set Reticulations
-        if is_reticulation(network, node):
-            reticulation.append(node)
-            jetten.add_node('R-' + node, biparite=1)
-
-        # set Omnians
-        if is_omnian(network, node):
-            omnians.append(node)
-            jetten.add_node(node, biparite=0)
+    compact = as_compact(network)
+    classification = compact.classification
+
+    # Fill the nodes up, reticulations first then omnians
+    jetten.add_nodes_from(('R-' + node for node in compact.translate(np.flatnonzero(classification.reticulation))),
+                          biparite=1)
+    jetten.add_nodes_from(compact.translate(np.flatnonzero(classification.omnian)), biparite=0)
 
     data = get_node_attributes(jetten, 'biparite')
     for source_node, target_node in network.edges():
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import numpy as np
+
+from treespace_metrics.compact import CompactNetwork
+
+# The manifest of a run, in its images directory
+MANIFEST = 'manifest.sqlite'
+DIGEST_SIZE = 16
+# The networks finished between two commits, a preempted run only analyzes the ones after the last commit again
+COMMIT_ROWS = 256
+# The version of the manifest, recorded with the settings, so a manifest of another version starts over
+VERSION = 4
+
+
+def file_stamp(path: str) -> str:
+    """
+    Args:
+        path (str): An input file.
+
+    Returns:
+        str: Its size and modification time, which change whenever it is written, read without opening it.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def network_hash(network: CompactNetwork) -> str:
+    """
+    Args:
+        network (CompactNetwork): A network, such as one of a corpus.
+
+    Returns:
+        str: The hash of its labels and edges.
+    """
+    sources, targets = network.edges()
+    digest = hashlib.blake2b(json.dumps([str(label) for label in network.labels]).encode('utf-8'),
+                             digest_size=DIGEST_SIZE)
+    digest.update(np.ascontiguousarray(sources, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(targets, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """
+    The state of a run over a corpus, kept next to its results so a run that died can be resumed.
+    Every network that is done is recorded by a key unique in the run, such as its file name, with its results row,
+    the stamp of its input, such as the size and modification time of its file, and the network_hash
+    the worker computed from the network it read. A network whose stamp is unchanged is done without reading it,
+    only one whose stamp changed is hashed again. The settings of the run are recorded too,
+    a run with other settings starts over.
+
+    Args:
+        directory (str): The images directory of the run.
+        settings (dict): The options of the run that change its results or images, as JSON values.
+    """
+    def __init__(self, directory: str, settings: dict):
+        self.path = os.path.join(directory, MANIFEST)
+        self.settings = json.dumps({'version': VERSION, **settings}, sort_keys=True)
+        self._connection = sqlite3.connect(self.path, timeout=60)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS settings (settings TEXT NOT NULL)')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS networks '
+                                 '(key TEXT PRIMARY KEY, stamp TEXT NOT NULL, hash TEXT NOT NULL, row TEXT NOT NULL)')
+        if self._connection.execute('SELECT settings FROM settings').fetchone() is None:
+            self._connection.execute('INSERT INTO settings VALUES (?)', (self.settings,))
+        self._connection.commit()
+
+    def same_settings(self) -> bool:
+        """
+        Returns:
+            bool: Whether the run that started the manifest had the same settings.
+        """
+        return self._connection.execute('SELECT settings FROM settings').fetchone()[0] == self.settings
+
+    def done(self, key: str, stamp: str, digest) -> bool:
+        """
+        Args:
+            key (str): The key of a network.
+            stamp (str): The stamp of its input.
+            digest (callable): Returns the network_hash of the network, only called if its stamp changed.
+
+        Returns:
+            bool: Whether the network is done and its input did not change since.
+        """
+        record = self._connection.execute('SELECT stamp, hash FROM networks WHERE key = ?', (key,)).fetchone()
+        if record is None:
+            return False
+        if record[0] == stamp:
+            return True
+        if record[1] != digest():
+            return False
+        # Only the stamp changed, such as a file that was copied or touched, record it to skip the hash next time
+        self._connection.execute('UPDATE networks SET stamp = ? WHERE key = ?', (stamp, key))
+        return True
+
+    def row(self, key: str) -> list:
+        """
+        Args:
+            key (str): The key of a network that is done.
+
+        Returns:
+            list: Its results row.
+        """
+        return json.loads(self._connection.execute('SELECT row FROM networks WHERE key = ?', (key,)).fetchone()[0])
+
+    def finish(self, key: str, stamp: str, digest: str, row: list):
+        """
+        Record that a network is done, it is only kept once it is committed.
+
+        Args:
+            key (str): Its key.
+            stamp (str): The stamp of its input.
+            digest (str): The network_hash of the network that was analyzed.
+            row (list): Its results row.
+        """
+        self._connection.execute('INSERT OR REPLACE INTO networks VALUES (?, ?, ?, ?)',
+                                 (key, stamp, digest, json.dumps(row)))
+
+    def commit(self):
+        """Keep the networks finished so far, once everything they write is written."""
+        self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+
+def resume_manifest(directory: str, settings: dict):
+    """
+    Args:
+        directory (str): The images directory of the run.
+        settings (dict): The options of the run that change its results or images.
+
+    Returns:
+        RunManifest: The manifest of an earlier run in the directory with the same settings, None if there is none.
+    """
+    if not os.path.isfile(os.path.join(directory, MANIFEST)):
+        return None
+    manifest = RunManifest(directory, settings)
+    if manifest.same_settings():
+        return manifest
+    manifest.close()
+    return None
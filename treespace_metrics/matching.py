@@ -0,0 +1,245 @@
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import maximum_bipartite_matching as csgraph_maximum_bipartite_matching
+except ImportError:
+    csr_matrix = None
+    csgraph_maximum_bipartite_matching = None
+
+
+def biadjacency(left: np.ndarray, right: np.ndarray, n_left: int) -> tuple:
+    """
+    Build the CSR biadjacency of a bipartite graph straight from its edge arrays.
+
+    Args:
+        left (np.ndarray): The left node id of every edge.
+        right (np.ndarray): The right node id of every edge, aligned with left.
+        n_left (int): The number of left nodes.
+
+    Returns:
+        tuple: The CSR offsets (length n_left + 1) and the right node ids sorted by left node.
+    """
+    left = np.asarray(left, dtype=np.int64)
+    order = np.argsort(left, kind='stable')
+    ptr = np.zeros(n_left + 1, dtype=np.int64)
+    np.cumsum(np.bincount(left, minlength=n_left), out=ptr[1:])
+    return ptr, np.asarray(right, dtype=np.int64)[order]
+
+
+def karp_sipser(ptr: list, idx: list, n_right: int, mate_left: list, mate_right: list):
+    """
+    Greedy warm start for the maximum matching, following the Karp-Sipser heuristic.
+    A free node with exactly one free neighbor is always matched to it first, as that choice is never wrong,
+    otherwise the next free left node is matched to its first free neighbor. Updates the mates in place.
+
+    Args:
+        ptr (list): CSR offsets of the biadjacency, indexed by left node.
+        idx (list): CSR right node ids of the biadjacency.
+        n_right (int): The number of right nodes.
+        mate_left (list): The right node matched to each left node, -1 if unmatched.
+        mate_right (list): The left node matched to each right node, -1 if unmatched.
+    """
+    n_left = len(ptr) - 1
+    rptr, ridx = biadjacency(idx, np.repeat(np.arange(n_left), np.diff(ptr)), n_right)
+    rptr = rptr.tolist()
+    ridx = ridx.tolist()
+
+    # Degrees only count free neighbors, left nodes are pushed as u and right nodes as ~v
+    left_degree = [0] * n_left
+    right_degree = [0] * n_right
+    for u in range(n_left):
+        if mate_left[u] == -1:
+            for k in range(ptr[u], ptr[u + 1]):
+                if mate_right[idx[k]] == -1:
+                    left_degree[u] += 1
+                    right_degree[idx[k]] += 1
+    stack = [u for u in range(n_left) if left_degree[u] == 1]
+    stack.extend(~v for v in range(n_right) if right_degree[v] == 1)
+
+    def match(u: int, v: int):
+        mate_left[u] = v
+        mate_right[v] = u
+        for j in range(ptr[u], ptr[u + 1]):
+            w = idx[j]
+            if mate_right[w] == -1:
+                right_degree[w] -= 1
+                if right_degree[w] == 1:
+                    stack.append(~w)
+        for j in range(rptr[v], rptr[v + 1]):
+            x = ridx[j]
+            if mate_left[x] == -1:
+                left_degree[x] -= 1
+                if left_degree[x] == 1:
+                    stack.append(x)
+
+    def first_free_neighbor(u: int) -> int:
+        for j in range(ptr[u], ptr[u + 1]):
+            if mate_right[idx[j]] == -1:
+                return idx[j]
+        return -1
+
+    for next_left in range(n_left + 1):
+        while stack:
+            node = stack.pop()
+            if node >= 0:
+                if mate_left[node] == -1:
+                    v = first_free_neighbor(node)
+                    if v != -1:
+                        match(node, v)
+            elif mate_right[~node] == -1:
+                for j in range(rptr[~node], rptr[~node + 1]):
+                    if mate_left[ridx[j]] == -1:
+                        match(ridx[j], ~node)
+                        break
+        if next_left < n_left and mate_left[next_left] == -1:
+            v = first_free_neighbor(next_left)
+            if v != -1:
+                match(next_left, v)
+
+
+def hopcroft_karp(ptr: list, idx: list, n_right: int, mate_left: list, mate_right: list):
+    """
+    Array-based Hopcroft-Karp algorithm, grows the given matching to a maximum matching in place.
+
+    Args:
+        ptr (list): CSR offsets of the biadjacency, indexed by left node.
+        idx (list): CSR right node ids of the biadjacency.
+        n_right (int): The number of right nodes.
+        mate_left (list): The right node matched to each left node, -1 if unmatched.
+        mate_right (list): The left node matched to each right node, -1 if unmatched.
+    """
+    n_left = len(ptr) - 1
+    unreached = n_left + 1
+    dist = [0] * n_left
+    while True:
+        # Layer the left nodes by their distance to a free left node
+        queue = []
+        for u in range(n_left):
+            if mate_left[u] == -1:
+                dist[u] = 0
+                queue.append(u)
+            else:
+                dist[u] = unreached
+        found = False
+        for u in queue:
+            for k in range(ptr[u], ptr[u + 1]):
+                w = mate_right[idx[k]]
+                if w == -1:
+                    found = True
+                elif dist[w] == unreached:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        if not found:
+            return
+
+        # Find vertex disjoint augmenting paths along the layers with an iterative depth first search
+        edge = ptr[:-1]
+        for u in range(n_left):
+            if mate_left[u] != -1:
+                continue
+            stack = [u]
+            via = []
+            while stack:
+                x = stack[-1]
+                if edge[x] == ptr[x + 1]:
+                    dist[x] = unreached
+                    stack.pop()
+                    if via:
+                        via.pop()
+                    continue
+                v = idx[edge[x]]
+                edge[x] += 1
+                w = mate_right[v]
+                if w == -1:
+                    via.append(v)
+                    for x, v in zip(stack, via):
+                        mate_left[x] = v
+                        mate_right[v] = x
+                    break
+                if dist[w] == dist[x] + 1:
+                    via.append(v)
+                    stack.append(w)
+
+
+def scipy_matching(ptr: list, idx: list, n_right: int, mate_left: list, mate_right: list):
+    """
+    Compute a maximum matching with scipy.sparse.csgraph.maximum_bipartite_matching, overwriting the mates.
+    SciPy can not warm start, so any matching passed in is discarded.
+
+    Args:
+        ptr (list): CSR offsets of the biadjacency, indexed by left node.
+        idx (list): CSR right node ids of the biadjacency.
+        n_right (int): The number of right nodes.
+        mate_left (list): The right node matched to each left node, -1 if unmatched.
+        mate_right (list): The left node matched to each right node, -1 if unmatched.
+    """
+    n_left = len(ptr) - 1
+    graph = csr_matrix((np.ones(len(idx), dtype=np.int8), np.asarray(idx), np.asarray(ptr)),
+                       shape=(n_left, n_right))
+    # csgraph expects a canonical matrix, repeated edges corrupt its memory
+    graph.sum_duplicates()
+    mate_left[:] = csgraph_maximum_bipartite_matching(graph, perm_type='column').tolist()
+    mate_right[:] = [-1] * n_right
+    for u, v in enumerate(mate_left):
+        if v != -1:
+            mate_right[v] = u
+
+
+def _greedy_hopcroft_karp(ptr: list, idx: list, n_right: int, mate_left: list, mate_right: list):
+    karp_sipser(ptr, idx, n_right, mate_left, mate_right)
+    hopcroft_karp(ptr, idx, n_right, mate_left, mate_right)
+
+
+# Matching engines, each one takes the CSR biadjacency and the mates to fill in place
+ENGINES = {
+    'hopcroft_karp': hopcroft_karp,
+    'karp_sipser': _greedy_hopcroft_karp,
+    'scipy': scipy_matching,
+}
+
+
+def default_method() -> str:
+    """
+    Returns:
+        str: 'scipy' when SciPy is installed, otherwise the pure Python Karp-Sipser + Hopcroft-Karp engine.
+    """
+    if csgraph_maximum_bipartite_matching is not None:
+        return 'scipy'
+    return 'karp_sipser'
+
+
+def maximum_bipartite_matching(left: np.ndarray, right: np.ndarray, n_left: int, n_right: int,
+                               method=None, initial=None) -> tuple:
+    """
+    Compute a maximum matching of a bipartite graph given as aligned edge arrays.
+
+    Args:
+        left (np.ndarray): The left node id of every edge.
+        right (np.ndarray): The right node id of every edge, aligned with left.
+        n_left (int): The number of left nodes.
+        n_right (int): The number of right nodes.
+        method (str, optional): The engine in ENGINES to use. Defaults to default_method().
+        initial (dict, optional): A matching {left: right} to warm start from, the scipy engine discards it.
+            Defaults to None.
+
+    Returns:
+        tuple: Two lists, the right node matched to each left node and the left node matched to each right node,
+        -1 marks an unmatched node.
+
+    Raises:
+        ValueError: If the method is not a known matching engine.
+    """
+    if method is None:
+        method = default_method()
+    if method not in ENGINES:
+        raise ValueError(f"Unknown matching method {method}, choose one of {sorted(ENGINES)}")
+    ptr, idx = biadjacency(left, right, n_left)
+    mate_left = [-1] * n_left
+    mate_right = [-1] * n_right
+    if initial is not None:
+        for u, v in initial.items():
+            mate_left[u] = v
+            mate_right[v] = u
+    ENGINES[method](ptr.tolist(), idx.tolist(), n_right, mate_left, mate_right)
+    return mate_left, mate_right
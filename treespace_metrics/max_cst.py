@@ -1,70 +1,70 @@
 from networkx import DiGraph
-from networkx.algorithms.flow import min_cost_flow
+from typing import Union
+from heapq import heappush, heappop
+import numpy as np
 import platform
 
-from treespace_metrics.utils import get_leaves
-from treespace_metrics.francis import build_path, rooted_spanning_tree
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+except ImportError:
+    csr_matrix = None
+    min_weight_full_bipartite_matching = None
+
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.francis import rooted_spanning_tree
+from treespace_metrics.paths import decompose_paths
 from treespace_metrics.drawing import draw_tree
 
 plt = platform.system()
 
 
-def maximum_covering_subtree(network: DiGraph, name=None, draw=False) -> [DiGraph, int]:
+def maximum_covering_subtree(network: Union[DiGraph, CompactNetwork], name=None, draw=False) -> [DiGraph, int]:
     """
     Implements the algorithm described in 'Maximum Covering Subtrees for Phylogenetic Networks' by Davidov et al.
     Finds the minimum number of nodes to cut to make a network tree-based.
 
     Args:
-        network (DiGraph): The phylogenetic network as a directed graph.
+        network (DiGraph | CompactNetwork): The phylogenetic network as a directed graph.
         name (str, optional): The name of the file to save the output image. Defaults to None.
         draw (bool, optional): Whether to generate and save an image of the network. Defaults to False.
 
     Returns:
         tuple[DiGraph, int]: A tuple containing the tree-based network and the number of nodes removed.
     """
-    leaves = get_leaves(network)
-    # Build min-cost flow network
-    # Create V_in and V_out node for each
-    f = create_flow_network(network, leaves)
-    flows = min_cost_flow(f)
-    start = []
-    matches = []
-    for src, flow in flows.items():
-        if src == "s":
-            for destination_node, value in flow.items():
-                if value == 1:
-                    dst_node_id = destination_node[2:]
-                    start.append(dst_node_id)
-        elif src.startswith('o-'):
-            for destination_node, value in flow.items():
-                if destination_node == "t":
-                    continue
-                if value == 1:
-                    src_node_id = src[2:]
-                    dst_node_id = destination_node[2:]
-                    matches.append((src_node_id, dst_node_id))
-                    # print(str(src_node_id) + "," + str(dst_node_id))
-    paths = []
-    for u in start:
-        # You do delete matches, so you need to pass a copy
-        p = build_path(u, matches.copy())
-        paths.append(p)
+    compact = as_compact(network)
+    # Solve the min-cost flow of Davidov et al. on the node ids, without building the flow network
+    starts, successors = max_cst_paths(compact)
+    paths = [compact.translate(path) for path in decompose_paths(successors, starts)]
 
     # Build rooted Spanning Tree
-    tree_based_network = rooted_spanning_tree(network, paths)
-    diff = set(network.nodes()) - set(tree_based_network.nodes())
+    tree_based_network = rooted_spanning_tree(compact, paths)
+    diff = set(compact.labels) - set(tree_based_network.nodes())
     n = len(diff)
 
     if draw:
-        if name is None:
-            draw_tree(network, "original network")
-            draw_tree(tree_based_network, "tree-based network")
-        else:
-            draw_tree(network, name)
-            draw_tree(tree_based_network, name + "-MAX-CST")
+        draw_max_cst(network, tree_based_network, name)
     return tree_based_network, n
 
 
+def draw_max_cst(network: Union[DiGraph, CompactNetwork], tree_based_network: DiGraph, name=None):
+    """
+    Draw the network and its maximum covering subtree.
+
+    Args:
+        network (DiGraph | CompactNetwork): The phylogenetic network as a directed graph.
+        tree_based_network (DiGraph): The maximum covering subtree of the network.
+        name (str, optional): The name of the file to save the output image. Defaults to None.
+    """
+    network = network if isinstance(network, DiGraph) else network.to_digraph()
+    if name is None:
+        draw_tree(network, "original network")
+        draw_tree(tree_based_network, "tree-based network")
+    else:
+        draw_tree(network, name)
+        draw_tree(tree_based_network, name + "-MAX-CST")
+
+
 def create_flow_network(network: DiGraph, leaves: list) -> DiGraph:
     """
     Generates the flow network required to compute the minimum number of nodes to cut.
@@ -92,3 +92,186 @@ def create_flow_network(network: DiGraph, leaves: list) -> DiGraph:
     for edge in network.edges():
         f.add_edge("o-" + str(edge[0]), "i-" + str(edge[1]), capacity=1, weight=0)
     return f
+
+
+def max_cst_paths(network: CompactNetwork, weights=None, method=None) -> tuple:
+    """
+    Solve the min-cost flow instance of 'Maximum Covering Subtrees for Phylogenetic Networks' on integer arrays.
+    Every capacity is 1, so the flow is a set of vertex disjoint paths, one ending at each leaf,
+    that covers the most (weighted) nodes. Weights let callers value some nodes more than others,
+    every weight must be a positive integer so the paths still extend up to the parents of their first node.
+
+    Args:
+        network (CompactNetwork): The phylogenetic network in compact form.
+        weights (np.ndarray, optional): The value of covering each node id. Defaults to 1 for every node.
+        method (str, optional): 'scipy' to solve it as a min-weight full bipartite matching with SciPy,
+            or 'ssp' for successive shortest paths. Defaults to 'scipy' when SciPy is installed.
+
+    Returns:
+        tuple:
+            - np.ndarray: The node ids where a path starts.
+            - np.ndarray: The next node id on the path of every node id, -1 if it ends a path or is not covered.
+
+    Raises:
+        ValueError: If the method is not 'scipy' or 'ssp'.
+    """
+    if weights is None:
+        weights = np.ones(len(network), dtype=np.int64)
+    if method is None:
+        method = 'ssp' if min_weight_full_bipartite_matching is None else 'scipy'
+    if method == 'scipy':
+        return _max_cst_assignment(network, weights)
+    if method == 'ssp':
+        return _max_cst_successive_shortest_paths(network, weights)
+    raise ValueError(f"Unknown Max-CST method {method}, choose 'scipy' or 'ssp'")
+
+
+def _max_cst_assignment(network: CompactNetwork, weights: np.ndarray) -> tuple:
+    """
+    Helper function for max_cst_paths. The flow is a left-perfect assignment between the V_out nodes of
+    the non-leaf nodes (rows) and the V_in nodes of all nodes (columns).
+    A row takes a child for a cost of 1, or its own column, which leaves the node uncovered, for 1 + its weight.
+    The |leaves| columns left free are where the paths start.
+    """
+    n = len(network)
+    sources, targets = network.edges()
+    internal = np.flatnonzero(network.out_degree != 0)
+    starts = np.ones(n, dtype=bool)
+    successors = np.full(n, -1, dtype=np.int64)
+    if len(internal) == 0:
+        return np.flatnonzero(starts), successors
+
+    row_of = np.full(n, -1, dtype=np.int64)
+    row_of[internal] = np.arange(len(internal))
+    rows = np.concatenate([row_of[sources], row_of[internal]])
+    columns = np.concatenate([targets, internal])
+    costs = np.concatenate([np.ones(len(sources)), 1 + weights[internal]]).astype(np.float64)
+    order = np.lexsort((columns, rows))
+    ptr = np.zeros(len(internal) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(internal)), out=ptr[1:])
+    biadjacency = csr_matrix((costs[order], columns[order], ptr), shape=(len(internal), n))
+
+    row_ind, col_ind = min_weight_full_bipartite_matching(biadjacency)
+    nodes = internal[row_ind]
+    covered = col_ind != nodes
+    successors[nodes[covered]] = col_ind[covered]
+    starts[col_ind] = False
+    return np.flatnonzero(starts), successors
+
+
+def _max_cst_successive_shortest_paths(network: CompactNetwork, weights: np.ndarray) -> tuple:
+    """
+    Helper function for max_cst_paths. Primal-dual successive shortest paths on the unit capacity flow network
+    s -> V_in -> V_out -> t, where V_in of node v is v, V_out is n + v, s is 2n and t is 2n + 1.
+    The flow network is a DAG, so the first potentials come from one pass over the topological order,
+    and after every Dijkstra all shortest paths are augmented at once with a blocking flow.
+    """
+    n = len(network)
+    s, t = 2 * n, 2 * n + 1
+    sources, targets = network.edges()
+    leaves = np.flatnonzero(network.out_degree == 0)
+    ids = np.arange(n)
+
+    # Edge e is stored at 2e and its residual reverse at 2e + 1
+    tails = np.concatenate([np.full(n, s), ids, leaves + n, sources + n])
+    heads = np.concatenate([ids, ids + n, np.full(len(leaves), t), targets])
+    costs = np.concatenate([np.zeros(n, dtype=np.int64), -weights, np.zeros(len(leaves) + len(sources), dtype=np.int64)])
+    frm = np.empty(2 * len(tails), dtype=np.int64)
+    to = np.empty(2 * len(tails), dtype=np.int64)
+    cost = np.empty(2 * len(tails), dtype=np.int64)
+    frm[0::2], frm[1::2] = tails, heads
+    to[0::2], to[1::2] = heads, tails
+    cost[0::2], cost[1::2] = costs, -costs
+    order = np.argsort(frm, kind='stable')
+    ptr = np.zeros(t + 2, dtype=np.int64)
+    np.cumsum(np.bincount(frm, minlength=t + 1), out=ptr[1:])
+    ptr, adjacency = ptr.tolist(), order.tolist()
+    to, cost = to.tolist(), cost.tolist()
+    capacity = [1, 0] * len(tails)
+
+    # Shortest distances from s in the DAG, as the first node potentials
+    potential = [0] * (t + 1)
+    parent_ptr, parent_idx = network.parent_ptr.tolist(), network.parent_idx.tolist()
+    weight = weights.tolist()
+    for v in network.topological_order():
+        best = 0
+        for k in range(parent_ptr[v], parent_ptr[v + 1]):
+            best = min(best, potential[n + parent_idx[k]])
+        potential[v] = best
+        potential[n + v] = best - weight[v]
+    potential[t] = min((potential[n + leaf] for leaf in leaves.tolist()), default=0)
+
+    infinity = float('inf')
+    flow = 0
+    while flow < len(leaves):
+        distance = [infinity] * (t + 1)
+        distance[s] = 0
+        heap = [(0, s)]
+        while heap:
+            d, u = heappop(heap)
+            if d > distance[u]:
+                continue
+            for k in range(ptr[u], ptr[u + 1]):
+                e = adjacency[k]
+                if capacity[e]:
+                    v = to[e]
+                    nd = d + cost[e] + potential[u] - potential[v]
+                    if nd < distance[v]:
+                        distance[v] = nd
+                        heappush(heap, (nd, v))
+        limit = distance[t]
+        if limit == infinity:
+            raise ValueError("No set of disjoint paths reaches every leaf")
+        for v in range(t + 1):
+            potential[v] += min(distance[v], limit)
+
+        # Blocking flows along the edges with a reduced cost of 0
+        while flow < len(leaves):
+            level = [-1] * (t + 1)
+            level[s] = 0
+            queue = [s]
+            for u in queue:
+                for k in range(ptr[u], ptr[u + 1]):
+                    e = adjacency[k]
+                    v = to[e]
+                    if capacity[e] and level[v] == -1 and cost[e] + potential[u] == potential[v]:
+                        level[v] = level[u] + 1
+                        queue.append(v)
+            if level[t] == -1:
+                break
+            current = ptr[:-1]
+            stack = [s]
+            path = []
+            while stack:
+                u = stack[-1]
+                if u == t:
+                    for e in path:
+                        capacity[e] -= 1
+                        capacity[e ^ 1] += 1
+                    flow += 1
+                    stack = [s]
+                    path = []
+                    continue
+                advanced = False
+                while current[u] < ptr[u + 1]:
+                    e = adjacency[current[u]]
+                    v = to[e]
+                    if capacity[e] and level[v] == level[u] + 1 and cost[e] + potential[u] == potential[v]:
+                        stack.append(v)
+                        path.append(e)
+                        advanced = True
+                        break
+                    current[u] += 1
+                if not advanced:
+                    level[u] = -1
+                    stack.pop()
+                    if path:
+                        path.pop()
+
+    # Read the paths back from the saturated edges
+    starts = np.flatnonzero(np.array(capacity[0:2 * n:2]) == 0)
+    successors = np.full(n, -1, dtype=np.int64)
+    offset = 2 * n + len(leaves)
+    used = np.array(capacity[2 * offset::2]) == 0
+    successors[sources[used]] = targets[used]
+    return starts, successors
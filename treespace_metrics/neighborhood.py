@@ -0,0 +1,191 @@
+from collections import namedtuple
+from typing import Iterator, Union
+import numpy as np
+from networkx import DiGraph
+
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.incremental import IncrementalNetwork
+from treespace_metrics.max_cst import max_cst_paths
+
+# A rearrangement move, kind is 'tail' or 'head', edge is the moved edge and target the edge it is moved to,
+# both as (source, target) labels
+Move = namedtuple('Move', ['kind', 'edge', 'target'])
+
+# The metrics of the network a move leads to
+NeighborMetrics = namedtuple('NeighborMetrics', ['move', 'tree_based', 'unmatched_omnians', 'missing_v1', 'eta'])
+
+MOVES = ('tail', 'head')
+
+
+def _reachable(adjacency: list, start: int) -> set:
+    """
+    Returns:
+        set: The node ids reachable from start by following the adjacency lists, start included.
+    """
+    seen = {start}
+    stack = [start]
+    while stack:
+        for w in adjacency[stack.pop()]:
+            if w not in seen:
+                seen.add(w)
+                stack.append(w)
+    return seen
+
+
+def _moves(network: CompactNetwork, kinds=MOVES, rnni=False) -> Iterator[tuple]:
+    """
+    Enumerate the valid moves on node ids, see rearrangement_moves.
+
+    Returns:
+        Iterator[tuple]: The kind, the moved edge and the target edge of every move, as node ids.
+    """
+    children = [network.children(i).tolist() for i in range(len(network))]
+    parents = [network.parents(i).tolist() for i in range(len(network))]
+    sources, targets = network.edges()
+    edges = list(zip(sources.tolist(), targets.tolist()))
+    classification = network.classification
+
+    for u, v in edges:
+        # A tail move detaches u, the tail of (u, v), joins its parent p to its other child c,
+        # and subdivides the target edge with u. It needs x -> u -> v to stay acyclic, so x is not below v.
+        if 'tail' in kinds and classification.in_degree[u] == 1 and classification.out_degree[u] == 2:
+            p = parents[u][0]
+            c = children[u][0] if children[u][1] == v else children[u][1]
+            if c not in children[p]:
+                below = _reachable(children, v)
+                for x, y in edges:
+                    if x == u or y == u or x in below or y == v:
+                        continue
+                    if rnni and not {x, y} & {p, c}:
+                        continue
+                    yield 'tail', (u, v), (x, y), (p, c)
+
+        # A head move detaches v, the head of (u, v), joins its other parent q to its child c,
+        # and subdivides the target edge with v. It needs u -> v -> y to stay acyclic, so y is not above u.
+        if 'head' in kinds and classification.reticulation[v] and classification.in_degree[v] == 2:
+            q = parents[v][0] if parents[v][1] == u else parents[v][1]
+            c = children[v][0]
+            if c not in children[q]:
+                above = _reachable(parents, u)
+                for x, y in edges:
+                    if x == v or y == v or y in above or x == u:
+                        continue
+                    if rnni and not {x, y} & {q, c}:
+                        continue
+                    yield 'head', (u, v), (x, y), (q, c)
+
+
+def _edits(kind: str, edge: tuple, target: tuple, bypass: tuple) -> tuple:
+    """
+    Returns:
+        tuple: The edges removed and the edges added by a move, as node ids.
+    """
+    (u, v), (x, y), (a, b) = edge, target, bypass
+    # The moved endpoint is suppressed between a and b, then subdivides (x, y)
+    moved = u if kind == 'tail' else v
+    return [(a, moved), (moved, b), (x, y)], [(a, b), (x, moved), (moved, y)]
+
+
+def rearrangement_moves(network: Union[DiGraph, CompactNetwork], kinds=MOVES, rnni=False) -> Iterator[Move]:
+    """
+    Enumerate every tail move and head move of a network that gives another network, acyclic and
+    without parallel edges. Read the paper "Exploring the tiers of rooted phylogenetic network space using
+    tail moves" by Janssen et al. With rnni, only the moves of an endpoint to an edge adjacent to it are kept,
+    these are the rNNI moves.
+
+    Args:
+        network (DiGraph | CompactNetwork): The phylogenetic network.
+        kinds (iterable, optional): The kinds of moves, 'tail' and/or 'head'. Defaults to both.
+        rnni (bool, optional): Whether to only enumerate rNNI moves. Defaults to False.
+
+    Returns:
+        Iterator[Move]: Every move, with its edges as labels.
+    """
+    compact = as_compact(network)
+    labels = compact.labels
+    for kind, (u, v), (x, y), _ in _moves(compact, kinds, rnni):
+        yield Move(kind, (labels[u], labels[v]), (labels[x], labels[y]))
+
+
+def apply_move(network: DiGraph, move: Move) -> DiGraph:
+    """
+    Build the network a move leads to, the input network is not changed.
+
+    Args:
+        network (DiGraph): The phylogenetic network.
+        move (Move): A move from rearrangement_moves.
+
+    Returns:
+        DiGraph: The neighboring network.
+    """
+    (u, v), target = move.edge, move.target
+    if move.kind == 'tail':
+        a = next(iter(network.predecessors(u)))
+        b = next(w for w in network.successors(u) if w != v)
+    else:
+        a = next(w for w in network.predecessors(v) if w != u)
+        b = next(iter(network.successors(v)))
+    removed, added = _edits(move.kind, move.edge, target, (a, b))
+    neighbor = network.copy()
+    neighbor.remove_edges_from(removed)
+    neighbor.add_edges_from(added)
+    return neighbor
+
+
+def evaluate_neighborhood(network: Union[DiGraph, CompactNetwork], kinds=MOVES, rnni=False, eta=True,
+                          matching_method=None) -> list:
+    """
+    Compute the metrics of every neighbor of a network under tail and head moves.
+    The neighbors are never analyzed from scratch: each move is applied to one IncrementalNetwork,
+    which repairs the Jetten and Francis matchings and the node types around the six edited edges only,
+    the metrics are read from it, and the move is undone. Max-CST is solved on the parent's edge arrays
+    patched with the move, sharing its label table.
+
+    Args:
+        network (DiGraph | CompactNetwork): The phylogenetic network.
+        kinds (iterable, optional): The kinds of moves, 'tail' and/or 'head'. Defaults to both.
+        rnni (bool, optional): Whether to only evaluate rNNI moves. Defaults to False.
+        eta (bool, optional): Whether to compute the Max-CST eta of every neighbor, it is None otherwise.
+            Defaults to True.
+        matching_method (str, optional): The matching engine for the initial matchings. Defaults to None.
+
+    Returns:
+        list[NeighborMetrics]: The move and the metrics of every neighbor.
+    """
+    compact = as_compact(network)
+    labels = compact.labels
+    incremental = IncrementalNetwork(compact, matching_method)
+    sources, targets = compact.edges()
+    edge_id = {edge: i for i, edge in enumerate(zip(sources.tolist(), targets.tolist()))}
+    internal = np.count_nonzero(compact.out_degree != 0)
+
+    results = []
+    for kind, edge, target, bypass in _moves(compact, kinds, rnni):
+        removed, added = _edits(kind, edge, target, bypass)
+        for s, t in removed:
+            incremental.remove_edge(labels[s], labels[t])
+        for s, t in added:
+            incremental.add_edge(labels[s], labels[t])
+        tree_based = incremental.tree_based
+        unmatched_omnians = incremental.unmatched_omnians
+        missing_v1 = incremental.missing_v1
+        for s, t in reversed(added):
+            incremental.remove_edge(labels[s], labels[t])
+        for s, t in reversed(removed):
+            incremental.add_edge(labels[s], labels[t])
+
+        neighbor_eta = None
+        if eta:
+            keep = np.ones(len(sources), dtype=bool)
+            keep[[edge_id[e] for e in removed]] = False
+            added_sources, added_targets = zip(*added)
+            neighbor = CompactNetwork(labels, np.concatenate([sources[keep], added_sources]),
+                                      np.concatenate([targets[keep], added_targets]), compact.index)
+            _, successors = max_cst_paths(neighbor)
+            # Moves keep every node's out-degree, so the non-leaf nodes are the same. Each one is uncovered
+            # exactly when the Max-CST paths do not continue from it.
+            neighbor_eta = int(internal - np.count_nonzero(successors != -1))
+
+        move = Move(kind, (labels[edge[0]], labels[edge[1]]), (labels[target[0]], labels[target[1]]))
+        results.append(NeighborMetrics(move, tree_based, unmatched_omnians, missing_v1, neighbor_eta))
+    return results
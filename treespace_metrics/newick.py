@@ -0,0 +1,234 @@
+import os
+import re
+from typing import Iterator, Union
+from networkx import DiGraph
+
+from treespace_metrics.compact import CompactNetwork
+from treespace_metrics.utils import OPENERS
+
+# Comments, quoted labels, delimiters, bare labels and whitespace, in that order
+TOKEN = re.compile(r"\[[^\]]*\]|'(?:[^']|'')*'|[(),:;]|[^(),:;\[\]'\s]+|\s+")
+# Comments, quoted labels and the text between them, a quote inside a comment does not start a quoted label
+SPAN = re.compile(r"\[[^\]]*\]|'(?:[^']|'')*'|[^\['\]]+|\]")
+
+
+class NewickParser:
+    """
+    Streaming parser of (extended) Newick strings, read the paper "Extended Newick:
+    it is time for a standard representation of phylogenetic networks" by Cardona et al.
+    Each network is emitted straight as node ids and edges, without building an intermediate tree.
+    Every occurrence of a hybrid node 'label#H1' is merged into one node, keyed by its '#H1' tag,
+    named by the first occurrence that has a label in front of the tag.
+    Unlabeled nodes get a unique label, branch lengths, support values and [comments] are skipped.
+
+    Feed it text in any pieces with feed, every complete network (ending with ';') is returned as it is parsed.
+    """
+    def __init__(self):
+        self._pending_text = ''
+        self._reset()
+
+    def _reset(self):
+        self.labels = []
+        self.sources = []
+        self.targets = []
+        self._hybrids = {}
+        self._unlabeled = []
+        # The children of every open parenthesis, the outermost level collects the root
+        self._stack = [[]]
+        # The children and label of the node being read, None between nodes
+        self._children = None
+        self._label = None
+        self._in_branch = False
+
+    def feed(self, text: str) -> list:
+        """
+        Parse the next piece of text.
+
+        Args:
+            text (str): The next characters of the Newick input.
+
+        Returns:
+            list: The (labels, sources, targets) of every network completed by this piece of text.
+
+        Raises:
+            ValueError: If the parentheses do not match.
+        """
+        text = self._pending_text + text
+        # A comment or quoted label may be split between pieces, keep it until it is complete
+        cut = _incomplete_suffix(text)
+        self._pending_text = text[cut:]
+        networks = []
+        for match in TOKEN.finditer(text, 0, cut):
+            token = match.group()
+            if token[0] == '[' or token.isspace():
+                continue
+            if token == '(':
+                self._stack.append([])
+            elif token == ',':
+                self._close_node()
+            elif token == ')':
+                self._close_node()
+                if len(self._stack) == 1:
+                    raise ValueError("Unbalanced ')' in Newick string")
+                self._children = self._stack.pop()
+                self._label = ''
+                self._in_branch = False
+            elif token == ':':
+                self._in_branch = True
+            elif token == ';':
+                self._close_node()
+                if len(self._stack) != 1:
+                    raise ValueError("Unbalanced '(' in Newick string")
+                networks.append(self._finish())
+            elif not self._in_branch:
+                if token[0] == "'":
+                    token = token[1:-1].replace("''", "'")
+                if self._children is None:
+                    self._children = []
+                    self._label = ''
+                self._label += token
+        return networks
+
+    def _close_node(self):
+        """Resolve the node that was just read to its id, and connect it to its children."""
+        if self._children is None:
+            # An empty leaf such as in '(,a)'
+            self._children = []
+            self._label = ''
+        label = self._label
+        node = None
+        if '#' in label:
+            name, tag = label.rsplit('#', 1)
+            node = self._hybrids.get(tag)
+            if node is None:
+                node = self._hybrids[tag] = self._add_node(label)
+            elif name and self.labels[node].startswith('#'):
+                self.labels[node] = label
+        else:
+            node = self._add_node(label)
+        for child in self._children:
+            self.sources.append(node)
+            self.targets.append(child)
+        self._stack[-1].append(node)
+        self._children = None
+        self._label = None
+        self._in_branch = False
+
+    def incomplete(self) -> bool:
+        """
+        Returns:
+            bool: Whether a network was started after the last complete one, and has no ';' yet.
+        """
+        return bool(self.labels or self._children is not None or self._in_branch or len(self._stack) > 1
+                    or self._stack[0] or self._pending_text.strip())
+
+    def _add_node(self, label: str) -> int:
+        if not label:
+            self._unlabeled.append(len(self.labels))
+        self.labels.append(label)
+        return len(self.labels) - 1
+
+    def _finish(self) -> tuple:
+        labels = self.labels
+        if self._unlabeled:
+            used = set(labels)
+            for node in self._unlabeled:
+                label = f"unlabeled_{node}"
+                while label in used:
+                    label += '_'
+                labels[node] = label
+        if len(set(labels)) != len(labels):
+            duplicates = sorted({label for label in labels if labels.count(label) > 1})
+            raise ValueError(f"Found repeated node labels that are not hybrid nodes: {duplicates}")
+        network = labels, self.sources, self.targets
+        self._reset()
+        return network
+
+
+def _incomplete_suffix(text: str) -> int:
+    """
+    Returns:
+        int: Where an unclosed [comment] or 'quoted label' at the end of the text starts, len(text) otherwise.
+            A quoted label that ends the text is kept too, as the next piece may continue it with an escaped ''.
+    """
+    position = 0
+    while position < len(text):
+        match = SPAN.match(text, position)
+        if match is None or match.group()[0] == "'" and match.end() == len(text):
+            return position
+        position = match.end()
+    return len(text)
+
+
+def _to_network(labels: list, sources: list, targets: list, compact: bool) -> Union[DiGraph, CompactNetwork]:
+    if compact:
+        return CompactNetwork(labels, sources, targets)
+    g = DiGraph()
+    g.add_nodes_from(labels)
+    g.add_edges_from(zip((labels[s] for s in sources), (labels[t] for t in targets)))
+    return g
+
+
+def parse_newick(text: str, compact=False) -> Iterator[Union[DiGraph, CompactNetwork]]:
+    """
+    Parse every network in an (extended) Newick string.
+
+    Args:
+        text (str): One or more Newick networks, each one ending with ';'.
+        compact (bool, optional): Whether to emit CompactNetworks instead of DiGraphs. Defaults to False.
+
+    Returns:
+        Iterator[DiGraph | CompactNetwork]: The rooted networks, in order.
+
+    Raises:
+        ValueError: If the text ends in the middle of a network.
+    """
+    parser = NewickParser()
+    for network in parser.feed(text):
+        yield _to_network(*network, compact)
+    if parser.incomplete():
+        raise ValueError("The Newick string ends in the middle of a network, is a ';' missing?")
+
+
+def iter_newick(newick_file: str, compact=False) -> Iterator[Union[DiGraph, CompactNetwork]]:
+    """
+    Stream the networks of an (extended) Newick file, such as a posterior sample with one network per line,
+    only holding one network in memory at a time. .gz, .xz and .bz2 files are decompressed transparently.
+
+    Args:
+        newick_file (str): Path to the Newick file.
+        compact (bool, optional): Whether to emit CompactNetworks instead of DiGraphs. Defaults to False.
+
+    Returns:
+        Iterator[DiGraph | CompactNetwork]: The rooted networks, in file order.
+
+    Raises:
+        ValueError: If the file ends in the middle of a network.
+    """
+    parser = NewickParser()
+    opener = OPENERS.get(os.path.splitext(newick_file)[1], open)
+    with opener(newick_file, 'rt') as fd:
+        for line in fd:
+            for network in parser.feed(line):
+                yield _to_network(*network, compact)
+    if parser.incomplete():
+        raise ValueError(f"{newick_file} ends in the middle of a network, is a ';' missing?")
+
+
+def read_newick(newick_file: str, compact=False) -> Union[DiGraph, CompactNetwork]:
+    """
+    Read the first network of an (extended) Newick file.
+
+    Args:
+        newick_file (str): Path to the Newick file.
+        compact (bool, optional): Whether to return a CompactNetwork instead of a DiGraph. Defaults to False.
+
+    Returns:
+        DiGraph | CompactNetwork: The rooted network.
+
+    Raises:
+        ValueError: If the file holds no complete network.
+    """
+    for network in iter_newick(newick_file, compact):
+        return network
+    raise ValueError(f"No Newick network found in {newick_file}")
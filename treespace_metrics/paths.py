@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def successors_from_matching(mate_left: list, n: int) -> tuple:
+    """
+    Turn a matching of the V -> V' bipartite graph into successor and predecessor arrays, once.
+    A matched edge (u, v') means v follows u on its vertex disjoint path.
+
+    Args:
+        mate_left (list): The node id matched to each node id, -1 if unmatched.
+        n (int): The number of nodes in the network.
+
+    Returns:
+        tuple:
+            - np.ndarray: The next node id on the path of every node id, -1 at the end of a path.
+            - np.ndarray: The previous node id on the path of every node id, -1 at the start of a path.
+    """
+    successors = np.asarray(mate_left, dtype=np.int64).reshape(n)
+    predecessors = np.full(n, -1, dtype=np.int64)
+    matched = np.flatnonzero(successors != -1)
+    predecessors[successors[matched]] = matched
+    return successors, predecessors
+
+
+def decompose_paths(successors: np.ndarray, starts=None) -> list:
+    """
+    Emit every vertex disjoint path by following the successor array, in O(n) overall.
+
+    Args:
+        successors (np.ndarray): The next node id on the path of every node id, -1 at the end of a path.
+        starts (np.ndarray, optional): The node ids where the paths start.
+            Defaults to every node id that is not the successor of another node.
+
+    Returns:
+        list: The list of paths, each path is a list of node ids.
+    """
+    if starts is None:
+        starts = np.ones(len(successors), dtype=bool)
+        starts[successors[successors != -1]] = False
+        starts = np.flatnonzero(starts)
+    successor = successors.tolist()
+    paths = []
+    for u in np.asarray(starts).tolist():
+        path = [u]
+        u = successor[u]
+        while u != -1:
+            path.append(u)
+            u = successor[u]
+        paths.append(path)
+    return paths
@@ -0,0 +1,136 @@
+import cProfile
+import heapq
+import os
+import pstats
+import time
+import tracemalloc
+
+# Only the functions of this package are reported as hotspots
+PACKAGE = 'treespace_metrics'
+NUM_HOTSPOTS = 40
+
+
+class SlowestNetworks:
+    """
+    A running top-K of the slowest networks of a batch, only the K inputs themselves are kept.
+    analyze_all offers every network as its row comes back from analyze_in_order, so besides these,
+    only the networks in flight are held, not every input of the run.
+
+    Args:
+        k (int): The number of networks to keep.
+    """
+    def __init__(self, k: int):
+        self.k = k
+        # A min-heap of (seconds, order, name, item), so the fastest kept network is the first one pushed out
+        self._heap = []
+        self._count = 0
+
+    def add(self, seconds: float, name: str, item):
+        """
+        Offer a network, it is kept if it is one of the K slowest so far.
+
+        Args:
+            seconds (float): The wall time of its analysis.
+            name (str): Its name in metrics.csv.
+            item: What the analysis was called with, to run it again.
+        """
+        entry = (seconds, self._count, name, item)
+        self._count += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif self.k > 0 and seconds > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def slowest(self) -> list:
+        """
+        Returns:
+            list: The (seconds, name, item) of the kept networks, slowest first.
+        """
+        return [(seconds, name, item) for seconds, _, name, item in sorted(self._heap, reverse=True)]
+
+
+def timed(item, analyze) -> tuple:
+    """
+    Run the analysis of one network and time it, in the worker process.
+
+    Args:
+        item: The input of analyze.
+        analyze (callable): The analysis, returns the metrics.csv row.
+
+    Returns:
+        tuple: The row and the wall time in seconds.
+    """
+    start = time.perf_counter()
+    row = analyze(item)
+    return row, time.perf_counter() - start
+
+
+def profile_networks(slowest: list, analyze, profile_dir: str, memory=False) -> list:
+    """
+    Run the analysis of every network again under cProfile, and optionally tracemalloc,
+    and save the pstats file (and the snapshot) of each one in profile_dir.
+    The .prof files can be opened by pstats, snakeviz or gprof2dot for flame graphs.
+
+    Args:
+        slowest (list): The (seconds, name, item) of the networks, from SlowestNetworks.slowest.
+        analyze (callable): The analysis, called with each item.
+        profile_dir (str): The directory to save the profiles in.
+        memory (bool, optional): Whether to also save a tracemalloc snapshot of every network. Defaults to False.
+
+    Returns:
+        list: The paths of the .prof files.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    profiles = []
+    for _, name, item in slowest:
+        location = os.path.join(profile_dir, name)
+        profiler = cProfile.Profile()
+        if memory:
+            tracemalloc.start()
+        try:
+            profiler.runcall(analyze, item)
+            if memory:
+                tracemalloc.take_snapshot().dump(location + '.tracemalloc')
+        finally:
+            if memory:
+                tracemalloc.stop()
+        profiler.dump_stats(location + '.prof')
+        profiles.append(location + '.prof')
+    return profiles
+
+
+def write_hotspot_report(profiles: list, slowest: list, profile_dir: str, num_hotspots=NUM_HOTSPOTS):
+    """
+    Merge the profiles of the slowest networks, and write which functions of treespace_metrics
+    they spent their time in: slowest.csv lists the networks, hotspots.csv has the calls, own time
+    and cumulative time of every package function over all of them, and hotspots.txt is the pstats report.
+    The merged profile is also saved as all.prof.
+
+    Args:
+        profiles (list): The .prof files from profile_networks.
+        slowest (list): The (seconds, name, item) of the profiled networks.
+        profile_dir (str): The directory to write the report in.
+        num_hotspots (int, optional): The number of functions in hotspots.txt. Defaults to NUM_HOTSPOTS.
+    """
+    with open(os.path.join(profile_dir, 'slowest.csv'), 'w') as fd:
+        fd.write('graph,seconds\n')
+        fd.writelines(f"{name},{seconds:.6f}\n" for seconds, name, _ in slowest)
+    if not profiles:
+        return
+
+    stats = pstats.Stats(*profiles)
+    stats.dump_stats(os.path.join(profile_dir, 'all.prof'))
+    # Every entry is (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+    hotspots = sorted(((key, value) for key, value in stats.stats.items() if PACKAGE in key[0]),
+                      key=lambda hotspot: hotspot[1][2], reverse=True)
+    with open(os.path.join(profile_dir, 'hotspots.csv'), 'w') as fd:
+        fd.write('function,module,line,calls,own_seconds,cumulative_seconds\n')
+        for (file_name, line, function), (_, calls, own, cumulative, _) in hotspots:
+            module = os.path.relpath(file_name, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            fd.write(f"{function},{module},{line},{calls},{own:.6f},{cumulative:.6f}\n")
+
+    with open(os.path.join(profile_dir, 'hotspots.txt'), 'w') as fd:
+        fd.write(f"Profiles of the {len(profiles)} slowest networks, restricted to {PACKAGE}\n")
+        report = pstats.Stats(*profiles, stream=fd)
+        report.sort_stats('cumulative').print_stats(PACKAGE, num_hotspots)
+        report.sort_stats('tottime').print_stats(PACKAGE, num_hotspots)
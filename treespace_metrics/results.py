@@ -0,0 +1,198 @@
+import csv
+import json
+import os
+import sys
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from treespace_metrics.analysis import METRICS, ROOTED_TREE_OPTIMAL
+
+# The formats a run can write its results in, and the file name of each one, NDJSON is written to stdout
+FORMATS = ('csv', 'ndjson', 'parquet', 'arrow')
+FILE_NAMES = {'csv': 'metrics.csv', 'parquet': 'metrics.parquet', 'arrow': 'metrics.arrow'}
+# The rows buffered before a batch is written, every batch is one row group of the columnar formats
+FLUSH_ROWS = 256
+
+# The type of every metrics.csv column, the extra columns are typed by their suffix
+COLUMN_TYPES = {'graph': str, 'is_tree_based': bool, **{column: int for column in METRICS if column != 'is_tree_based'},
+                ROOTED_TREE_OPTIMAL: bool}
+SUFFIX_TYPES = {'_seconds': float, '_bytes': int}
+
+
+def column_type(column: str) -> type:
+    """
+    Args:
+        column (str): A metrics.csv column, one of METRICS, 'graph' or an extra column such as the stage columns.
+
+    Returns:
+        type: The type of its values, str for an unknown extra column.
+    """
+    if column in COLUMN_TYPES:
+        return COLUMN_TYPES[column]
+    for suffix, value_type in SUFFIX_TYPES.items():
+        if column.endswith(suffix):
+            return value_type
+    return str
+
+
+class ResultSink:
+    """
+    Writes the rows of a run through one handle that stays open for the whole run, buffering them
+    and writing them in batches of flush_rows, so a network costs no open, close or flush of its own.
+    Subclasses write a batch in their format.
+
+    Args:
+        header (list): The columns, 'graph', the metrics and any extra columns.
+        flush_rows (int, optional): The number of rows buffered before they are written. Defaults to FLUSH_ROWS.
+    """
+    def __init__(self, header: list, flush_rows=FLUSH_ROWS):
+        self.header = list(header)
+        self.types = [column_type(column) for column in self.header]
+        self.flush_rows = flush_rows
+        self.rows = 0
+        self._batch = []
+
+    def write(self, row: list):
+        """
+        Args:
+            row (list): The values of a network, in the order of the header.
+        """
+        self._batch.append(row)
+        self.rows += 1
+        if len(self._batch) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows."""
+        if self._batch:
+            self._write_batch(self._batch)
+            self._batch = []
+
+    def close(self):
+        """Write the buffered rows, then close the handle."""
+        self.flush()
+        self._close()
+
+    def typed(self, row: list) -> list:
+        """
+        Args:
+            row (list): The values of a network, as the analysis returns them.
+
+        Returns:
+            list: The values converted to the type of their column.
+        """
+        return [value_type(int(value)) if value_type is bool else value_type(value)
+                for value_type, value in zip(self.types, row)]
+
+    def _write_batch(self, batch: list):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CSVSink(ResultSink):
+    """
+    Writes the rows as metrics.csv, with the values as the analysis returns them, like answers.csv.
+
+    Args:
+        path (str): The CSV file, it is overwritten.
+        header (list): The columns.
+        flush_rows (int, optional): The number of rows buffered before they are written. Defaults to FLUSH_ROWS.
+    """
+    def __init__(self, path: str, header: list, flush_rows=FLUSH_ROWS):
+        super().__init__(header, flush_rows)
+        self._fd = open(path, 'w', newline='')
+        self._writer = csv.writer(self._fd, lineterminator='\n')
+        self._writer.writerow(self.header)
+
+    def _write_batch(self, batch: list):
+        self._writer.writerows(batch)
+        self._fd.flush()
+
+    def _close(self):
+        self._fd.close()
+
+
+class NDJSONSink(ResultSink):
+    """
+    Writes every row as one JSON object of typed values per line, to pipe the results into another program.
+
+    Args:
+        header (list): The columns.
+        stream (file, optional): The text stream written to, it is not closed. Defaults to None, for stdout.
+        flush_rows (int, optional): The number of rows buffered before they are written. Defaults to FLUSH_ROWS.
+    """
+    def __init__(self, header: list, stream=None, flush_rows=FLUSH_ROWS):
+        super().__init__(header, flush_rows)
+        self._stream = sys.stdout if stream is None else stream
+
+    def _write_batch(self, batch: list):
+        self._stream.write(''.join(json.dumps(dict(zip(self.header, self.typed(row)))) + '\n' for row in batch))
+        self._stream.flush()
+
+
+class ArrowSink(ResultSink):
+    """
+    Writes the rows as typed columns with pyarrow, every batch as one record batch of an Arrow IPC file,
+    or one row group of a Parquet file.
+
+    Args:
+        path (str): The Parquet or Arrow file, it is overwritten.
+        header (list): The columns.
+        parquet (bool, optional): Write Parquet instead of an Arrow IPC file. Defaults to True.
+        flush_rows (int, optional): The number of rows buffered before they are written. Defaults to FLUSH_ROWS.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    ARROW_TYPES = {str: 'string', bool: 'bool_', int: 'int64', float: 'float64'}
+
+    def __init__(self, path: str, header: list, parquet=True, flush_rows=FLUSH_ROWS):
+        if pyarrow is None:
+            raise ImportError("Please install pyarrow to write Parquet or Arrow results")
+        super().__init__(header, flush_rows)
+        self.schema = pyarrow.schema([(column, getattr(pyarrow, self.ARROW_TYPES[value_type])())
+                                      for column, value_type in zip(self.header, self.types)])
+        if parquet:
+            self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def _write_batch(self, batch: list):
+        columns = list(zip(*(self.typed(row) for row in batch)))
+        self._writer.write_table(pyarrow.Table.from_arrays([pyarrow.array(values, type=field.type)
+                                                            for values, field in zip(columns, self.schema)],
+                                                           schema=self.schema))
+
+    def _close(self):
+        self._writer.close()
+
+
+def open_sink(output_format: str, output_dir: str, header: list) -> ResultSink:
+    """
+    Args:
+        output_format (str): One of FORMATS.
+        output_dir (str): The directory of the results file, unused by NDJSON, which is written to stdout.
+        header (list): The columns.
+
+    Returns:
+        ResultSink: The sink of the run, to close once every row is written.
+    """
+    if output_format == 'ndjson':
+        return NDJSONSink(header)
+    path = os.path.join(output_dir, FILE_NAMES[output_format])
+    if output_format == 'csv':
+        return CSVSink(path, header)
+    return ArrowSink(path, header, parquet=output_format == 'parquet')
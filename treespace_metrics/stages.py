@@ -0,0 +1,119 @@
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# The stages of the analysis of one network, in the order of their metrics.csv columns
+STAGES = (
+    'parse',
+    'jetten_bipartite',
+    'jetten_matching',
+    'max_cst',
+    'francis_matching',
+    'francis_paths',
+    'spanning_tree',
+    'tree_cover',
+    'draw_max_cst',
+    'draw_francis_bipartite',
+    'draw_disjoint_paths',
+    'draw_spanning_tree',
+)
+
+# Shared by every disabled stage, so leaving the instrumentation off costs one call and one comparison per stage
+_DISABLED = nullcontext()
+
+
+class StageRecorder:
+    """
+    Records the wall time of every stage of the analysis of one network, and with memory its peak allocation.
+    Stages may nest, as the intermediates of NetworkAnalysis are computed the first time a later stage needs them:
+    the time of a stage excludes the stages it triggered, while its peak includes them,
+    as memory they allocated is held at the same time. If tracemalloc was not already tracing,
+    it only traces the allocations inside the outermost stages. Tracing slows allocation-heavy code down
+    several times, so the seconds of a recorder with memory include that overhead and only compare with
+    other runs with memory.
+
+    Args:
+        memory (bool, optional): Also record the peak allocation of every stage with tracemalloc. Defaults to False.
+    """
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.peak_bytes = dict.fromkeys(STAGES, 0)
+        # The name, start time, memory at the start, peak so far and time spent in nested stages of each open stage
+        self._stack = []
+        self._started = False
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measure the code run inside this context as the stage name, adding to earlier runs of the same stage.
+
+        Args:
+            name (str): The stage, one of STAGES.
+        """
+        current = 0
+        if self.memory:
+            if not self._stack and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], peak)
+            tracemalloc.reset_peak()
+        frame = [name, time.perf_counter(), current, current, 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.seconds[name] += elapsed - frame[4]
+            if self._stack:
+                self._stack[-1][4] += elapsed
+            if self.memory:
+                peak = max(frame[3], tracemalloc.get_traced_memory()[1])
+                self.peak_bytes[name] = max(self.peak_bytes[name], peak - frame[2])
+                if self._stack:
+                    self._stack[-1][3] = max(self._stack[-1][3], peak)
+                elif self._started:
+                    tracemalloc.stop()
+                    self._started = False
+
+    def row(self) -> list:
+        """
+        Returns:
+            list: The seconds of every stage, followed by its peak bytes with memory, in the order of columns.
+        """
+        if not self.memory:
+            return [f"{self.seconds[name]:.6f}" for name in STAGES]
+        return [value for name in STAGES for value in (f"{self.seconds[name]:.6f}", self.peak_bytes[name])]
+
+
+def columns(memory=False) -> list:
+    """
+    Args:
+        memory (bool, optional): Whether the recorders record the peak allocations. Defaults to False.
+
+    Returns:
+        list: The metrics.csv columns added by a StageRecorder row, a seconds column per stage,
+            followed by a bytes column with memory.
+    """
+    if not memory:
+        return [name + '_seconds' for name in STAGES]
+    return [column for name in STAGES for column in (name + '_seconds', name + '_bytes')]
+
+
+def stage(recorder, name: str):
+    """
+    Measure a stage with the recorder, or do nothing if there is none.
+
+    Args:
+        recorder (StageRecorder): The recorder of the network being analyzed, None when instrumentation is off.
+        name (str): The stage, one of STAGES.
+
+    Returns:
+        A context manager around the stage.
+    """
+    if recorder is None:
+        return _DISABLED
+    return recorder.stage(name)
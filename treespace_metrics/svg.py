@@ -0,0 +1,389 @@
+import logging
+import os
+import threading
+from multiprocessing.util import Finalize
+from queue import Queue
+from xml.sax.saxutils import escape, quoteattr
+from networkx import DiGraph, Graph, topological_sort
+
+from treespace_metrics.compact import as_compact
+
+logger = logging.getLogger(__name__)
+
+# The color nodes are drawn in when none is given, the default of networkx
+NODE_COLOR = '#1f78b4'
+# The single letter matplotlib colors the drawings use, as SVG colors
+COLORS = {'r': 'red', 'g': 'green', 'b': 'blue', 'k': 'black'}
+# The barycenter sweeps that order the nodes of every layer, and the passes that place them
+SWEEPS = 8
+PASSES = 4
+# Distances in pixels
+X_GAP = 60
+Y_GAP = 80
+MARGIN = 40
+RADIUS = 14
+BIPARTITE_GAP = 240
+BIPARTITE_Y_GAP = 36
+BIPARTITE_TITLE = 'Bipartite Graph - Red means edge is matched, Blue otherwise'
+
+
+def node_color_groups(graph: DiGraph, color_node_type=False) -> dict:
+    """
+    Group the nodes of a network by the color draw_tree draws them in.
+
+    Args:
+        graph (DiGraph): Input phylogenetic network.
+        color_node_type (bool, optional): If True, omnian nodes are red, leaves green, and the rest blue,
+            otherwise nodes take their 'color' attribute. Defaults to False.
+
+    Returns:
+        dict: The nodes of every color.
+    """
+    groups = {}
+    if color_node_type:
+        compact = as_compact(graph)
+        omnian = dict(zip(compact.labels, compact.classification.omnian.tolist()))
+        for node in graph.nodes():
+            color = 'red' if omnian[node] else 'green' if graph.out_degree(node) == 0 else NODE_COLOR
+            groups.setdefault(color, []).append(node)
+    else:
+        for node, data in graph.nodes(data=True):
+            groups.setdefault(data.get('color', NODE_COLOR), []).append(node)
+    return groups
+
+
+def edge_style_groups(graph: DiGraph, highlight_edges=None) -> dict:
+    """
+    Group the edges of a network by the color and width draw_tree draws them with: highlighted edges are
+    thick and red, edges with a 'color' attribute thick in that color, and the others thin and black.
+
+    Args:
+        graph (DiGraph): Input phylogenetic network.
+        highlight_edges (iterable, optional): The edges to highlight. Defaults to None.
+
+    Returns:
+        dict: The edges of every (color, width).
+    """
+    highlight_edges = set() if highlight_edges is None else set(highlight_edges)
+    groups = {}
+    for source, target, data in graph.edges(data=True):
+        if (source, target) in highlight_edges:
+            style = ('r', 3)
+        elif 'color' in data:
+            style = (data['color'], 3)
+        else:
+            style = ('k', 1)
+        groups.setdefault(style, []).append((source, target))
+    return groups
+
+
+def layered_layout(graph: DiGraph) -> tuple:
+    """
+    Lay out a rooted DAG top down in layers, Sugiyama style, without graphviz. Every node is placed one
+    layer below its lowest parent, and edges that span several layers are routed through a dummy node
+    in every layer between. The nodes of every layer are ordered by barycenter sweeps, keeping the order
+    with the fewest edge crossings, then every node is moved towards the mean of its neighbors.
+
+    Args:
+        graph (DiGraph): Input phylogenetic network.
+
+    Returns:
+        tuple:
+            - dict: The (x, y) position of every node, in pixels from the top left corner.
+            - dict: The points every edge passes through, from its source to its target.
+    """
+    names = list(topological_sort(graph))
+    index = {name: v for v, name in enumerate(names)}
+    layer = [0] * len(names)
+    for v, name in enumerate(names):
+        layer[v] = max((layer[index[p]] + 1 for p in graph.predecessors(name)), default=0)
+
+    # Vertices are the nodes, then the dummy nodes, as ids
+    up = [[] for _ in names]
+    down = [[] for _ in names]
+    chains = {}
+    for source, target in graph.edges():
+        chain = [index[source]]
+        for k in range(layer[index[source]] + 1, layer[index[target]]):
+            up.append([])
+            down.append([])
+            layer.append(k)
+            chain.append(len(layer) - 1)
+        chain.append(index[target])
+        for u, v in zip(chain, chain[1:]):
+            down[u].append(v)
+            up[v].append(u)
+        chains[source, target] = chain
+
+    # Start from the depth first order from the roots, which draws a tree without crossings
+    first = {}
+    for root in (v for v in range(len(names)) if not up[v]):
+        stack = [root]
+        while stack:
+            v = stack.pop()
+            if v not in first:
+                first[v] = len(first)
+                stack.extend(reversed(down[v]))
+    layers = [[] for _ in range(max(layer, default=-1) + 1)]
+    for v in sorted(range(len(layer)), key=first.__getitem__):
+        layers[layer[v]].append(v)
+
+    position = [0] * len(layer)
+    best, fewest = [list(vertices) for vertices in layers], None
+    for sweep in range(SWEEPS + 1):
+        if sweep > 0:
+            # Sweep down, ordering every layer by its parents, then up by its children
+            neighbors, order = (up, range(1, len(layers))) if sweep % 2 else (down, range(len(layers) - 2, -1, -1))
+            for i in order:
+                layers[i].sort(key=lambda v: sum(position[u] for u in neighbors[v]) / len(neighbors[v])
+                               if neighbors[v] else position[v])
+                for k, v in enumerate(layers[i]):
+                    position[v] = k
+        for vertices in layers:
+            for k, v in enumerate(vertices):
+                position[v] = k
+        crossings = sum(_crossings(vertices, down, position) for vertices in layers)
+        if fewest is None or crossings < fewest:
+            best, fewest = [list(vertices) for vertices in layers], crossings
+        if crossings == 0:
+            break
+    layers = best
+
+    x = [0.0] * len(layer)
+    for vertices in layers:
+        for k, v in enumerate(vertices):
+            x[v] = float(k)
+    for _ in range(PASSES):
+        for neighbors, order in ((up, layers), (down, reversed(layers))):
+            for vertices in order:
+                _place(vertices, [sum(x[u] for u in neighbors[v]) / len(neighbors[v]) if neighbors[v] else x[v]
+                                  for v in vertices], x)
+    left = min(x, default=0.0)
+
+    def point(v):
+        return MARGIN + (x[v] - left) * X_GAP, MARGIN + layer[v] * Y_GAP
+
+    positions = {name: point(v) for v, name in enumerate(names)}
+    routes = {edge: [point(v) for v in chain] for edge, chain in chains.items()}
+    return positions, routes
+
+
+def _crossings(vertices: list, down: list, position: list) -> int:
+    """The number of crossings of the edges from a layer to the next one, as inversions of their targets."""
+    targets = [position[v] for u in sorted(vertices, key=position.__getitem__)
+               for v in sorted(down[u], key=position.__getitem__)]
+    return _inversions(targets)[1]
+
+
+def _inversions(values: list) -> tuple:
+    """Merge sort the values, counting the pairs out of order."""
+    if len(values) < 2:
+        return values, 0
+    middle = len(values) // 2
+    left, count_left = _inversions(values[:middle])
+    right, count_right = _inversions(values[middle:])
+    merged, count = [], count_left + count_right
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if right[j] < left[i]:
+            merged.append(right[j])
+            count += len(left) - i
+            j += 1
+        else:
+            merged.append(left[i])
+            i += 1
+    merged += left[i:] + right[j:]
+    return merged, count
+
+
+def _place(vertices: list, wanted: list, x: list):
+    """Move the vertices of a layer as close to where they are wanted as their order and spacing let them."""
+    if not vertices:
+        return
+    placed = []
+    for want in wanted:
+        placed.append(want if not placed else max(want, placed[-1] + 1))
+    # Shift the layer back by how far right the spacing pushed it on average
+    shift = sum(want - at for want, at in zip(wanted, placed)) / len(placed)
+    for v, at in zip(vertices, placed):
+        x[v] = at + shift
+
+
+def _color(color: str) -> str:
+    return COLORS.get(color, color)
+
+
+def _document(width: float, height: float, title: str, body: list, colors=()) -> str:
+    """Wrap the elements in an SVG document, with a title and an arrowhead marker for every edge color."""
+    markers = ''.join(f'<marker id="arrow-{k}" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="6" '
+                      f'markerHeight="6" orient="auto"><path d="M0,0 L10,5 L0,10 z" fill={quoteattr(color)}/>'
+                      f'</marker>' for k, color in enumerate(colors))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+            f'viewBox="0 0 {width:.0f} {height:.0f}" font-family="sans-serif" font-size="12">\n'
+            f'<defs>{markers}</defs>\n'
+            f'<rect width="100%" height="100%" fill="white"/>\n'
+            f'<text x="{width / 2:.1f}" y="{MARGIN / 2:.1f}" text-anchor="middle" font-size="14">'
+            f'{escape(title)}</text>\n' + '\n'.join(body) + '\n</svg>\n')
+
+
+def _nodes(groups: dict, positions: dict) -> list:
+    body = []
+    for color, nodes in groups.items():
+        body.append(f'<g fill={quoteattr(_color(color))}>')
+        body += [f'<circle cx="{positions[node][0]:.1f}" cy="{positions[node][1]:.1f}" r="{RADIUS}"/>'
+                 for node in nodes]
+        body.append('</g>')
+    body.append('<g text-anchor="middle" dominant-baseline="central">')
+    body += [f'<text x="{x:.1f}" y="{y:.1f}">{escape(str(node))}</text>' for node, (x, y) in positions.items()]
+    body.append('</g>')
+    return body
+
+
+def tree_svg(graph: DiGraph, title='Phylogenetic network', highlight_edges=None, color_node_type=False) -> str:
+    """
+    Draw a phylogenetic network as an SVG document, with the layered_layout and the colors of draw_tree.
+
+    Args:
+        graph (DiGraph): Input phylogenetic network.
+        title (str, optional): The title above the drawing. Defaults to 'Phylogenetic network'.
+        highlight_edges (iterable, optional): The edges to be highlighted in red. Defaults to None.
+        color_node_type (bool, optional): If True, colors omnian nodes red, leaves green, and the rest blue.
+            Defaults to False.
+
+    Returns:
+        str: The SVG document.
+    """
+    positions, routes = layered_layout(graph)
+    edge_groups = edge_style_groups(graph, highlight_edges)
+    colors = [_color(color) for color, _ in edge_groups]
+    body = []
+    for k, ((_, width), edges) in enumerate(edge_groups.items()):
+        body.append(f'<g fill="none" stroke={quoteattr(colors[k])} stroke-width="{width}" '
+                    f'marker-end="url(#arrow-{k})">')
+        for edge in edges:
+            points = _shorten(routes[edge])
+            body.append('<polyline points="' + ' '.join(f'{x:.1f},{y:.1f}' for x, y in points) + '"/>')
+        body.append('</g>')
+    body += _nodes(node_color_groups(graph, color_node_type), positions)
+    width = max((x for x, _ in positions.values()), default=0) + MARGIN
+    height = max((y for _, y in positions.values()), default=0) + MARGIN
+    return _document(max(width, 2 * MARGIN), height, title, body, colors)
+
+
+def _shorten(points: list) -> list:
+    """End an edge at the border of its target, so its arrowhead is not hidden under the node."""
+    (x0, y0), (x1, y1) = points[-2], points[-1]
+    length = ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5
+    if length <= RADIUS:
+        return points
+    scale = (length - RADIUS) / length
+    return points[:-1] + [(x0 + (x1 - x0) * scale, y0 + (y1 - y0) * scale)]
+
+
+def bipartite_svg(graph: Graph, matches=None, title=BIPARTITE_TITLE) -> str:
+    """
+    Draw a bipartite graph as an SVG document like draw_bipartite, the nodes with biparite 0 on the left.
+
+    Args:
+        graph (Graph): The input bipartite graph.
+        matches (dict, optional): The matched node of every matched node, matched edges are red
+            and the others blue. Defaults to None, to draw every edge thin and black.
+        title (str, optional): The title above the drawing. Defaults to BIPARTITE_TITLE.
+
+    Returns:
+        str: The SVG document.
+    """
+    left = [node for node, data in graph.nodes(data=True) if data.get('biparite') == 0]
+    right = [node for node, data in graph.nodes(data=True) if data.get('biparite') != 0]
+    positions = {node: (MARGIN + column * BIPARTITE_GAP, MARGIN + k * BIPARTITE_Y_GAP)
+                 for column, nodes in enumerate((left, right)) for k, node in enumerate(nodes)}
+    if matches is None:
+        styles = {('k', 1, 1): list(graph.edges())}
+    else:
+        styles = {('r', 8, 0.5): [], ('b', 8, 0.5): []}
+        for u, v in graph.edges():
+            styles[('r' if matches.get(u) == v or matches.get(v) == u else 'b', 8, 0.5)].append((u, v))
+    body = []
+    for (color, width, opacity), edges in styles.items():
+        body.append(f'<g stroke={quoteattr(_color(color))} stroke-width="{width}" stroke-opacity="{opacity}">')
+        body += [f'<line x1="{positions[u][0]:.1f}" y1="{positions[u][1]:.1f}" '
+                 f'x2="{positions[v][0]:.1f}" y2="{positions[v][1]:.1f}"/>' for u, v in edges]
+        body.append('</g>')
+    body += _nodes({NODE_COLOR: list(positions)}, positions)
+    height = MARGIN + max(len(left), len(right), 1) * BIPARTITE_Y_GAP
+    return _document(2 * MARGIN + BIPARTITE_GAP, height, title, body)
+
+
+class SVGRenderer:
+    """
+    Renders and writes SVG images on a background thread, so the analysis does not wait for them.
+    The graphs given to render must not be changed afterwards, as they are read on that thread.
+    """
+    def __init__(self):
+        self._queue = Queue()
+        self._thread = None
+
+    def render(self, location: str, function, *args):
+        """
+        Queue an image.
+
+        Args:
+            location (str): The path and file name of the image, without the .svg extension.
+            function (callable): Returns the SVG document, called with args, such as tree_svg.
+            *args: The arguments of function.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='svg-renderer', daemon=True)
+            self._thread.start()
+        self._queue.put((location, function, args))
+
+    def join(self):
+        """Wait until every queued image is written."""
+        self._queue.join()
+
+    def close(self):
+        """Write every queued image, then stop the background thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                location, function, args = item
+                document = function(*args)
+                with open(location + '.svg', 'w') as fd:
+                    fd.write(document)
+            except Exception:
+                logger.exception("Failed to render %s.svg", item[0])
+            finally:
+                self._queue.task_done()
+
+
+# The renderer of this process and the id of the process, a forked worker starts its own
+_renderer = None
+_renderer_pid = None
+
+
+def background_renderer() -> SVGRenderer:
+    """
+    Returns:
+        SVGRenderer: The renderer of this process, like open_cache, started on first use.
+            Its images are all written before the process exits, also in a worker process.
+    """
+    global _renderer, _renderer_pid
+    if _renderer is None or _renderer_pid != os.getpid():
+        _renderer, _renderer_pid = SVGRenderer(), os.getpid()
+        # Run at exit before the threads are stopped, in the main process and in multiprocessing workers
+        Finalize(_renderer, _renderer.close, exitpriority=10)
+    return _renderer
+
+
+def wait_for_renders():
+    """Wait until every image queued by the renderer of this process is written."""
+    if _renderer is not None and _renderer_pid == os.getpid():
+        _renderer.join()
@@ -0,0 +1,616 @@
+import math
+import multiprocessing
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+import numpy as np
+from networkx import DiGraph
+
+try:
+    from scipy.optimize import linprog
+except ImportError:
+    linprog = None
+
+from treespace_metrics.compact import CompactNetwork, as_compact
+from treespace_metrics.francis import vertex_disjoint_paths
+from treespace_metrics.max_cst import max_cst_paths
+from treespace_metrics.paths import decompose_paths
+
+# The trees of a cover as DiGraphs, a lower bound on the size of a minimum cover,
+# and whether the cover is known to be minimum
+TreeCover = namedtuple('TreeCover', ['trees', 'lower_bound', 'optimal'])
+
+# Every worker gets at least this many subproblems, so the ones that are pruned early are balanced out
+SUBPROBLEMS_PER_JOB = 4
+# The most base trees the fractional cover adds, and the scale of its node weights for the weighted Max-CST
+MAX_LP_ROUNDS = 200
+LP_SCALE = 1000
+# Tree replacements per tree of the cover the exchange heuristic tries
+EXCHANGE_ROUNDS = 300
+# The seconds the rooted_tree column searches for by default, after which the best cover found is reported
+TREE_COVER_SECONDS = 60.0
+
+
+def _expired(deadline) -> bool:
+    return deadline is not None and time.time() > deadline
+
+
+class _Network:
+    """
+    The adjacency of a network as lists of node ids, shared by every node of the search.
+    A tree of the search is a domain per reticulation (any node with several parents): the bitmask of
+    the parents, in the order of parents[h], its parent in the tree may still be chosen from.
+    """
+    def __init__(self, network: CompactNetwork):
+        n = len(network)
+        self.n = n
+        self.labels = network.labels
+        self.children = [network.children(v).tolist() for v in range(n)]
+        self.parents = [network.parents(v).tolist() for v in range(n)]
+        self.order = network.topological_order()
+        self.root = self.order[0]
+        self.leaf = (network.out_degree == 0).tolist()
+        self.leaves = [v for v in range(n) if self.leaf[v]]
+        self.hybrid = [len(parents) > 1 for parents in self.parents]
+        # The bit of each parent in the domain of a reticulation
+        self.bit = [{p: 1 << k for k, p in enumerate(parents)} for parents in self.parents]
+        self.full = [(1 << len(parents)) - 1 if hybrid else 0 for parents, hybrid in zip(self.parents, self.hybrid)]
+        self.all_nodes = (1 << n) - 1
+        self.compact = network
+        # Every edge, with the bit of its source in the domain of its target, 0 if the target is not a reticulation
+        self.sources, self.targets = network.edges()
+        self.edge_bit = np.array([self.bit[v][u] if self.hybrid[v] else 0
+                                  for u, v in zip(self.sources.tolist(), self.targets.tolist())], dtype=np.int64)
+
+    def coverage(self, domain: list) -> tuple:
+        """
+        The nodes a tree covers whatever its open reticulations choose, and the nodes it may still cover.
+        Every choice gives a spanning tree of the network, and a node is in the base tree it prunes to
+        when a leaf is below it. So a node is surely covered when it dominates a leaf, in the graph of
+        the edges still possible, and may be covered when it has a path of possible edges to a leaf.
+
+        Returns:
+            tuple: The bitsets of the surely covered and of the possibly covered node ids.
+        """
+        children, parents, bit, hybrid = self.children, self.parents, self.bit, self.hybrid
+        possible = [False] * self.n
+        for v in reversed(self.order):
+            possible[v] = self.leaf[v] or any(possible[c] and (not hybrid[c] or domain[c] & bit[c][v])
+                                              for c in children[v])
+
+        # The network is a DAG, so one pass in topological order finds the immediate dominators
+        idom = [-1] * self.n
+        depth = [0] * self.n
+        for v in self.order:
+            dominator = -1
+            for p in parents[v]:
+                if hybrid[v] and not domain[v] & bit[v][p]:
+                    continue
+                if dominator == -1:
+                    dominator = p
+                    continue
+                while dominator != p:
+                    if depth[dominator] >= depth[p]:
+                        dominator = idom[dominator]
+                    else:
+                        p = idom[p]
+            idom[v] = dominator
+            depth[v] = 0 if dominator == -1 else depth[dominator] + 1
+
+        sure = [False] * self.n
+        for v in self.leaves:
+            while v != -1 and not sure[v]:
+                sure[v] = True
+                v = idom[v]
+        return _bitset(sure), _bitset(possible)
+
+    def max_cover(self, domain: list, possible: int, nodes: int) -> int:
+        """
+        The most of the given nodes one completion of a tree covers at once, from the weighted Max-CST
+        of the network restricted to its possible edges. The nodes it may not cover are left without edges.
+
+        Returns:
+            int: The number of the nodes covered.
+        """
+        possible = _mask(possible, self.n)
+        allowed = (self.edge_bit == 0) | (np.asarray(domain, dtype=np.int64)[self.targets] & self.edge_bit != 0)
+        keep = allowed & possible[self.sources] & possible[self.targets]
+        restricted = CompactNetwork(self.labels, self.sources[keep], self.targets[keep], self.compact.index)
+        nodes = _mask(nodes, self.n) & possible
+        return sum(int(np.count_nonzero(nodes[path])) for path in _max_cover(restricted, nodes))
+
+    def frontier(self, domain: list, possible: int, v: int) -> tuple:
+        """
+        Find an open reticulation that would extend the surely taken edges below v towards a leaf.
+
+        Returns:
+            tuple: The reticulation and the parent below v it could choose, None if there is none.
+        """
+        queue = [v]
+        for x in queue:
+            for c in self.children[x]:
+                if not self.hybrid[c] or domain[c] == self.bit[c][x]:
+                    queue.append(c)
+                elif domain[c] & self.bit[c][x] and possible >> c & 1:
+                    return c, x
+        return None
+
+    def tree(self, domain: list) -> list:
+        """
+        Complete a tree of the search, every open reticulation takes its first parent left, and prune it.
+
+        Returns:
+            list: The parent node id of every node id in the base tree, -1 at the root and -2 for the other nodes.
+        """
+        domain = [d & -d for d in domain]
+        _, possible = self.coverage(domain)
+        parent = [-2] * self.n
+        for v in _bits(possible):
+            if v == self.root:
+                parent[v] = -1
+            elif self.hybrid[v]:
+                parent[v] = next(p for p in self.parents[v] if domain[v] & self.bit[v][p])
+            else:
+                parent[v] = self.parents[v][0]
+        return parent
+
+
+def _bitset(mask: list) -> int:
+    return int.from_bytes(np.packbits(np.asarray(mask, dtype=bool), bitorder='little').tobytes(), 'little')
+
+
+def _mask(bitset: int, n: int) -> np.ndarray:
+    return np.unpackbits(np.frombuffer(bitset.to_bytes((n + 7) // 8, 'little'), dtype=np.uint8),
+                         count=n, bitorder='little').astype(bool)
+
+
+def _bits(bitset: int):
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+def _best_tree(network: CompactNetwork, weights: np.ndarray) -> list:
+    """
+    Returns:
+        list: The paths of the base tree with the most weight, from the weighted Max-CST,
+        as lists of node ids that each end in a leaf.
+    """
+    starts, successors = max_cst_paths(network, weights)
+    return decompose_paths(successors, starts)
+
+
+def _max_cover(network: CompactNetwork, nodes: np.ndarray) -> list:
+    """
+    Find a base tree that covers the most of the given nodes: covering one of them outweighs covering
+    every other node.
+
+    Returns:
+        list: The paths of the base tree.
+    """
+    return _best_tree(network, np.where(nodes, len(network) + 1, 1).astype(np.int64))
+
+
+def _tree_from_paths(network: CompactNetwork, paths: list) -> list:
+    """Returns the parent list, as in _Network.tree, of the base tree made of a Max-CST path cover."""
+    covered = np.zeros(len(network), dtype=bool)
+    for path in paths:
+        covered[path] = True
+    parent = [-2] * len(network)
+    for path in paths:
+        # A path that does not start at the root has a covered parent to hang from, otherwise the Max-CST
+        # would have extended it up
+        parent[path[0]] = next((p for p in network.parents(path[0]).tolist() if covered[p]), -1)
+        for u, v in zip(path, path[1:]):
+            parent[v] = u
+    return parent
+
+
+def tree_cover_lower_bound(network: Union[DiGraph, CompactNetwork], eta=None, missing_v1=None) -> int:
+    """
+    Bound the number of base trees needed to cover every node of a network from below.
+    The internal nodes of a base tree each have a child that is theirs alone, so a base tree has at most
+    as many internal nodes as a maximum matching of the Francis bipartite graph, the internal nodes minus
+    the missing_v1 unmatched ones, and at most as many as the Max-CST, the internal nodes minus eta.
+
+    Args:
+        network (DiGraph | CompactNetwork): The phylogenetic network.
+        eta (int, optional): The Max-CST eta of the network, computed if it is not given. Defaults to None.
+        missing_v1 (int, optional): The number of Francis path cover paths that do not end in a leaf,
+            computed if it is not given. Defaults to None.
+
+    Returns:
+        int: The lower bound, 1 for a tree-based network.
+    """
+    compact = as_compact(network)
+    internal = int(np.count_nonzero(compact.out_degree != 0))
+    if eta is None:
+        _, successors = max_cst_paths(compact)
+        eta = internal - int(np.count_nonzero(successors != -1))
+    if missing_v1 is None:
+        missing_v1, _ = vertex_disjoint_paths(compact)
+    bound = 1
+    for uncovered in (eta, missing_v1):
+        if 0 < uncovered < internal:
+            bound = max(bound, math.ceil(internal / (internal - uncovered)))
+    return bound
+
+
+def greedy_tree_cover(network: Union[DiGraph, CompactNetwork]) -> list:
+    """
+    Cover every node of a network with base trees, each one the base tree that covers the most nodes
+    left uncovered by the ones before it, found with the weighted Max-CST.
+
+    Args:
+        network (DiGraph | CompactNetwork): The phylogenetic network.
+
+    Returns:
+        list[DiGraph]: The base trees, rooted at the root of the network with exactly its leaves.
+    """
+    compact = as_compact(network)
+    return [_to_digraph(compact, parent) for parent in _greedy(compact)]
+
+
+def _greedy(compact: CompactNetwork) -> list:
+    """Returns the parent lists of the greedy base trees, as in _Network.tree."""
+    uncovered = np.ones(len(compact), dtype=bool)
+    trees = []
+    while uncovered.any():
+        parent = _tree_from_paths(compact, _max_cover(compact, uncovered))
+        trees.append(parent)
+        uncovered &= np.asarray(parent) == -2
+    return trees
+
+
+def _fractional_cover(compact: CompactNetwork, trees: list, deadline=None) -> tuple:
+    """
+    Bound the size of a cover from below by the fractional cover number, solved by cutting planes on its dual:
+    the largest total node weight y such that every base tree weighs at most 1. The heaviest base tree
+    for y, the violated constraint to add, is found by the weighted Max-CST on y rounded to integers, whose
+    rounding error bounds how much heavier than it the heaviest base tree may be, so the bound is exact.
+    The eta bound of tree_cover_lower_bound is the uniform y. Every round keeps the bound valid,
+    so the rounds stop at the deadline with the bound so far.
+
+    Args:
+        compact (CompactNetwork): The phylogenetic network.
+        trees (list): Parent lists of base trees to start from.
+        deadline (float, optional): The time.time() to stop at. Defaults to None.
+
+    Returns:
+        tuple:
+            - int: The lower bound, 1 without SciPy.
+            - list: The parent lists of the given and the added base trees,
+              by decreasing weight in the fractional cover.
+    """
+    n = len(compact)
+    if linprog is None:
+        return 1, trees
+    scale = LP_SCALE * n
+    trees = list(trees)
+    covers = [np.asarray(parent) != -2 for parent in trees]
+    bound = 1.0
+    weight = None
+    for _ in range(MAX_LP_ROUNDS):
+        if _expired(deadline):
+            break
+        result = linprog(-np.ones(n), A_ub=np.array(covers, dtype=float), b_ub=np.ones(len(covers)),
+                         bounds=(0, None), method='highs')
+        if result.status != 0:
+            break
+        y = np.clip(result.x, 0, None)
+        # The duals of the tree constraints are the weights of the trees in a minimum fractional cover
+        weight = -result.ineqlin.marginals
+        parent = _tree_from_paths(compact, _best_tree(compact, np.round(y * scale).astype(np.int64) + 1))
+        cover = np.asarray(parent) != -2
+        # No base tree weighs more than this under y, so y scaled down by it is a feasible dual
+        heaviest = y[cover].sum() + 1.5 * n / scale
+        bound = max(bound, y.sum() / heaviest)
+        if y[cover].sum() <= 1 + 1e-9:
+            break
+        covers.append(cover)
+        trees.append(parent)
+    if weight is not None:
+        order = np.argsort(-np.concatenate([weight, np.zeros(len(trees) - len(weight))]), kind='stable')
+        trees = [trees[i] for i in order]
+    return math.ceil(bound - 1e-9), trees
+
+
+def _set_cover(compact: CompactNetwork, trees: list) -> list:
+    """
+    Pick a cover from the given base tree parent lists, the one covering the most uncovered nodes next,
+    and complete it with Max-CST trees.
+    """
+    covers = [np.asarray(parent) != -2 for parent in trees]
+    uncovered = np.ones(len(compact), dtype=bool)
+    chosen = []
+    while uncovered.any():
+        gains = [np.count_nonzero(cover & uncovered) for cover in covers]
+        if gains and max(gains) > 0:
+            parent = trees[int(np.argmax(gains))]
+        else:
+            parent = _tree_from_paths(compact, _max_cover(compact, uncovered))
+        chosen.append(parent)
+        uncovered &= np.asarray(parent) == -2
+    return chosen
+
+
+def _exchange(compact: CompactNetwork, trees: list, k: int, seed=0, deadline=None) -> list:
+    """
+    Look for a cover by k base trees, starting from the first k of the given ones. Every tree in turn is
+    replaced by the weighted Max-CST tree covering the most nodes no other tree covers, the other nodes
+    weighing a random 1 to 3 so the replacements do not cycle.
+
+    Args:
+        compact (CompactNetwork): The phylogenetic network.
+        trees (list): Parent lists of base trees, the most promising first.
+        k (int): The size of the cover to look for.
+        seed (int, optional): The seed of the tie breaking weights. Defaults to 0.
+        deadline (float, optional): The time.time() to stop at. Defaults to None.
+
+    Returns:
+        list: The parent lists of the cover, None if none was found in EXCHANGE_ROUNDS * k replacements
+            or before the deadline.
+    """
+    n = len(compact)
+    rng = np.random.default_rng(seed)
+    trees = [trees[i % len(trees)] for i in range(k)]
+    covers = [np.asarray(parent) != -2 for parent in trees]
+    for i in range(EXCHANGE_ROUNDS * k):
+        if _expired(deadline):
+            return None
+        i %= k
+        others = np.sum(covers, axis=0) - covers[i]
+        weights = np.where(others == 0, 4 * n, rng.integers(1, 4, n))
+        trees[i] = _tree_from_paths(compact, _best_tree(compact, weights.astype(np.int64)))
+        covers[i] = np.asarray(trees[i]) != -2
+        if np.all(np.any(covers, axis=0)):
+            return trees
+    return None
+
+
+def _to_digraph(compact: CompactNetwork, parent: list) -> DiGraph:
+    tree = DiGraph()
+    labels = compact.labels
+    tree.add_nodes_from(labels[v] for v, p in enumerate(parent) if p != -2)
+    tree.add_edges_from((labels[p], labels[v]) for v, p in enumerate(parent) if p >= 0)
+    return tree
+
+
+class _Search:
+    """
+    Depth first branch and bound over covers, every search node is a tuple of trees, each one the domains of its
+    reticulations and its surely and possibly covered bitsets. A search node takes the uncovered node that
+    the fewest of its trees may still cover, and branches on the tree that will cover it, the trees it already
+    has or one new tree. Within that tree, it branches on whether an open reticulation below the node
+    takes the parent that extends its sure edges towards a leaf, until the node is surely covered.
+    A search node is pruned when its trees plus the new trees its nodes no tree may cover need,
+    by the weighted Max-CST, are not fewer than the best cover found so far.
+
+    Args:
+        network (CompactNetwork): The phylogenetic network.
+        incumbent: The size of the best cover found so far, a multiprocessing.Value shared by the workers.
+        deadline (float, optional): The time.time() to stop at. Defaults to None, to search until done.
+        lower_bound (int, optional): A lower bound on the size of every cover. Defaults to 1.
+    """
+    def __init__(self, network: CompactNetwork, incumbent, deadline=None, lower_bound=1):
+        self.compact = network
+        self.network = _Network(network)
+        self.incumbent = incumbent
+        self.deadline = deadline
+        self.lower_bound = lower_bound
+        self.best = None
+        self.timed_out = False
+        self._max_cover = {}
+        self._empty = None
+
+    def new_tree(self) -> tuple:
+        if self._empty is None:
+            domain = list(self.network.full)
+            self._empty = (domain,) + self.network.coverage(domain)
+        return self._empty
+
+    def restrict(self, trees: tuple, t: int, h: int, domain: int) -> tuple:
+        """Returns the trees with the domain of reticulation h of tree t replaced."""
+        domains = list(trees[t][0])
+        domains[h] = domain
+        return trees[:t] + ((domains,) + self.network.coverage(domains),) + trees[t + 1:]
+
+    def max_cover(self, nodes: int) -> int:
+        """The most of the given bitset of nodes one base tree covers."""
+        if nodes not in self._max_cover:
+            self._max_cover[nodes] = self.network.max_cover(self.network.full, self.network.all_nodes, nodes)
+        return self._max_cover[nodes]
+
+    def expand(self, trees: tuple):
+        """
+        Evaluate a search node, recording it if it is a cover.
+
+        Returns:
+            tuple: The uncovered node to cover next and the trees that may cover it, None if the node is done.
+        """
+        network = self.network
+        used = len(trees)
+        covered = 0
+        possible = 0
+        for _, sure, maybe in trees:
+            covered |= sure
+            possible |= maybe
+        best = self.incumbent.value
+        if covered == network.all_nodes:
+            if used < best:
+                with self.incumbent.get_lock():
+                    if used < self.incumbent.value:
+                        self.incumbent.value = used
+                self.best = [domains for domains, _, _ in trees]
+            return None
+
+        uncovered = network.all_nodes & ~covered
+        orphans = uncovered & ~possible
+        count = bin(orphans).count('1')
+        if max(used + (count and math.ceil(count / self.max_cover(orphans))), self.lower_bound) >= best:
+            return None
+        # The trees, and the new trees that still leave the cover smaller than the best one,
+        # have to cover every uncovered node at once
+        count = bin(uncovered).count('1')
+        total = (best - 1 - used) * self.max_cover(uncovered)
+        for domains, _, maybe in trees:
+            if total >= count:
+                break
+            total += network.max_cover(domains, maybe, uncovered & maybe)
+        if total < count:
+            return None
+        if orphans:
+            # No tree may cover it, a new tree has to
+            return next(_bits(orphans)), [used]
+
+        v = min(_bits(uncovered), key=lambda u: sum(maybe >> u & 1 for _, _, maybe in trees))
+        options = [t for t, (_, _, maybe) in enumerate(trees) if maybe >> v & 1]
+        if used + 1 < best:
+            options.append(used)
+        return v, options
+
+    def children(self, trees: tuple, v: int, options: list):
+        """Yields the search nodes where v is surely covered by one of the trees in options."""
+        network = self.network
+        for t in options:
+            stack = [trees if t < len(trees) else trees + (self.new_tree(),)]
+            while stack:
+                current = stack.pop()
+                domains, sure, possible = current[t]
+                if sure >> v & 1:
+                    yield current
+                    continue
+                if not possible >> v & 1:
+                    continue
+                h, x = network.frontier(domains, possible, v)
+                bit = network.bit[h][x]
+                stack.append(self.restrict(current, t, h, domains[h] & ~bit))
+                stack.append(self.restrict(current, t, h, bit))
+
+    def run(self, roots: list):
+        """Search below every search node of roots, depth first, until done or out of time."""
+        stack = [iter(roots)]
+        while stack:
+            if _expired(self.deadline):
+                self.timed_out = True
+                return
+            trees = next(stack[-1], None)
+            if trees is None:
+                stack.pop()
+                continue
+            branch = self.expand(trees)
+            if branch is not None:
+                stack.append(self.children(trees, *branch))
+
+    def split(self, count: int) -> list:
+        """
+        Expand the search breadth first until there are count search nodes to share between the workers.
+        It branches one reticulation at a time, as the search nodes of children may be too many to list.
+        """
+        network = self.network
+        queue = deque([()])
+        while queue and len(queue) < count:
+            if _expired(self.deadline):
+                break
+            trees = queue.popleft()
+            branch = self.expand(trees)
+            if branch is None:
+                continue
+            v, options = branch
+            for t in options:
+                current = trees if t < len(trees) else trees + (self.new_tree(),)
+                domains, sure, possible = current[t]
+                if sure >> v & 1:
+                    queue.append(current)
+                elif possible >> v & 1:
+                    h, x = network.frontier(domains, possible, v)
+                    bit = network.bit[h][x]
+                    queue.append(self.restrict(current, t, h, bit))
+                    queue.append(self.restrict(current, t, h, domains[h] & ~bit))
+        return list(queue)
+
+
+# The search of a worker process, set up once by _init_worker
+_worker_search = None
+
+
+def _init_worker(network: CompactNetwork, incumbent, deadline, lower_bound):
+    global _worker_search
+    _worker_search = _Search(network, incumbent, deadline, lower_bound)
+
+
+def _search_subproblem(trees: tuple) -> tuple:
+    search = _worker_search
+    search.best = None
+    search.run([trees])
+    return search.best, search.timed_out
+
+
+def minimum_tree_cover(network: Union[DiGraph, CompactNetwork], time_limit=None, jobs=1,
+                       eta=None, missing_v1=None) -> TreeCover:
+    """
+    Find the minimum number of base trees, rooted at the root of the network with exactly its leaves,
+    that cover every node of the network, by branch and bound from the greedy cover.
+    It starts from the lower bound of tree_cover_lower_bound, raised by the fractional cover when the greedy
+    cover misses it, and stops early when a cover reaches it. The trees of the fractional cover are first
+    rounded to a cover, and exchanged for smaller covers, which often meet the bound without a search.
+    With jobs > 1, the first levels of the search are split between worker processes,
+    which share the size of the best cover so far to prune with.
+    With a time limit it is an anytime search: the bounds and heuristics stop at the deadline too,
+    and the best cover found in time is returned, marked as not optimal.
+
+    Args:
+        network (DiGraph | CompactNetwork): The phylogenetic network.
+        time_limit (float, optional): The seconds to search for, None to search until the cover is minimum.
+            Defaults to None.
+        jobs (int, optional): The number of worker processes. Defaults to 1.
+        eta (int, optional): The Max-CST eta of the network, if it was already computed. Defaults to None.
+        missing_v1 (int, optional): The missing_v1 of the Francis path cover, if it was already computed.
+            Defaults to None.
+
+    Returns:
+        TreeCover: The base trees of the cover, a lower bound on the minimum and whether the cover is minimum.
+    """
+    compact = as_compact(network)
+    deadline = None if time_limit is None else time.time() + time_limit
+    greedy = _greedy(compact)
+    lower_bound = tree_cover_lower_bound(compact, eta, missing_v1)
+    if len(greedy) > lower_bound:
+        fractional, trees = _fractional_cover(compact, greedy, deadline)
+        lower_bound = max(lower_bound, fractional)
+        greedy = min(greedy, _set_cover(compact, trees), key=len)
+        # Look for smaller covers from the heaviest trees of the fractional cover, the smallest first
+        for k in range(lower_bound, len(greedy)):
+            if _expired(deadline):
+                break
+            cover = _exchange(compact, trees, k, deadline=deadline)
+            if cover is not None:
+                greedy = cover
+                break
+    if len(greedy) <= lower_bound:
+        return TreeCover([_to_digraph(compact, parent) for parent in greedy], len(greedy), True)
+
+    incumbent = multiprocessing.Value('i', len(greedy))
+    search = _Search(compact, incumbent, deadline, lower_bound)
+    best, timed_out = None, False
+    if jobs > 1:
+        subproblems = search.split(jobs * SUBPROBLEMS_PER_JOB)
+        best = search.best
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(compact, incumbent, deadline, lower_bound)) as pool:
+            for found, stopped in pool.map(_search_subproblem, subproblems):
+                timed_out |= stopped
+                if found is not None and (best is None or len(found) < len(best)):
+                    best = found
+    else:
+        search.run([()])
+        best, timed_out = search.best, search.timed_out
+
+    if best is None:
+        trees = [_to_digraph(compact, parent) for parent in greedy]
+    else:
+        trees = [_to_digraph(compact, search.network.tree(domains)) for domains in best]
+    optimal = not timed_out or len(trees) <= lower_bound
+    return TreeCover(trees, len(trees) if optimal else lower_bound, optimal)
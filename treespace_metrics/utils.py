@@ -1,6 +1,14 @@
+import bz2
+import gzip
+import lzma
+import os
+from typing import Iterable, Iterator, Union
 from networkx import DiGraph, Graph
 from networkx.algorithms.components import connected_components
 from networkx.algorithms.bipartite import hopcroft_karp_matching
+import numpy as np
+
+from treespace_metrics.compact import CompactNetwork, NodeClassification, as_compact
 
 
 def is_reticulation(network: DiGraph, node: str) -> bool:
@@ -39,6 +47,22 @@ def is_omnian(network: DiGraph, node: str) -> bool:
     else:
         return False
 
+
+def classify_nodes(network: Union[DiGraph, CompactNetwork]) -> NodeClassification:
+    """
+    Classify every node of a network at once, instead of calling is_reticulation and is_omnian node by node.
+    The classification of a CompactNetwork is computed once and cached on it.
+
+    Args:
+        network (DiGraph | CompactNetwork): The input phylogenetic network.
+
+    Returns:
+        NodeClassification: The in/out-degree arrays and the root, leaf, tree, reticulation and omnian masks,
+        indexed by the node ids of as_compact(network).
+    """
+    return as_compact(network).classification
+
+
 def maximum_matching_all(network: Graph) -> dict:
     """
     Compute the maximum matching for all connected components of a graph.
@@ -56,29 +80,27 @@ def maximum_matching_all(network: Graph) -> dict:
     return matches
 
 
-def get_leaves(network: DiGraph) -> set:
+def get_leaves(network: Union[DiGraph, CompactNetwork]) -> set:
     """
     Get all leaf nodes of a phylogenetic network.
 
     Args:
-        network (DiGraph): The input directed graph.
+        network (DiGraph | CompactNetwork): The input directed graph.
 
     Returns:
         set: A set of all leaf nodes in the network.
     """
-    leaves = set()
-    for v in network.nodes():
-        if network.out_degree(v) == 0:
-            leaves.add(v)
-    return leaves
+    if isinstance(network, CompactNetwork):
+        return set(network.translate(np.flatnonzero(network.classification.leaf)))
+    return {v for v, degree in network.out_degree() if degree == 0}
 
 
-def get_root(network: DiGraph) -> str:
+def get_root(network: Union[DiGraph, CompactNetwork]) -> str:
     """
     Get the root of a phylogenetic network.
 
     Args:
-        network (DiGraph): The input directed graph.
+        network (DiGraph | CompactNetwork): The input directed graph.
 
     Returns:
         str: The root node if there is exactly one root, None otherwise.
@@ -86,10 +108,10 @@ def get_root(network: DiGraph) -> str:
     Raises:
         NotImplementedError: If multiple roots are found.
     """
-    roots = []
-    for v in network.nodes():
-        if network.in_degree(v) == 0:
-            roots.append(v)
+    if isinstance(network, CompactNetwork):
+        roots = network.translate(np.flatnonzero(network.classification.root))
+    else:
+        roots = [v for v, degree in network.in_degree() if degree == 0]
     if len(roots) == 0:
         return None
     if len(roots) == 1:
@@ -97,21 +119,19 @@ def get_root(network: DiGraph) -> str:
     raise NotImplementedError(f"Found multiple roots: {roots}")
 
 
-def get_all_roots(graph: DiGraph) -> set:
+def get_all_roots(graph: Union[DiGraph, CompactNetwork]) -> set:
     """
     Get all root nodes of a graph.
 
     Args:
-        graph (DiGraph): The input directed graph.
+        graph (DiGraph | CompactNetwork): The input directed graph.
 
     Returns:
         set: A set of all nodes with in-degree 0.
     """
-    roots = set()
-    for v in graph.nodes():
-        if graph.in_degree(v) == 0:
-            roots.add(v)
-    return roots
+    if isinstance(graph, CompactNetwork):
+        return set(graph.translate(np.flatnonzero(graph.classification.root)))
+    return {v for v, degree in graph.in_degree() if degree == 0}
 
 
 def path_to_edges(paths: list[list]) -> list[tuple]:
@@ -172,19 +192,147 @@ def create_dag(g: Graph) -> DiGraph:
     return g_prime
 
 
+# Compressed adjacency lists are opened transparently based on their extension
+OPENERS = {
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+    '.bz2': bz2.open,
+}
+
+
+def _two_labels_per_line(data: str, tokens: list) -> bool:
+    """
+    Check that every line of a buffer holds exactly two labels or none, without splitting it line by line:
+    a label starts at a non-blank byte after a blank one, and the starts of every line are counted at once.
+    A label holding non-ASCII whitespace only splits into more tokens, so the counts then differ from tokens.
+
+    Args:
+        data (str): The buffer, without comments.
+        tokens (list): data.split().
+
+    Returns:
+        bool: Whether tokens alternate the source and target of one edge per line.
+    """
+    raw = np.frombuffer(data.encode('utf-8'), dtype=np.uint8)
+    # The ASCII whitespace, which str.split also splits on: space, and tab to carriage return
+    blank = (raw == ord(' ')) | ((raw >= ord('\t')) & (raw <= ord('\r')))
+    starts = np.flatnonzero(~blank & np.concatenate(([True], blank[:-1])))
+    if len(starts) != len(tokens):
+        return False
+    counts = np.bincount(np.searchsorted(np.flatnonzero(raw == ord('\n')), starts))
+    return not np.any((counts != 0) & (counts != 2))
+
+
+def read_edge_tokens(adjacency_list_file: str) -> list:
+    """
+    Read the whole adjacency list file in one buffer and split it into tokens.
+    Any whitespace separates the source and target, blank lines and '#' comments are skipped,
+    and .gz, .xz and .bz2 files are decompressed transparently.
+
+    Args:
+        adjacency_list_file (str): Path to the adjacency list file.
+
+    Returns:
+        list: The labels of the edges, alternating source and target.
+
+    Raises:
+        ValueError: If a line does not hold exactly one source and one target.
+    """
+    opener = OPENERS.get(os.path.splitext(adjacency_list_file)[1], open)
+    with opener(adjacency_list_file, 'rt') as fd:
+        data = fd.read()
+    if '#' not in data:
+        tokens = data.split()
+        if _two_labels_per_line(data, tokens):
+            return tokens
+    tokens = []
+    for line_number, line in enumerate(data.splitlines(), start=1):
+        line = line.split('#', 1)[0].split()
+        if not line:
+            continue
+        if len(line) != 2:
+            raise ValueError(f"{adjacency_list_file}:{line_number}: expected 'source target', got {line}")
+        tokens.extend(line)
+    return tokens
+
+
 def read_adjacency_list(adjacency_list_file: str) -> DiGraph:
     """
     Read an adjacency list from a text file and create a directed graph.
 
     Args:
-        adjacency_list_file (str): Path to the adjacency list file.
+        adjacency_list_file (str): Path to the adjacency list file, optionally compressed.
 
     Returns:
         DiGraph: A directed graph based on the adjacency list.
     """
+    tokens = read_edge_tokens(adjacency_list_file)
     g = DiGraph()
-    with open(adjacency_list_file, 'r') as fd:
-        for line in fd:
-            source, target = line.strip().split(' ')
-            g.add_edge(source, target)
-    return g
\ No newline at end of file
+    g.add_edges_from(zip(tokens[0::2], tokens[1::2]))
+    return g
+
+
+def read_compact_adjacency_list(adjacency_list_file: str) -> CompactNetwork:
+    """
+    Read an adjacency list from a text file straight into a CompactNetwork, without building a DiGraph.
+    Node ids follow the order in which the labels first appear, like the nodes of read_adjacency_list.
+
+    Args:
+        adjacency_list_file (str): Path to the adjacency list file, optionally compressed.
+
+    Returns:
+        CompactNetwork: The network described by the adjacency list.
+    """
+    return compact_from_tokens(read_edge_tokens(adjacency_list_file))
+
+
+def compact_from_tokens(tokens: list) -> CompactNetwork:
+    """
+    Build a CompactNetwork from edge labels, node ids follow the order in which the labels first appear.
+
+    Args:
+        tokens (list): The labels of the edges, alternating source and target.
+
+    Returns:
+        CompactNetwork: The network with these edges.
+    """
+    labels, first, inverse = np.unique(np.array(tokens, dtype=str), return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    ids = rank[inverse]
+    return CompactNetwork(labels[order].tolist(), ids[0::2], ids[1::2])
+
+
+def iter_adjacency_records(lines: Iterable[str]) -> Iterator[tuple]:
+    """
+    Stream networks out of adjacency list records, such as the output of binary_ntk_generator --stdout.
+    Every record starts with a '# name' line, followed by one 'source target' line per edge.
+    Each network is emitted as soon as the next record starts, so a pipe is analyzed as it arrives.
+
+    Args:
+        lines (Iterable[str]): The lines of the records, such as an open file or pipe.
+
+    Returns:
+        Iterator[tuple]: The (name, CompactNetwork) of every record, in order.
+
+    Raises:
+        ValueError: If an edge comes before the first record header, or a line is not 'source target'.
+    """
+    name = None
+    tokens = []
+    for line in lines:
+        if line.startswith('#'):
+            if name is not None:
+                yield name, compact_from_tokens(tokens)
+            name = line[1:].strip()
+            tokens = []
+            continue
+        line = line.split()
+        if not line:
+            continue
+        if name is None or len(line) != 2:
+            raise ValueError(f"Expected a '# name' record header followed by 'source target' edges, got {line}")
+        tokens.extend(line)
+    if name is not None:
+        yield name, compact_from_tokens(tokens)